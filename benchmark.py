@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Headless Benchmark der Bild-zu-Leitung-Pipeline (ohne Tk).
+
+Misst jede Stufe einzeln über mehrere Panelgrößen und setzt die Zeiten ins
+Verhältnis zum Frame-Budget der gewünschten Frameraten:
+    process_image         Dekodieren + Skalieren einer Bilddatei
+    pil_to_bgr_bytes      RGB -> BGR Konvertierung
+    init_frames+rows      Paketaufbau pro Frame wie in FrameSenderFSM
+    compile_frame         einmaliger Aufbau eines CompiledFrame
+    marquee_setup         MarqueeEngine-Aufbau (Text einmalig in den Streifen rendern)
+    marquee_frame         MarqueeEngine.render_frame (Fenster des Streifens in den Paketpuffer)
+    color_frame           Farbkorrektur (Gamma-LUT + zeitliches Dithering) in den Paketpuffer
+    send_fsm / send_single / send_sendmmsg
+                          Sendepfad gegen eine Null-Senke (verbundener UDP-Socket,
+                          dessen Empfänger nie liest) oder --iface lo (root)
+
+Ergebnisse werden als JSON geschrieben und optional mit einer Baseline verglichen:
+    python3 benchmark.py --output bench.json --save-baseline baseline.json
+    python3 benchmark.py --baseline baseline.json --tolerance 0.2   # Exit-Code 1 bei Regression
+"""
+import os
+import sys
+import json
+import time
+import socket
+import platform
+import argparse
+import tempfile
+from types import SimpleNamespace
+from PIL import Image
+import numpy as np
+from constants import TX_MODE_SINGLE, TX_MODE_SENDMMSG, ROW_MAX_PIXELS
+from processing import process_image, pil_to_bgr_bytes
+from utils import init_frames, update_row_data
+from sending import CompiledFrame, SenderSession, send_single_frame_sync
+from ethernet import L2Ethernet
+from color import ColorCorrection, DITHER_TEMPORAL
+
+DEFAULT_SIZES = ["64x32", "128x64", "128x128", "256x128", "512x256"]
+DEFAULT_FPS = [60, 120, 240]
+SRC_MAC = b"\x22\x22\x33\x44\x55\x66"
+DST_MAC = b"\x11\x22\x33\x44\x55\x66"
+
+class _Var:                                     # Ersatz für tk.Variable im Headless-Betrieb
+    def __init__(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+def create_null_sink():
+    """Verbundener UDP-Socket auf einen lokalen Empfänger, der nie liest: echte Syscalls, Pakete werden verworfen."""
+    sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sink.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    sink.bind(("127.0.0.1", 0))
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sender.connect(sink.getsockname())
+    return sender, sink
+
+def _measure(func, iterations, warmup=2):
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter_ns()
+        func()
+        samples.append(time.perf_counter_ns() - start)
+    return samples
+
+def _summarize(stage, size, samples_ns, fps_list, per=1):
+    arr = np.asarray(samples_ns, dtype=np.float64) / 1e6 / per
+    mean = float(arr.mean())
+    return {
+        "stage": stage,
+        "size": size,
+        "n": int(arr.size * per),
+        "mean_ms": round(mean, 4),
+        "p50_ms": round(float(np.percentile(arr, 50)), 4),
+        "p99_ms": round(float(np.percentile(arr, 99)), 4),
+        "max_ms": round(float(arr.max()), 4),
+        # Anteil des Frame-Budgets (1/FPS), den diese Stufe pro Frame verbraucht
+        "budget_pct": {str(fps): round(mean / (1000.0 / fps) * 100, 2) for fps in fps_list},
+    }
+
+def _legacy_build(frame_data, columns, rows, brightness):
+    # Paketaufbau wie FrameSenderFSM pro Frame (ohne Senden)
+    frameData0107, frameData0aff, frameData5500 = init_frames(columns, brightness)
+    bytes_per_row = columns * 3
+    for row in range(rows):
+        update_row_data(frameData5500, row & 0xFF, frame_data[row * bytes_per_row:(row + 1) * bytes_per_row])
+
+def _create_marquee(columns, rows):
+    from marquee_manager import MarqueeEngine
+    view = SimpleNamespace(brightness_var=_Var(50),
+                           src_mac_var=_Var("22:22:33:44:55:66"),
+                           dst_mac_var=_Var("11:22:33:44:55:66"))
+    ctrl = SimpleNamespace(view=view, l2=None, columns=columns, rows=rows, row_pixels=ROW_MAX_PIXELS,
+                           color=ColorCorrection())
+    return MarqueeEngine(ctrl, "Benchmark", max(8, rows // 2), speed=1)
+
+def run_benchmarks(sizes, fps_list, iterations, iface=None, stages=None):
+    rng = np.random.default_rng(0)
+    source = Image.fromarray(rng.integers(0, 256, (1080, 1920, 3), dtype=np.uint8), "RGB")
+    tmpdir = tempfile.mkdtemp(prefix="ledbench_")
+    image_path = os.path.join(tmpdir, "source.jpg")
+    source.save(image_path, quality=90)
+
+    if iface:
+        l2 = L2Ethernet(iface)
+        l2.open()
+        sink = None
+        if l2.socket is None:
+            raise RuntimeError(f"Could not open {iface}")
+    else:
+        sender, sink = create_null_sink()
+        l2 = L2Ethernet("null")
+        l2.attach(sender)
+
+    def wanted(stage):
+        return stages is None or stage in stages
+
+    results = []
+    try:
+        for size in sizes:
+            columns, rows = (int(v) for v in size.lower().split("x"))
+            frame_data = process_image(image_path, columns, rows)
+            compiled = CompiledFrame(SRC_MAC, DST_MAC, frame_data, columns, rows)
+            session = SenderSession(l2, SRC_MAC, DST_MAC, 50)
+
+            if wanted("process_image"):
+                samples = _measure(lambda: process_image(image_path, columns, rows), iterations)
+                results.append(_summarize("process_image", size, samples, fps_list))
+            if wanted("pil_to_bgr_bytes"):
+                small = source.resize((columns, rows))
+                samples = _measure(lambda: pil_to_bgr_bytes(small, columns, rows), iterations)
+                results.append(_summarize("pil_to_bgr_bytes", size, samples, fps_list))
+            if wanted("init_frames+rows"):
+                samples = _measure(lambda: _legacy_build(frame_data, columns, rows, 50), iterations)
+                results.append(_summarize("init_frames+rows", size, samples, fps_list))
+            if wanted("compile_frame"):
+                samples = _measure(lambda: CompiledFrame(SRC_MAC, DST_MAC, frame_data, columns, rows), iterations)
+                results.append(_summarize("compile_frame", size, samples, fps_list))
+            if wanted("marquee_setup"):
+                samples = _measure(lambda: _create_marquee(columns, rows), max(1, iterations // 10), warmup=1)
+                results.append(_summarize("marquee_setup", size, samples, fps_list))
+            if wanted("marquee_frame"):
+                engine = _create_marquee(columns, rows)
+                counter = iter(range(1 << 62))
+                samples = _measure(lambda: engine.render_frame(next(counter) % engine.frame_count), iterations)
+                results.append(_summarize("marquee_frame", size, samples, fps_list))
+            if wanted("color_frame"):
+                color = ColorCorrection(gamma=2.2, temperature=5500, dither=DITHER_TEMPORAL)
+                pixels = np.frombuffer(frame_data, dtype=np.uint8).reshape(rows, columns, 3)
+                samples = _measure(lambda: compiled.update_pixels(pixels, color), iterations)
+                results.append(_summarize("color_frame", size, samples, fps_list))
+            if wanted("send_fsm"):
+                samples = _measure(lambda: send_single_frame_sync(l2, SRC_MAC, DST_MAC, 50, frame_data, columns, rows),
+                                   iterations)
+                results.append(_summarize("send_fsm", size, samples, fps_list))
+            for mode in (TX_MODE_SINGLE, TX_MODE_SENDMMSG):
+                stage = f"send_{mode}"
+                if not wanted(stage) or l2.set_tx_mode(mode) != mode:
+                    continue
+                samples = _measure(lambda: session.send_frame(compiled), iterations)
+                results.append(_summarize(stage, size, samples, fps_list))
+    finally:
+        l2.close()
+        if sink:
+            sink.close()
+        os.remove(image_path)
+        os.rmdir(tmpdir)
+    return results
+
+def compare(results, baseline, tolerance):
+    # Liefert Liste von (stage, size, baseline_ms, current_ms, ratio) für alle Regressionen
+    base = {(r["stage"], r["size"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for r in results:
+        ref = base.get((r["stage"], r["size"]))
+        if not ref or ref["mean_ms"] <= 0:
+            continue
+        ratio = r["mean_ms"] / ref["mean_ms"]
+        if ratio > 1 + tolerance:
+            regressions.append((r["stage"], r["size"], ref["mean_ms"], r["mean_ms"], ratio))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless benchmark of the image-to-wire pipeline")
+    parser.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES, help="panel sizes as WxH")
+    parser.add_argument("--fps", nargs="+", type=int, default=DEFAULT_FPS, help="frame rates for the budget column")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--stages", nargs="+", help="only run these stages")
+    parser.add_argument("--iface", help="send through AF_PACKET on this interface (e.g. lo) instead of the null sink")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="compare against this JSON file")
+    parser.add_argument("--save-baseline", help="also store the results as new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown vs. baseline (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes, args.fps, args.iterations, args.iface,
+                             set(args.stages) if args.stages else None)
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "machine": platform.machine(),
+            "node": platform.node(),
+            "python": platform.python_version(),
+            "iterations": args.iterations,
+            "sink": args.iface or "null",
+        },
+        "results": results,
+    }
+    for r in results:
+        budget = " ".join(f"{fps}fps={pct}%" for fps, pct in r["budget_pct"].items())
+        print(f"{r['stage']:<18} {r['size']:>8}  mean {r['mean_ms']:>9.4f} ms  "
+              f"p99 {r['p99_ms']:>9.4f} ms  budget {budget}")
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for stage, size, ref, cur, ratio in regressions:
+            print(f"REGRESSION {stage} {size}: {ref:.4f} ms -> {cur:.4f} ms ({ratio:.2f}x)")
+        if regressions:
+            return 1
+        print("No regressions against baseline.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
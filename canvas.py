@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+
+import json
+import time
+import weakref
+import logging
+import threading
+from ethernet import L2Ethernet
+from sending import CompiledFrame, SenderSession
+from thread_manager import ThreadManager
+from constants import TX_MODE_SENDMMSG, ETH_HEADER_LEN, ROW_HEADER_LEN
+
+BROADCAST_MAC = b"\xff" * 6
+
+def _parse_mac(value):
+    return bytes.fromhex(value.replace(":", "").replace("-", ""))
+
+class CanvasTile:
+    """Eine Empfängerkarte der Videowand: Schnittstelle, MAC und Bereich auf der Leinwand.
+
+    ``x``/``y`` sind zugleich die Offsets im 0x5500-Header (Pixel-Offset bzw. Zeilennummer).
+    """
+
+    def __init__(self, interface, mac, x, y, columns, rows):
+        self.interface = interface
+        self.mac = mac
+        self.x = x
+        self.y = y
+        self.columns = columns
+        self.rows = rows
+
+def load_layout(path):
+    """Liest ein Wand-Layout (JSON) und liefert (src_mac oder None, [CanvasTile]).
+
+    Format: {"src_mac": "22:22:33:44:55:66",
+             "tiles": [{"interface": "eth0", "mac": "11:22:33:44:55:66",
+                        "x": 0, "y": 0, "columns": 128, "rows": 64}, ...]}
+    """
+    with open(path) as f:
+        layout = json.load(f)
+    tiles = [CanvasTile(t["interface"], _parse_mac(t["mac"]), int(t.get("x", 0)), int(t.get("y", 0)),
+                        int(t["columns"]), int(t["rows"]))
+             for t in layout["tiles"]]
+    if not tiles:
+        raise ValueError(f"No tiles defined in {path}")
+    src_mac = layout.get("src_mac")
+    return (_parse_mac(src_mac) if src_mac else None), tiles
+
+class _TileView:
+    # Zeilenpakete einer Kachel ohne Kopie: Header aus dem CompiledFrame der Kachel, Pixel als Slices
+    # des Leinwand-Frames; sendmmsg/sendmsg setzen beides per Scatter/Gather zusammen.
+    # Bietet, was SenderSession.send_frame von einem CompiledFrame braucht
+    def __init__(self, frame, tile, canvas):
+        self.valid_rows = frame.valid_rows
+        self.segments = frame.segments
+        self.row_packet_indices = frame.row_packet_indices
+        self.batch = None                       # PacketBatch, baut SenderSession beim ersten Senden
+        header_len = ETH_HEADER_LEN + ROW_HEADER_LEN
+        view = memoryview(canvas.buffer)
+        packets = iter(frame.packets)
+        self.packets = []
+        for row in range(frame.valid_rows):
+            base = (tile.y + row) * canvas.row_stride + canvas.pixel_offset + tile.x * 3
+            for start, count in frame.segments:
+                packet = next(packets)
+                header = packet[0] if type(packet) is tuple else packet[:header_len]
+                self.packets.append((header, view[base + start * 3:base + (start + count) * 3]))
+
+class _InterfaceGroup:
+    # Alle Karten an einer Netzwerkkarte; wird von genau einem Thread gesendet
+    def __init__(self, l2):
+        self.l2 = l2
+        self.cards = []                         # (tile, SenderSession, CompiledFrame nur mit den Headern)
+        self.go = threading.Event()
+        self.done = threading.Event()
+        self.finished = 0                       # Nummer des zuletzt abgeschlossenen Auftrags
+        self.sent = 0
+        self.packets = 0
+        self.error = None                       # Sendefehler des Workers, im Sende-Thread erneut ausgelöst
+
+class TiledCanvas:
+    """Logische Leinwand über mehrere Empfängerkarten an einer oder mehreren Netzwerkkarten.
+
+    Hat dieselbe Sende-Schnittstelle wie SenderSession (send_frame, set_brightness), sodass
+    alle Frame-Quellen unverändert einen CompiledFrame in Leinwandgröße liefern. Die Pakete
+    einer Kachel bestehen aus ihren eigenen Headern und Zeilen-Slices dieses Frames und werden
+    ohne Kopie direkt aus dem Leinwandpuffer gesendet (je Leinwand-Frame einmal aufgebaut).
+    Die erste Schnittstelle sendet im aufrufenden Sende-Thread, jede weitere in einem eigenen
+    Worker-Thread; alle starten zur selben Deadline und der Frame gilt erst als gesendet,
+    wenn alle fertig sind. sendmmsg gibt den GIL frei, daher skaliert der Durchsatz mit den NICs.
+    """
+
+    def __init__(self, tiles, src_mac, brightness_percent, tx_mode=TX_MODE_SENDMMSG, transport=None):
+        # transport: weitere L2Ethernet-Optionen (sndbuf, qdisc_bypass, blocking, backpressure, jumbo)
+        self.tiles = tiles
+        self.src_mac = src_mac
+        self.dest_mac = BROADCAST_MAC           # Platzhalter: Leinwand-Frames selbst werden nie gesendet
+        self.columns = max(t.x + t.columns for t in tiles)
+        self.rows = max(t.y + t.rows for t in tiles)
+        self.groups = []
+        self.timeout = 1.0                      # max. Wartezeit auf die Worker pro Frame
+        self._job = None                        # (Nummer, Kachel-Views je Gruppe, Zeilen, Budget)
+        self._seq = 0
+        self._views = weakref.WeakKeyDictionary()   # Leinwand-Frame -> Kachel-Views je Gruppe
+        self.last_packets = 0
+        self.workers = ThreadManager()
+        groups = {}
+        try:
+            for tile in tiles:
+                group = groups.get(tile.interface)
+                if group is None:
+                    l2 = L2Ethernet(tile.interface, tx_mode, **(transport or {}))
+                    l2.open()
+                    if l2.socket is None:
+                        raise Exception(f"Failed to open interface {tile.interface}.")
+                    group = groups[tile.interface] = _InterfaceGroup(l2)
+                    self.groups.append(group)
+                group.cards.append((tile,
+                                    SenderSession(group.l2, src_mac, tile.mac, brightness_percent),
+                                    CompiledFrame(src_mac, tile.mac, None, tile.columns, tile.rows,
+                                                  tile.x, tile.y, max_pixels=group.l2.row_pixels)))
+        except Exception:
+            self.close()
+            raise
+        for group in self.groups[1:]:
+            self.workers.start_thread(self._run_group, group)
+
+    @property
+    def setup(self):
+        return self.groups[0].cards[0][1].setup
+
+    @property
+    def brightness_percent(self):
+        return self.setup.brightness_percent
+
+    @property
+    def tx_mode(self):
+        return self.groups[0].l2.tx_mode
+
+    def set_tx_mode(self, mode):
+        active = mode
+        for group in self.groups:
+            active = group.l2.set_tx_mode(mode)
+        return active
+
+    @property
+    def links(self):
+        return [group.l2 for group in self.groups]
+
+    def set_brightness(self, brightness_percent):
+        changed = False
+        for group in self.groups:
+            for _, session, _ in group.cards:
+                changed = session.set_brightness(brightness_percent) or changed
+        return changed
+
+    def send_frame(self, compiled, rows=None, timeout=None):
+        # compiled: Frame in Leinwandgröße; rows: geänderte Leinwandzeilen (Delta-Modus) oder None;
+        # timeout: Wartebudget bei vollem Puffer, gilt für jede Schnittstelle parallel
+        views = self._views.get(compiled)
+        if views is None:
+            if (compiled.column_count, compiled.valid_rows) != (self.columns, self.rows):
+                raise ValueError(f"Canvas frame is {compiled.column_count}x{compiled.valid_rows}, "
+                                 f"expected {self.columns}x{self.rows}.")
+            views = self._views[compiled] = [[_TileView(frame, tile, compiled) for tile, _, frame in group.cards]
+                                             for group in self.groups]
+        self._seq += 1
+        seq = self._seq
+        self._job = (seq, views, rows, timeout)
+        workers = self.groups[1:]
+        for group in workers:
+            group.go.set()
+        first = self.groups[0]
+        sent = self._send_group(first, views[0], rows, timeout)
+        packets = first.packets
+        error = None
+        for group in workers:
+            if not self._wait(group, seq):
+                # Kein OSError: ein hängender Worker ist kein einzelner verlorener Frame
+                raise RuntimeError(f"Canvas: {group.l2.interface_name} missed the frame deadline.")
+            sent += group.sent
+            packets += group.packets
+            error = error or group.error
+        self.last_packets = packets
+        if error:
+            raise error
+        return sent
+
+    def _wait(self, group, seq):
+        # Auf Auftrag ``seq`` warten; Meldungen eines verspäteten Workers zu älteren Frames verwerfen
+        deadline = time.perf_counter() + self.timeout
+        while group.finished != seq:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0 or not group.done.wait(remaining):
+                return False
+            group.done.clear()
+        return True
+
+    def _send_group(self, group, views, rows, timeout=None):
+        sent = 0
+        group.packets = 0
+        for (tile, session, _), view in zip(group.cards, views):
+            tile_rows = None
+            if rows is not None:
+                tile_rows = rows[(rows >= tile.y) & (rows < tile.y + tile.rows)] - tile.y
+            sent += session.send_frame(view, tile_rows, timeout)
+            group.packets += session.last_packets
+        return sent
+
+    def _run_group(self, stop_event, group):
+        # Worker für eine weitere Schnittstelle; Signatur passend zu ThreadManager.start_thread
+        index = self.groups.index(group)
+        while not stop_event.is_set():
+            if not group.go.wait(0.2):
+                continue
+            group.go.clear()
+            seq, views, rows, timeout = self._job
+            if seq != group.finished + 1:
+                rows = None                     # Auftrag übersprungen: Kacheln komplett neu senden
+            group.error = None
+            try:
+                group.sent = self._send_group(group, views[index], rows, timeout)
+            except Exception as e:
+                group.error = e
+                group.sent = 0
+            group.finished = seq                # erst nach sent/packets/error: gilt als Freigabe
+            group.done.set()
+
+    def close(self):
+        self.workers.stop_all()
+        for group in self.groups:
+            try:
+                group.l2.close()
+            except Exception as e:
+                logging.error(f"Error closing {group.l2.interface_name}: {e}")
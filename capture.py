@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Mitschnitt und Wiedergabe der gesendeten Pakete als pcap (Nanosekunden-Zeitstempel).
+
+PcapRecorder wird an L2Ethernet gehängt (set_recorder) und schreibt jedes Paket mit, das der
+Socket angenommen hat - ohne GUI, Dekodierung oder Laufschrift lässt sich ein Fehlerbild aus
+dem Feld später exakt wieder abspielen. replay() sendet eine Aufzeichnung über denselben
+Transport (sendmmsg/einzeln) im Originaltakt, skaliert oder so schnell wie möglich und misst
+dabei erreichte Rate und Zeitfehler; mit speed=0 ist das ein reiner Durchsatztest der
+Sendeschicht. Die Dateien lassen sich direkt in Wireshark/tcpdump öffnen.
+
+Beispiel:
+    python3 cli.py play bild.png --iface eth0 --record feld.pcap
+    python3 cli.py replay feld.pcap --iface veth0 --speed 2
+"""
+import mmap
+import time
+import queue
+import struct
+import logging
+import threading
+from constants import TX_MODE_SENDMMSG, SENDMMSG_MAX_VLEN, CAPTURE_QUEUE_CALLS, CAPTURE_BUFFER_BYTES
+from ethernet import PacketBatch, FrameDropped
+from telemetry import Histogram
+from thread_manager import ThreadManager
+
+PCAP_MAGIC_US = 0xA1B2C3D4
+PCAP_MAGIC_NS = 0xA1B23C4D
+LINKTYPE_ETHERNET = 1
+SNAPLEN = 65535
+_GLOBAL_HEADER = struct.Struct("=IHHiIII")      # Magic, Version 2.4, Zeitzone, Genauigkeit, Snaplen, Linktyp
+_RECORD_HEADER = struct.Struct("=IIII")         # Sekunden, Nano-/Mikrosekunden, gespeicherte/echte Länge
+
+class PcapRecorder:
+    """Schreibt gesendete Pakete als pcap mit Nanosekunden-Zeitstempeln (Linktyp Ethernet).
+
+    Der Sende-Thread kopiert in record() nur die Pakete eines Sendeaufrufs in einen Block und
+    legt ihn in eine begrenzte Queue; Record-Header und Schreiben übernimmt ein eigener Thread,
+    der alles Anstehende gesammelt in einen großen Dateipuffer schreibt. Ist die Queue voll,
+    werden die Pakete verworfen und gezählt, statt den Sendepfad zu bremsen.
+    """
+
+    def __init__(self, path, queue_size=CAPTURE_QUEUE_CALLS, buffer_bytes=CAPTURE_BUFFER_BYTES):
+        self.path = path
+        self._file = open(path, "wb", buffering=buffer_bytes)
+        self._file.write(_GLOBAL_HEADER.pack(PCAP_MAGIC_NS, 2, 4, 0, 0, SNAPLEN, LINKTYPE_ETHERNET))
+        self._queue = queue.Queue(queue_size)
+        self.packets = 0                        # geschrieben (Schreib-Thread)
+        self.bytes = 0
+        self.dropped = 0                        # Queue voll (Sende-Thread)
+        self.workers = ThreadManager()
+        self._thread = self.workers.start_thread(self._run)
+
+    def record(self, timestamp_ns, packets):
+        # Aus dem Sende-Thread: Puffer werden wiederverwendet, daher einmal als Block kopieren.
+        # Geteilte Zeilen kommen als Tupel (Header, Pixel) und werden zu einem Paket zusammengesetzt
+        if any(type(p) is tuple for p in packets):
+            lengths = [sum(map(len, p)) if type(p) is tuple else len(p) for p in packets]
+            data = b"".join(part for p in packets for part in (p if type(p) is tuple else (p,)))
+        else:
+            lengths = [len(p) for p in packets]
+            data = b"".join(packets)
+        try:
+            self._queue.put_nowait((timestamp_ns, data, lengths))
+        except queue.Full:
+            self.dropped += len(packets)
+
+    def _run(self, stop_event):
+        # Signatur passend zu ThreadManager.start_thread(target(stop_event)); leert die Queue auch nach dem Stop
+        while True:
+            try:
+                items = [self._queue.get(timeout=0.2)]
+            except queue.Empty:
+                if stop_event.is_set():
+                    break
+                self._file.flush()              # ruhige Phase: Aufgezeichnetes sicher auf die Platte
+                continue
+            while True:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._write(items)
+
+    def _write(self, items):
+        out = bytearray()
+        pack = _RECORD_HEADER.pack
+        packets = 0
+        for timestamp_ns, data, lengths in items:
+            sec, nsec = divmod(timestamp_ns, 1_000_000_000)
+            view = memoryview(data)
+            offset = 0
+            for length in lengths:
+                out += pack(sec, nsec, length, length)
+                out += view[offset:offset + length]
+                offset += length
+            packets += len(lengths)
+            self.bytes += offset
+        self._file.write(out)
+        self.packets += packets
+
+    def stats(self):
+        return {"path": self.path, "packets": self.packets, "bytes": self.bytes,
+                "dropped": self.dropped, "queued": self._queue.qsize()}
+
+    def close(self):
+        # Erst alle angenommenen Pakete schreiben, dann die Datei schließen
+        thread = self._thread
+        self.workers.stop_all()
+        thread.join()
+        self._file.close()
+        logging.info(f"Capture {self.path}: {self.packets} packets, {self.bytes} bytes, {self.dropped} dropped")
+
+class Capture:
+    """Per mmap geöffnete pcap-Datei: ``records`` = [(Zeitstempel_ns, memoryview)] ohne Kopie.
+
+    Liest pcap mit Mikro- oder Nanosekunden-Zeitstempeln in beiden Byte-Reihenfolgen (Linktyp Ethernet).
+    Die Abbildung ist copy-on-write, damit PacketBatch die Pakete direkt referenzieren kann.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        self.records = []
+        try:
+            self._parse()
+        except Exception:
+            self.close()
+            raise
+
+    def _parse(self):
+        data = memoryview(self._map)
+        if len(data) < _GLOBAL_HEADER.size:
+            raise ValueError(f"{self.path}: not a pcap file")
+        for order in ("<", ">"):
+            magic, = struct.unpack_from(order + "I", data)
+            if magic in (PCAP_MAGIC_US, PCAP_MAGIC_NS):
+                break
+        else:
+            raise ValueError(f"{self.path}: not a pcap file (pcapng is not supported)")
+        scale = 1 if magic == PCAP_MAGIC_NS else 1000
+        linktype = struct.unpack_from(order + "I", data, 20)[0] & 0xFFFF
+        if linktype != LINKTYPE_ETHERNET:
+            raise ValueError(f"{self.path}: link type {linktype} is not Ethernet")
+        header = struct.Struct(order + "IIII")
+        offset = _GLOBAL_HEADER.size
+        end = len(data)
+        records = self.records
+        while offset + header.size <= end:
+            sec, frac, length, _ = header.unpack_from(data, offset)
+            offset += header.size
+            if offset + length > end:
+                logging.warning(f"{self.path}: truncated record at offset {offset}")
+                break
+            records.append((sec * 1_000_000_000 + frac * scale, data[offset:offset + length]))
+            offset += length
+
+    def bursts(self):
+        # Pakete mit gleichem Zeitstempel = ein Sendeaufruf (ein Frame) -> [(Zeitstempel_ns, [Pakete])]
+        bursts = []
+        for timestamp, packet in self.records:
+            if bursts and bursts[-1][0] == timestamp:
+                bursts[-1][1].append(packet)
+            else:
+                bursts.append((timestamp, [packet]))
+        return bursts
+
+    def close(self):
+        self.records = []
+        try:
+            self._map.close()
+        except BufferError:
+            pass                                # noch referenzierte Pakete (PacketBatch): GC räumt auf
+
+def replay(l2, path, speed=1.0, loops=1, stop_event=None, spin_s=0.001):
+    """Sendet eine Aufzeichnung über ``l2`` erneut; liefert erreichte Rate und Zeitfehler als dict.
+
+    speed: 1.0 = Originaltakt, 2.0 = doppelt so schnell, 0 = so schnell wie möglich (Durchsatztest,
+    dann in Blöcken von SENDMMSG_MAX_VLEN Paketen). loops: Durchläufe (0 = bis stop_event).
+    Gewartet wird wie in FrameClock: grob per stop_event.wait(), zuletzt aktiv auf perf_counter().
+    Alle Sendeaufrufe werden vor dem Start vorbereitet, gemessen wird nur der Sendepfad.
+    """
+    stop_event = stop_event or threading.Event()
+    capture = Capture(path)
+    try:
+        bursts = capture.bursts()
+        if not bursts:
+            raise ValueError(f"{path}: no packets")
+        first = bursts[0][0]
+        span = (bursts[-1][0] - first) / 1e9
+        if len(bursts) > 1:
+            span += span / (len(bursts) - 1)    # mittlerer Abstand vor dem nächsten Durchlauf
+        if not speed:
+            packets = [packet for _, burst in bursts for packet in burst]
+            bursts = [(first, packets[i:i + SENDMMSG_MAX_VLEN]) for i in range(0, len(packets), SENDMMSG_MAX_VLEN)]
+        batched = l2.tx_mode == TX_MODE_SENDMMSG
+        calls = [((timestamp - first) / 1e9 / speed if speed else 0.0,
+                  PacketBatch(burst) if batched else burst, len(burst), sum(len(p) for p in burst))
+                 for timestamp, burst in bursts]
+        return _replay(l2, calls, span / speed if speed else 0.0, bool(speed), loops, stop_event, spin_s)
+    finally:
+        capture.close()
+
+def _replay(l2, calls, span, timed, loops, stop_event, spin_s):
+    send = l2.send_batch if l2.tx_mode == TX_MODE_SENDMMSG else l2.send_packets
+    clock = time.perf_counter
+    error = Histogram(bucket_s=1e-6, buckets=100000)   # 1-µs-Auflösung bis 100 ms
+    dropped_before = l2.counters["packets_dropped"]
+    packets = sent_bytes = count = errors = 0
+    loop = 0
+    start = clock() + 0.01                      # etwas Vorlauf, damit der erste Aufruf nicht schon zu spät ist
+    while not stop_event.is_set() and (not loops or loop < loops):
+        base = start + loop * span
+        for offset, item, n, size in calls:
+            if timed:
+                target = base + offset
+                remaining = target - clock() - spin_s
+                if remaining > 0 and stop_event.wait(remaining):
+                    break
+                while clock() < target:
+                    pass
+                error.record(clock() - target)
+            elif stop_event.is_set():
+                break
+            try:
+                send(item)
+                packets += n
+                sent_bytes += size
+            except FrameDropped as e:
+                packets += e.sent
+                errors += 1
+            except OSError as e:
+                errors += 1
+                logging.debug(f"Replay send failed: {e}")
+            count += 1
+        loop += 1
+    elapsed = max(clock() - start, 1e-9)
+    stats = {"packets": packets, "bytes": sent_bytes, "calls": count, "seconds": round(elapsed, 6),
+             "pps": round(packets / elapsed, 1), "mbit_s": round(sent_bytes * 8 / elapsed / 1e6, 3),
+             "calls_per_s": round(count / elapsed, 2), "send_errors": errors,
+             "packets_dropped": l2.counters["packets_dropped"] - dropped_before, "loops": loop}
+    if timed:
+        stats["error"] = error.snapshot(scale=1e6, unit="us")
+    return stats
+
+def format_report(stats):
+    line = (f"{stats['packets']} packets / {stats['bytes']} bytes in {stats['seconds']:.3f} s: "
+            f"{stats['pps']:.0f} pps, {stats['mbit_s']:.1f} Mbit/s, {stats['calls_per_s']:.1f} send calls/s, "
+            f"{stats['send_errors']} errors, {stats['packets_dropped']} packets dropped")
+    error = stats.get("error")
+    if error:
+        line += (f"; timing error p50/p99/max {error['p50_us']}/{error['p99_us']}/{error['max_us']} us")
+    return line
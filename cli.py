@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Headless-Player ohne Tk (Kiosk-Pi ohne X, systemd, SSH).
+
+Nutzt denselben LEDController wie die GUI, nur mit einer HeadlessView. Schwere
+Module (PIL, NumPy, netifaces) werden erst geladen, wenn ein Befehl sie braucht.
+    python3 cli.py play --iface eth0 --fps 120 images/*.png
+    python3 cli.py play --iface eth0 --columns 128 --rows 64 --sequence frames/
+    python3 cli.py marquee --iface eth0 --speed 2 "Hello World"
+    python3 cli.py marquee --iface eth0 --background clip.gif --logo logo.png --logo-position 96 0 "News"
+    python3 cli.py ingest --iface eth0 --fps 120
+    python3 cli.py play --iface eth0 --interval 5 --transition crossfade images/
+    python3 cli.py playlist --iface eth0 show.json
+    python3 cli.py play --iface eth0 --sender-process --sender-cpu 3 images/
+    python3 cli.py scan --iface eth0
+    python3 cli.py daemon --iface eth0 --interval 10 --pidfile /run/ledplayer.pid /srv/led/images
+"""
+import os
+import sys
+import glob
+import signal
+import logging
+import argparse
+from constants import ADAPTIVE_REFRESH, KEEPALIVE_FPS, JUMBO_FRAMES, SENDER_PROCESS, SENDER_PROCESS_CPU
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".gif", ".webp", ".tif", ".tiff")
+
+def _parse_color(value):
+    # "#RRGGBB", "RRGGBB" oder "r,g,b"
+    if "," in value:
+        return tuple(int(v) for v in value.split(","))
+    value = value.lstrip("#")
+    return tuple(int(value[i:i + 2], 16) for i in (0, 2, 4))
+
+def expand_paths(inputs):
+    # Globs auflösen, Ordner durch die enthaltenen Bilder ersetzen (natürliche Sortierung wie im Streaming)
+    paths = []
+    for item in inputs:
+        matches = sorted(glob.glob(item)) or [item]
+        for path in matches:
+            if os.path.isdir(path):
+                from streaming import list_sequence
+                paths.extend(list_sequence(path))
+            elif path.lower().endswith(IMAGE_EXTENSIONS) and os.path.exists(path):
+                paths.append(path)
+            else:
+                logging.warning(f"Skipping {path}")
+    return paths
+
+def _add_transport(group):
+    group.add_argument("--tx-mode", choices=("sendmmsg", "single"), default="sendmmsg")
+    group.add_argument("--on-full", choices=("retry", "drop"), default="retry",
+                       help="full send buffer/NIC queue: retry until the next frame deadline, or drop the frame")
+    group.add_argument("--sndbuf", type=int, help="socket send buffer in bytes (default: constants.TX_SNDBUF_BYTES)")
+    group.add_argument("--no-qdisc-bypass", action="store_true", help="send through the interface qdisc")
+    group.add_argument("--blocking", action="store_true", help="blocking sends instead of non-blocking + poll")
+
+def _transport_options(args):
+    # weitere L2Ethernet-Optionen; nicht angegebene bleiben auf den Standardwerten aus constants.py
+    transport = {}
+    if args.sndbuf:
+        transport["sndbuf"] = args.sndbuf
+    if args.no_qdisc_bypass:
+        transport["qdisc_bypass"] = False
+    if args.blocking:
+        transport["blocking"] = True
+    return transport
+
+def _add_common(parser):
+    target = parser.add_argument_group("output")
+    target.add_argument("--iface", help="network interface of the receiver card (e.g. eth0)")
+    target.add_argument("--canvas", help="JSON layout of a multi-card video wall (instead of --iface)")
+    target.add_argument("--src-mac", default="22:22:33:44:55:66")
+    target.add_argument("--dst-mac", default="11:22:33:44:55:66")
+    target.add_argument("--columns", type=int, help="panel width; skips card detection together with --rows")
+    target.add_argument("--rows", type=int, help="panel height")
+    target.add_argument("--detect-timeout", type=float, default=2.0, help="seconds to wait for the card reply")
+    _add_transport(target)
+    target.add_argument("--jumbo", action="store_true", default=JUMBO_FRAMES,
+                        help="row packets up to the interface MTU instead of 1500 bytes (card and switch must support it)")
+    target.add_argument("--record", metavar="PCAP", help="record every transmitted packet to this pcap file")
+    playback = parser.add_argument_group("playback")
+    playback.add_argument("--fps", type=int, default=60)
+    playback.add_argument("--brightness", type=int, default=50, help="percent")
+    playback.add_argument("--delta", action="store_true", help="send only changed rows")
+    playback.add_argument("--keyframe-interval", type=int, default=60)
+    playback.add_argument("--adaptive", action="store_true", default=ADAPTIVE_REFRESH,
+                          help="send unchanged content only at the keep-alive rate, full rate on the next change")
+    playback.add_argument("--keepalive-fps", type=int, default=KEEPALIVE_FPS, help="refresh rate for unchanged content")
+    playback.add_argument("--duration", type=float, default=0, help="stop after N seconds (0 = run until signal)")
+    playback.add_argument("--sender-process", action="store_true", default=SENDER_PROCESS,
+                          help="run socket, pacing and packet build in a separate process (frames via shared memory)")
+    playback.add_argument("--sender-cpu", type=int, default=SENDER_PROCESS_CPU, metavar="N",
+                          help="pin the sender process to this CPU core (-1 = no pinning)")
+    color = parser.add_argument_group("colour correction")
+    color.add_argument("--gamma", type=float, default=1.0)
+    color.add_argument("--white-point", type=int, default=6500, help="Kelvin")
+    color.add_argument("--gain", type=float, nargs=3, default=(1.0, 1.0, 1.0), metavar=("R", "G", "B"))
+    color.add_argument("--dither", choices=("none", "ordered", "temporal"), default="none")
+    parser.add_argument("-v", "--verbose", action="store_true", help="debug logging (incl. per-second performance)")
+
+def _add_images(parser):
+    parser.add_argument("paths", nargs="+", help="images, animations, folders or glob patterns")
+    parser.add_argument("--interval", type=float, default=5.0, help="seconds per image (0 = show the first only)")
+    parser.add_argument("--sequence", action="store_true",
+                        help="play a single folder as numbered image sequence (one image per frame)")
+    parser.add_argument("--transition", choices=("cut", "crossfade", "wipe", "slide"), default="cut",
+                        help="transition between images")
+    parser.add_argument("--transition-time", type=float, default=0.5, help="seconds")
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Headless Colorlight 5A-75 player")
+    commands = parser.add_subparsers(dest="command", required=True)
+    play = commands.add_parser("play", help="play images, animations or an image sequence")
+    _add_common(play)
+    _add_images(play)
+    marquee = commands.add_parser("marquee", help="scroll a text")
+    _add_common(marquee)
+    marquee.add_argument("text")
+    marquee.add_argument("--font-size", type=int, default=24)
+    marquee.add_argument("--direction", choices=("left", "right", "up", "down"), default="left")
+    marquee.add_argument("--speed", type=int, default=1, help="pixels per frame")
+    marquee.add_argument("--text-color", type=_parse_color, default=(255, 255, 255))
+    marquee.add_argument("--bg-color", type=_parse_color, default=(0, 0, 0))
+    marquee.add_argument("--margin-x", type=int, default=0)
+    marquee.add_argument("--margin-y", type=int, default=0)
+    marquee.add_argument("--background", help="image, animation or folder under the text; 'live' = shared-memory input")
+    marquee.add_argument("--logo", help="image (PNG with transparency) drawn on top")
+    marquee.add_argument("--logo-position", type=int, nargs=2, default=(0, 0), metavar=("X", "Y"))
+    marquee.add_argument("--logo-opacity", type=float, default=1.0, help="0..1")
+    ingest = commands.add_parser("ingest", help="show live frames pushed by other processes (shared memory)")
+    _add_common(ingest)
+    ingest.add_argument("--socket", default=None, help="control socket path (default: constants.INGEST_SOCKET_PATH)")
+    playlist = commands.add_parser("playlist", help="play a JSON playlist (durations, loops and transitions per item)")
+    _add_common(playlist)
+    playlist.add_argument("file")
+    replay = commands.add_parser("replay", help="retransmit a pcap recording and report rate and timing error")
+    replay.add_argument("file")
+    replay.add_argument("--iface", required=True)
+    replay.add_argument("--speed", type=float, default=1.0, help="1 = original timing, 2 = twice as fast")
+    replay.add_argument("--max", action="store_true", help="send as fast as possible (transport throughput)")
+    replay.add_argument("--loops", type=int, default=1, help="passes over the recording (0 = until signal)")
+    _add_transport(replay)
+    replay.add_argument("--json", action="store_true", help="print the report as JSON")
+    replay.add_argument("-v", "--verbose", action="store_true")
+    scan = commands.add_parser("scan", help="list all receiver cards on an interface")
+    scan.add_argument("--iface", required=True)
+    scan.add_argument("--src-mac", default="22:22:33:44:55:66")
+    scan.add_argument("--timeout", type=float, default=1.0, help="seconds to collect replies")
+    scan.add_argument("-v", "--verbose", action="store_true")
+    daemon = commands.add_parser("daemon", help="long-running player: reconnects on errors, SIGHUP reloads the images")
+    _add_common(daemon)
+    _add_images(daemon)
+    daemon.add_argument("--pidfile")
+    daemon.add_argument("--log-file")
+    daemon.add_argument("--retry", type=float, default=5.0, help="seconds between reconnect attempts")
+    return parser
+
+class HeadlessPlayer:
+    """Verbindet Kommandozeile, HeadlessView und LEDController."""
+
+    def __init__(self, args):
+        from headless import HeadlessView
+        from controller import LEDController
+        self.args = args
+        self.view = HeadlessView(
+            interface=args.iface or "", src_mac=args.src_mac, dst_mac=args.dst_mac,
+            brightness=args.brightness, tx_mode=args.tx_mode, backpressure=args.on_full, jumbo=args.jumbo,
+            fps=args.fps, delta=args.delta,
+            keyframe_interval=args.keyframe_interval, adaptive=args.adaptive, keepalive_fps=args.keepalive_fps,
+            gamma=args.gamma, color_temp=args.white_point,
+            gain=tuple(args.gain), dither=args.dither, sender_process=args.sender_process,
+            sender_cpu=args.sender_cpu, prompts={"canvas_layout": args.canvas})
+        self.ctrl = LEDController(self.view)
+        self.ctrl.transport.update(_transport_options(args))
+        if args.record:
+            self.ctrl.start_recording(args.record)
+
+    def connect(self):
+        if self.args.canvas:
+            self.ctrl.load_canvas()
+            if self.ctrl.canvas is None:
+                raise RuntimeError(f"Could not load canvas {self.args.canvas}")
+        elif self.args.iface:
+            self.ctrl.connect(self.args.iface, self.args.columns, self.args.rows, self.args.detect_timeout)
+        else:
+            raise RuntimeError("Either --iface or --canvas is required.")
+        logging.info(f"Output {self.ctrl.columns}x{self.ctrl.rows}")
+
+    def play(self):
+        args = self.args
+        if args.sequence:
+            if len(args.paths) != 1 or not os.path.isdir(args.paths[0]):
+                raise RuntimeError("--sequence expects exactly one folder.")
+            self.ctrl.start_stream(args.paths[0])
+            return
+        paths = expand_paths(args.paths)
+        if not paths:
+            raise RuntimeError("No images found.")
+        self.ctrl.load_images(paths)            # im Hintergrund vorladen, die Playlist liest aus dem Cache
+        if len(paths) == 1 or args.interval <= 0:
+            self.ctrl.send_current_image()
+            return
+        # Diashow als Playlist: weitergeschaltet wird im Sende-Thread, genau zur Frame-Deadline
+        from playlist import PlaylistItem
+        items = [PlaylistItem.from_path(path, args.interval, transition=args.transition,
+                                        transition_s=args.transition_time) for path in paths]
+        if not self.ctrl.start_playlist(items, positions=list(range(len(paths)))):
+            raise RuntimeError("Slideshow could not be started.")
+
+    def playlist(self):
+        self.view.prompts["playlist"] = self.args.file
+        self.ctrl.play_playlist()
+        if self.ctrl.sender.published is None:
+            raise RuntimeError(f"Playlist {self.args.file} could not be started.")
+
+    def marquee(self):
+        args = self.args
+        self.view.prompts["marquee_config"] = {
+            "text": args.text, "font_size": args.font_size, "text_color": args.text_color,
+            "bg_color": args.bg_color, "direction": args.direction,
+            "margin_x": args.margin_x, "margin_y": args.margin_y, "speed": args.speed,
+            "background": args.background, "logo": args.logo,
+            "logo_position": tuple(args.logo_position), "logo_opacity": args.logo_opacity,
+        }
+        self.ctrl.show_marquee_dialog()
+        self.ctrl.start_marquee()
+
+    def ingest(self):
+        if self.args.socket:
+            self.ctrl.start_ingest(self.args.socket)
+        else:
+            self.ctrl.start_ingest()
+        if self.ctrl.ingest is None:
+            raise RuntimeError("Live input could not be opened.")
+
+    def run(self):
+        # Ereignisschleife im Hauptthread bis Signal oder --duration
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, lambda signum, frame: self.view.close())
+        if self.args.duration:
+            self.view.schedule(int(self.args.duration * 1000), self.view.close)
+        try:
+            self.view.run()
+        finally:
+            self.ctrl.quit_app()
+
+class Daemon(HeadlessPlayer):
+    # Wie play, aber: Neuverbindung bei Fehlern, SIGHUP lädt die Bildliste neu, optional PID-Datei
+    def start(self):
+        try:
+            self.connect()
+            self.play()
+        except Exception as e:
+            logging.error(f"Start failed: {e}; retrying in {self.args.retry:g} s")
+            self.view.schedule(int(self.args.retry * 1000), self.start)
+
+    def reload(self):
+        logging.info("Reloading images.")
+        try:
+            self.play()
+        except Exception as e:
+            logging.error(f"Reload failed: {e}")
+
+    def run(self):
+        if self.args.pidfile:
+            with open(self.args.pidfile, "w") as f:
+                f.write(f"{os.getpid()}\n")
+        # Signal-Handler laufen im Hauptthread; die eigentliche Arbeit in der Ereignisschleife
+        signal.signal(signal.SIGHUP, lambda signum, frame: self.view.schedule(0, self.reload))
+        self.view.schedule(0, self.start)
+        try:
+            super().run()
+        finally:
+            if self.args.pidfile and os.path.exists(self.args.pidfile):
+                os.remove(self.args.pidfile)
+
+def scan(args):
+    # Ohne Controller: nur Erkennung, Ausgabe als Tabelle, Ergebnis landet im Geometrie-Cache
+    from discovery import GeometryCache, discover, format_mac, parse_mac
+    from constants import GEOMETRY_CACHE_PATH
+    cards = discover(args.iface, parse_mac(args.src_mac), timeout=args.timeout)
+    GeometryCache(GEOMETRY_CACHE_PATH).update(cards)
+    for card in cards:
+        print(f"{format_mac(card.mac)}  {card.columns}x{card.rows}  {card.reply_ms:.2f} ms")
+    logging.info(f"{len(cards)} card(s) on {args.iface}")
+    return 0 if cards else 1
+
+def replay(args):
+    # Ohne Controller: Aufzeichnung über den normalen Transport erneut senden, Rate und Zeitfehler ausgeben
+    import json
+    import threading
+    from ethernet import L2Ethernet
+    from capture import replay as replay_capture, format_report
+    l2 = L2Ethernet(args.iface, args.tx_mode, backpressure=args.on_full, **_transport_options(args))
+    l2.open()
+    if l2.socket is None:
+        return 1
+    stop_event = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda signum, frame: stop_event.set())
+    try:
+        stats = replay_capture(l2, args.file, 0 if args.max else args.speed, args.loops, stop_event)
+    except (OSError, ValueError) as e:
+        logging.error(str(e))
+        return 1
+    finally:
+        l2.close()
+    print(json.dumps(stats) if args.json else format_report(stats), flush=True)
+    return 0 if stats["packets"] else 1
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    handlers = [logging.StreamHandler(sys.stdout)]
+    if getattr(args, "log_file", None):
+        handlers = [logging.FileHandler(args.log_file)]
+    # vor dem Import des Controllers konfigurieren, dessen basicConfig greift dann nicht mehr
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format="%(asctime)s [%(levelname)s] %(message)s", handlers=handlers)
+
+    if args.command == "scan":
+        return scan(args)
+    if args.command == "replay":
+        return replay(args)
+    if args.command == "daemon":
+        Daemon(args).run()
+        return 0
+    player = HeadlessPlayer(args)
+    try:
+        player.connect()
+        if args.command == "marquee":
+            player.marquee()
+        elif args.command == "ingest":
+            player.ingest()
+        elif args.command == "playlist":
+            player.playlist()
+        else:
+            player.play()
+    except Exception as e:
+        logging.error(str(e))
+        player.ctrl.quit_app()
+        return 1
+    player.run()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+import math
+import threading
+import numpy as np
+
+DITHER_NONE = "none"
+DITHER_ORDERED = "ordered"      # feste 4x4-Bayer-Matrix
+DITHER_TEMPORAL = "temporal"    # Bayer-Matrix, pro Frame verschoben
+DITHER_MODES = (DITHER_NONE, DITHER_ORDERED, DITHER_TEMPORAL)
+
+NEUTRAL_TEMPERATURE = 6500      # Kelvin, entspricht Weißpunkt ohne Korrektur
+
+_BAYER_4X4 = np.array([[0, 8, 2, 10],
+                       [12, 4, 14, 6],
+                       [3, 11, 1, 9],
+                       [15, 7, 13, 5]], dtype=np.uint16) * 16 + 8     # Schwellen 8..248
+
+def _kelvin_to_rgb(kelvin):
+    # Näherung der Schwarzkörperfarbe (Tanner Helland), Kanäle 0..1
+    t = min(max(kelvin, 1000), 40000) / 100.0
+    if t <= 66:
+        r = 255.0
+        g = 99.4708025861 * math.log(t) - 161.1195681661
+        b = 0.0 if t <= 19 else 138.5177312231 * math.log(t - 10) - 305.0447927307
+    else:
+        r = 329.698727446 * (t - 60) ** -0.1332047592
+        g = 288.1221695283 * (t - 60) ** -0.0755148492
+        b = 255.0
+    return [min(max(c, 0.0), 255.0) / 255.0 for c in (r, g, b)]
+
+def white_balance(kelvin):
+    # Kanalfaktoren (R, G, B) relativ zu 6500 K; der stärkste Kanal bleibt bei 1.0
+    target = _kelvin_to_rgb(kelvin)
+    neutral = _kelvin_to_rgb(NEUTRAL_TEMPERATURE)
+    factors = [t / n if n else 1.0 for t, n in zip(target, neutral)]
+    peak = max(factors)
+    return [f / peak for f in factors]
+
+class ColorCorrection:
+    """Farbkorrektur der LED-Module über vorberechnete 256er-Lookup-Tabellen je Kanal.
+
+    Gamma, Farbtemperatur und Kanal-Gain werden beim Ändern der Einstellungen einmal in
+    die Tabellen eingerechnet (update(), Tk-Thread) und per Referenztausch übernommen.
+    Die drei Tabellen liegen hintereinander (3 x 256), sodass apply() alle Kanäle mit einem
+    einzigen np.take über ``Pixel + Kanal * 256`` nachschlägt, R/B-Tausch inklusive, direkt
+    in einen vorhandenen Puffer (z.B. die Zeilenpakete eines CompiledFrame); nur Dithering
+    braucht danach noch einen Durchgang über den uint16-Zwischenpuffer.
+    """
+
+    def __init__(self, gamma=1.0, temperature=NEUTRAL_TEMPERATURE, gain=(1.0, 1.0, 1.0), dither=DITHER_NONE):
+        self.settings = None
+        self._luts = None                       # (LUT uint8 3x256 BGR, LUT uint16 8.8 3x256 BGR, dither, identity)
+        self._thresholds = {}                   # (Zeilen, Spalten) -> gekachelte Bayer-Schwellen je Kanal
+        self._offsets = {}                      # (Zeilen, Spalten) -> Tabellenabschnitt je Kanal (0/256/512)
+        self._scratch = threading.local()       # uint16-Index-/Zwischenpuffer je Thread (Sender, Decoder)
+        self.frame = 0                          # Phase für zeitliches Dithering
+        self.update(gamma, temperature, gain, dither)
+
+    @property
+    def key(self):
+        # Teil des Cache-Schlüssels für farbkorrigierte Frames
+        return self.settings
+
+    @property
+    def identity(self):
+        return self._luts[3]
+
+    def update(self, gamma=1.0, temperature=NEUTRAL_TEMPERATURE, gain=(1.0, 1.0, 1.0), dither=DITHER_NONE):
+        """Übernimmt neue Einstellungen; liefert True, wenn die Tabellen neu gebaut wurden."""
+        gamma = max(float(gamma), 0.05)
+        gain = tuple(max(float(g), 0.0) for g in gain)
+        if dither not in DITHER_MODES:
+            dither = DITHER_NONE
+        settings = (round(gamma, 3), int(temperature), gain, dither)
+        if settings == self.settings:
+            return False
+        wb = white_balance(temperature)
+        levels = (np.arange(256, dtype=np.float64) / 255.0) ** gamma
+        rgb = np.stack([np.clip(levels * wb[c] * gain[c], 0.0, 1.0) * 255.0 for c in range(3)])
+        bgr = rgb[::-1]
+        lut8 = np.rint(bgr).astype(np.uint8).ravel()
+        lut16 = np.rint(bgr * 256.0).astype(np.uint16).ravel()     # max. 65280 + Schwelle 255 passt
+        identity = dither == DITHER_NONE and np.array_equal(lut8, np.tile(np.arange(256, dtype=np.uint8), 3))
+        self._luts = (lut8, lut16, dither, identity)
+        self.settings = settings
+        return True
+
+    def _threshold(self, rows, columns, phase):
+        # Gekachelte Bayer-Matrix (alle drei Kanäle) einmal pro Auflösung (+4 Rand für die Verschiebung),
+        # danach nur Views
+        tiled = self._thresholds.get((rows, columns))
+        if tiled is None:
+            tiled = np.tile(_BAYER_4X4[:, :, None], ((rows + 7) // 4, (columns + 7) // 4, 3))
+            self._thresholds[(rows, columns)] = tiled
+        dy, dx = divmod(phase & 15, 4)
+        return tiled[dy:dy + rows, dx:dx + columns]
+
+    def _offset(self, rows, columns):
+        # Abschnitt der Tabelle je Ausgangskanal, als fertiges Array: uint8 + uint16 ohne Broadcast ist am schnellsten
+        offsets = self._offsets.get((rows, columns))
+        if offsets is None:
+            offsets = np.empty((rows, columns, 3), dtype=np.uint16)
+            offsets[:] = np.arange(3, dtype=np.uint16) * 256
+            self._offsets[(rows, columns)] = offsets
+        return offsets
+
+    def apply(self, src, out, rgb=False):
+        """Korrigiert ``src`` (Zeilen x Spalten x 3, uint8) nach ``out`` (gleiche Form, BGR).
+
+        rgb=True: ``src`` ist RGB und wird dabei nach BGR getauscht, sonst ist ``src`` bereits BGR.
+        """
+        lut8, lut16, dither, identity = self._luts  # einmal lesen: ein Frame nutzt immer einen Stand
+        if rgb:
+            src = src[:, :, ::-1]               # Ausgangskanal c liest damit den passenden Eingangskanal
+        if identity:
+            np.copyto(out, src)
+            return out
+        rows, columns = src.shape[:2]
+        index = getattr(self._scratch, "buffer", None)
+        if index is None or index.shape != (rows, columns, 3):
+            index = self._scratch.buffer = np.empty((rows, columns, 3), dtype=np.uint16)
+        np.add(src, self._offset(rows, columns), out=index)
+        if dither == DITHER_NONE:
+            np.take(lut8, index, out=out, mode="clip")
+            return out
+        phase = self.frame if dither == DITHER_TEMPORAL else 0
+        self.frame += 1
+        np.take(lut16, index, out=index, mode="clip")     # elementweise: Index wird erst gelesen, dann überschrieben
+        index += self._threshold(rows, columns, phase)
+        index >>= 8
+        np.copyto(out, index, casting="unsafe")
+        return out
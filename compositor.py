@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+
+import time
+import numpy as np
+from PIL import Image
+from telemetry import Histogram
+
+class Layer:
+    """Eine Ebene des Compositors: BGR-Pixel (h x w x 3) an Position (x, y), optional mit Alpha.
+
+    update() wird einmal pro Deadline aufgerufen und meldet, ob sich der Inhalt geändert hat;
+    nur dann wird ab dieser Ebene neu überblendet. ``dynamic`` = Inhalt kann sich pro Frame ändern.
+    """
+    dynamic = False
+
+    def __init__(self, name, x=0, y=0, opacity=1.0):
+        self.name = name
+        self.x = x
+        self.y = y
+        self.opacity = max(0, min(255, int(round(opacity * 255))))
+        self._fresh = True
+
+    def update(self, deadline):
+        fresh, self._fresh = self._fresh, False
+        return fresh
+
+    def content(self):
+        # (pixels, alpha): alpha None = deckend, sonst h x w uint8
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class ColorLayer(Layer):
+    """Einfarbige Fläche (z.B. Hintergrundfarbe der Laufschrift)."""
+
+    def __init__(self, color, width, height, name="color"):
+        super().__init__(name)
+        self.pixels = np.empty((height, width, 3), dtype=np.uint8)
+        self.pixels[:] = color[::-1]            # RGB -> BGR
+
+    def content(self):
+        return self.pixels, None
+
+class ImageLayer(Layer):
+    """Standbild oder Logo; ein Alphakanal (PNG mit Transparenz) bleibt erhalten.
+
+    Ohne ``size`` wird das Bild auf die Panelgröße (``width`` x ``height``) skaliert, mit ``size``
+    auf diese Größe, sonst in Originalgröße an (x, y) gesetzt.
+    """
+
+    def __init__(self, path, width=None, height=None, x=0, y=0, opacity=1.0, size=None, name=None):
+        super().__init__(name or "image", x, y, opacity)
+        with Image.open(path) as img:
+            img = img.convert("RGBA")
+            if size is None and width and height:
+                size = (width, height)
+            if size and img.size != tuple(size):
+                img = img.resize(tuple(size), Image.LANCZOS)
+            rgba = np.asarray(img)
+        self.pixels = np.ascontiguousarray(rgba[:, :, 2::-1])              # BGR
+        alpha = np.ascontiguousarray(rgba[:, :, 3])
+        self.alpha = None if alpha.min() == 255 else alpha
+
+    def content(self):
+        return self.pixels, self.alpha
+
+class SourceLayer(Layer):
+    """Beliebige Frame-Quelle (StreamSource, IngestSource, ...) als Ebene.
+
+    Neu ist der Inhalt nur, wenn die Quelle einen anderen CompiledFrame liefert; die Quelle
+    sollte ohne Farbkorrektur arbeiten, die LUTs laufen einmal am Ende des Compositors.
+    """
+    dynamic = True
+
+    def __init__(self, source, name="background", x=0, y=0, opacity=1.0):
+        super().__init__(name, x, y, opacity)
+        self.source = source
+        self.channel = getattr(source, "channel", None)    # Live-Eingang (controller._stop_ingest_source)
+        self.compiled = None
+
+    def update(self, deadline):
+        compiled = self.source.next_frame(deadline)
+        if compiled is None or compiled is self.compiled:
+            return False
+        self.compiled = compiled
+        return True
+
+    def content(self):
+        if self.compiled is None:
+            return None, None                   # noch kein Frame: Ebene auslassen
+        return self.compiled.pixel_array(), None
+
+    def close(self):
+        self.compiled = None
+        self.source.close()
+
+class MarqueeLayer(Layer):
+    """Laufschrift einer MarqueeEngine als transparente Ebene: Textfarbe + Textmaske als Alpha.
+
+    Überblendet wird nur das Band quer zur Laufrichtung, in dem Text liegt.
+    """
+    dynamic = True
+
+    def __init__(self, engine, name="marquee", opacity=1.0):
+        super().__init__(name, opacity=opacity)
+        self.engine = engine
+        start, stop = engine.band
+        if engine.axis == 'x':
+            self.y = start
+            shape = (stop - start, engine.width, 3)
+        else:
+            self.x = start
+            shape = (engine.height, stop - start, 3)
+        self.pixels = np.broadcast_to(np.array(engine.text_color, dtype=np.uint8), shape)
+        self.index = -1
+
+    def update(self, deadline):
+        self.index = (self.index + 1) % self.engine.frame_count
+        return True
+
+    def content(self):
+        start, stop = self.engine.band
+        mask = self.engine.mask_window(self.index)
+        mask = mask[start:stop] if self.engine.axis == 'x' else mask[:, start:stop]
+        return self.pixels, mask
+
+class Compositor:
+    """Frame-Quelle, die mehrere Ebenen pro Deadline übereinanderlegt (unterste zuerst).
+
+    Alpha-Überblendung vektorisiert in Ganzzahlen ((src*a + dst*(255-a) + 255) >> 8, exakt für
+    a = 0 und 255) in vorab angelegte Puffer. Unter jeder dynamischen Ebene wird das Zwischenbild
+    gemerkt: ändert sich nur die Laufschrift, beginnt der nächste Frame bei diesem Zwischenbild,
+    statische Ebenen darunter werden nicht erneut überblendet. Ändert sich keine Ebene, bleibt
+    der letzte Frame stehen. Farbkorrektur und Paketaufbau laufen einmal am Ende.
+    """
+
+    def __init__(self, layers, buffers, color=None):
+        self.layers = list(layers)
+        self.buffers = buffers                  # zwei CompiledFrames als Doppelpuffer (DeltaEncoder)
+        self.color = color
+        first = buffers[0]
+        self.rows, self.columns = first.valid_rows, first.column_count
+        self.canvas = np.zeros((self.rows, self.columns, 3), dtype=np.uint8)
+        self._below = [None] * len(self.layers)     # Zwischenbild unter Ebene i (nur dynamische)
+        self._scratch = {}                      # Form -> (acc, tmp, alpha) uint16
+        self.timings = [Histogram() for _ in self.layers]  # Ebene: update + Überblenden je Neuzeichnung
+        self.compose_time = Histogram()
+        self.compiled = None
+        self.index = 0
+
+    @property
+    def channel(self):
+        # Live-Hintergrund (falls vorhanden), damit das Ende eines Produzenten erkannt wird
+        return getattr(self.layers[0], "channel", None) if self.layers else None
+
+    def next_frame(self, deadline):
+        clock = time.perf_counter
+        start = clock()
+        layers = self.layers
+        spent = [0.0] * len(layers)             # Update-Zeit je Ebene, kommt zur Überblendzeit dazu
+        first = None
+        for i, layer in enumerate(layers):
+            t0 = clock()
+            if layer.update(deadline) and first is None:
+                first = i
+            spent[i] = clock() - t0
+        if first is None:
+            if self.compiled is not None:
+                return self.compiled            # nichts geändert: letzter Frame bleibt stehen
+            first = 0
+        elif first > 0 and self._below[first] is None:
+            first = 0                           # statische Ebene geändert, kein Zwischenbild: von vorn
+        canvas = self.canvas
+        if first == 0:
+            canvas[:] = 0
+        else:
+            np.copyto(canvas, self._below[first])
+        for i in range(first, len(layers)):
+            layer = layers[i]
+            t0 = clock()
+            if layer.dynamic and i > first:     # Zwischenbild unter first ist schon aktuell
+                below = self._below[i]
+                if below is None:
+                    below = self._below[i] = np.empty_like(canvas)
+                np.copyto(below, canvas)
+            self._blend(layer)
+            self.timings[i].record(spent[i] + clock() - t0)
+        compiled = self.buffers[self.index & 1]
+        self.index += 1
+        compiled.update_pixels(canvas, self.color)
+        self.compiled = compiled
+        self.compose_time.record(clock() - start)
+        return compiled
+
+    def _blend(self, layer):
+        pixels, alpha = layer.content()
+        if pixels is None:
+            return
+        # Auf die Leinwand zuschneiden (Logos dürfen teilweise außerhalb liegen)
+        h, w = pixels.shape[:2]
+        x0, y0 = max(layer.x, 0), max(layer.y, 0)
+        x1, y1 = min(layer.x + w, self.columns), min(layer.y + h, self.rows)
+        if x0 >= x1 or y0 >= y1:
+            return
+        src = pixels[y0 - layer.y:y1 - layer.y, x0 - layer.x:x1 - layer.x]
+        dst = self.canvas[y0:y1, x0:x1]
+        opacity = layer.opacity
+        if alpha is None and opacity == 255:
+            np.copyto(dst, src)
+            return
+        shape = dst.shape
+        scratch = self._scratch.get(shape)
+        if scratch is None:
+            scratch = self._scratch[shape] = (np.empty(shape, dtype=np.uint16), np.empty(shape, dtype=np.uint16),
+                                              np.empty(shape[:2] + (1,), dtype=np.uint16))
+        acc, tmp, a = scratch
+        if alpha is None:
+            a[:] = opacity
+        else:
+            a[:, :, 0] = alpha[y0 - layer.y:y1 - layer.y, x0 - layer.x:x1 - layer.x]
+            if opacity != 255:
+                a *= opacity
+                a >>= 8
+        np.multiply(src, a, out=acc, dtype=np.uint16)
+        np.subtract(255, a, out=a)
+        np.multiply(dst, a, out=tmp, dtype=np.uint16)
+        acc += tmp
+        acc += 255
+        acc >>= 8
+        np.copyto(dst, acc, casting="unsafe")
+
+    def stats(self, reset=True):
+        # Telemetriequelle: Zeit je Ebene (nur Frames, in denen sie neu gezeichnet wurde) + gesamt
+        stats = {"compose": self.compose_time.snapshot(reset=reset)}
+        for layer, timing in zip(self.layers, self.timings):
+            snapshot = timing.snapshot(reset=reset)
+            stats[layer.name] = {"redraws": snapshot["count"], "p50_ms": snapshot["p50_ms"],
+                                 "p99_ms": snapshot["p99_ms"]}
+        return stats
+
+    def close(self):
+        for layer in self.layers:
+            layer.close()
@@ -3,6 +3,35 @@
 ETH_P_ALL = 0x0003  # Receive all packets
 ETH_FRAME_LEN = 1518  # Maximum Ethernet frame size
 IF_NAMESIZE = 16  # Fixed memory allocation for interface names.
+ETH_HEADER_LEN = 14  # Destination MAC + Source MAC + EtherType
+ETH_MTU = 1500  # Standard-MTU (Nutzdaten ohne Ethernet-Header)
+
+# 0x5500-Zeilenpakete: 7 Byte Kopf (Zeile, Pixel-Offset, Pixelanzahl, 0x08 0x88) + 3 Byte pro Pixel.
+# Breitere Zeilen werden auf mehrere Pakete verteilt; mit Jumbo-Frames bestimmt die MTU der Schnittstelle
+# die Paketgröße (nur wenn Karte und Switch sie unterstützen)
+ROW_HEADER_LEN = 7
+ROW_MAX_PIXELS = (ETH_MTU - ROW_HEADER_LEN) // 3     # 497
+JUMBO_FRAMES = False
+
+# Sende-Modi für L2Ethernet
+TX_MODE_SINGLE = "single"      # Ein send()-Syscall pro Paket
+TX_MODE_SENDMMSG = "sendmmsg"  # Alle Pakete eines Frames in einem sendmmsg()-Aufruf
+TX_MODES = (TX_MODE_SENDMMSG, TX_MODE_SINGLE)
+SENDMMSG_MAX_VLEN = 1024       # UIO_MAXIOV: max. Nachrichten pro sendmmsg()-Aufruf
+
+# Socket-Tuning und Verhalten bei vollem Sendepuffer/NIC-Queue (ENOBUFS/EAGAIN)
+SOL_PACKET = 263
+PACKET_QDISC_BYPASS = 20       # Pakete direkt an den Treiber, ohne Qdisc (Linux >= 3.14)
+SO_SNDBUFFORCE = 32            # wie SO_SNDBUF, aber über wmem_max hinaus (CAP_NET_ADMIN)
+TX_QDISC_BYPASS = True
+TX_SNDBUF_BYTES = 4 * 1024 * 1024
+TX_BLOCKING = False            # nicht blockierend senden, gewartet wird per poll() im Rahmen des Budgets
+BACKPRESSURE_RETRY = "retry"   # bis zur nächsten Frame-Deadline erneut versuchen, danach Rest verwerfen
+BACKPRESSURE_DROP = "drop"     # Frame sofort verwerfen und zählen
+BACKPRESSURES = (BACKPRESSURE_RETRY, BACKPRESSURE_DROP)
+TX_BACKPRESSURE = BACKPRESSURE_RETRY
+TX_RETRY_BUDGET_S = 0.005      # Wartebudget, wenn der Aufrufer keine Deadline mitgibt
+ENOBUFS_BACKOFF_S = 0.0001     # ENOBUFS meldet poll() nicht: kurz schlafen und erneut senden
 
 # Brightness mapping
 BRIGHTNESS_MAP = [
@@ -19,6 +48,48 @@ BRIGHTNESS_MAP = [
     (100, 0x32),
 ]
 
+# Kartenerkennung: max. Wartezeit auf 0x0805-Antworten und Cache der erkannten Auflösungen je MAC
+DISCOVERY_TIMEOUT_S = 1.0
+GEOMETRY_CACHE_PATH = "card_geometry.json"
+
+# Speicherbudget des Bild-Caches (BGR-Daten + vorberechnete Pakete)
+IMAGE_CACHE_BYTES = 128 * 1024 * 1024
+
+# Tiefe der Prefetch-Queue beim Streamen von Animationen/Bildsequenzen (Frames)
+STREAM_PREFETCH_FRAMES = 8
+
+# Telemetrie: rollierende Metrikdatei (.jsonl oder .csv) und Prometheus-Endpunkt nur auf localhost
+METRICS_LOG_PATH = "performance_log.jsonl"
+METRICS_LOG_BYTES = 5 * 1024 * 1024
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9108
+
+# Adaptive Bildrate: unveränderter Inhalt wird nur noch im Keep-alive-Takt gesendet (muss dem Empfänger reichen)
+ADAPTIVE_REFRESH = False
+KEEPALIVE_FPS = 10
+
+# Playlist: Standarddauer eines Bildes und eines Übergangs; Autoplay schaltet im festen Takt ohne Übergang weiter
+PLAYLIST_DURATION_S = 5.0
+PLAYLIST_TRANSITION_S = 0.5
+AUTOPLAY_INTERVAL_S = 0.08
+
+# Mitschnitt (pcap): Queue zwischen Sende- und Schreib-Thread (Sendeaufrufe) und Dateipuffer in Bytes
+CAPTURE_QUEUE_CALLS = 4096
+CAPTURE_BUFFER_BYTES = 1024 * 1024
+
+# Live-Eingang für externe Produzenten: Steuer-Socket und Anzahl Frame-Slots im Shared Memory
+INGEST_SOCKET_PATH = "/tmp/led_ingest.sock"
+INGEST_SLOTS = 3
+
+# Sendeprozess: Socket, Taktung und Paketaufbau in einem eigenen Prozess (eigener GIL), Frames über Shared-Memory-Slots.
+# CPU: Kern, an den der Sendeprozess gebunden wird (-1 = nicht binden). Erzeugt wird jeder Frame LEAD Intervalle vor
+# der Deadline des Sendeprozesses; Frame- und Fehlerereignisse laufen über einen Ring mit EVENTS Einträgen zurück
+SENDER_PROCESS = False
+SENDER_PROCESS_CPU = -1
+SENDER_SLOTS = 3
+SENDER_LEAD = 0.5
+SENDER_EVENTS = 4096
+
 # Frame data lengths
 FRAME_0107_DATA_LENGTH = 98  # Length of initialization frame
 FRAME_0AFF_DATA_LENGTH = 63   # Length of brightness frame
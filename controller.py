@@ -3,17 +3,22 @@
 import sys
 import os
 import time
+import queue
 import threading
 import logging
-import netifaces
-from view import MainView
 from ethernet import L2Ethernet
-from processing import process_image
-from sending import send_single_frame_sync
-from utils import init_frames
-from marquee_manager import MarqueeEngine
 from lru_cache import LRUCache
 from thread_manager import ThreadManager
+from frame_clock import FrameClock
+from constants import (IMAGE_CACHE_BYTES, STREAM_PREFETCH_FRAMES, METRICS_LOG_PATH, METRICS_LOG_BYTES,
+                       METRICS_HOST, METRICS_PORT, INGEST_SOCKET_PATH, DISCOVERY_TIMEOUT_S, GEOMETRY_CACHE_PATH,
+                       AUTOPLAY_INTERVAL_S, ROW_MAX_PIXELS)
+from preloader import ImagePreloader
+from playback import FrameSender, StillSource, StreamSource
+from telemetry import Telemetry, RollingFileExporter, PrometheusExporter
+
+# Schwere Abhängigkeiten (tkinter, PIL, NumPy, netifaces) werden erst in den Methoden importiert,
+# die sie brauchen: der Headless-Player (cli.py) startet so schneller und belegt weniger Speicher.
 
 # Konfiguration des Loggings:
 # - level: DEBUG (alle Debug-, Info-, Warnungs- und Fehlermeldungen werden protokolliert)
@@ -29,8 +34,8 @@ logging.basicConfig(
 )
 
 class LEDController:
-    def __init__(self, view: MainView):
-        self.view = view                        # Aggregation: Externe GUI (View)
+    def __init__(self, view):
+        self.view = view                        # Aggregation: Externe GUI (MainView) oder HeadlessView
         self.l2 = None                          # Wird später als Layer2 Ethernet-Objekt initialisiert
         self.columns = 128                      # Standard-Auflösung
         self.rows = 128                         # Standard-Auflösung
@@ -38,39 +43,152 @@ class LEDController:
         self.thread_mgr = ThreadManager()       # Manager für allgemeine Threads
         self.send_mgr = ThreadManager()         # Manager für Sende-Threads
         self.marquee = None                     # Aggregation: Externe MarqueeEngine wird später gesetzt
+        self.overlay = {}                       # Hintergrund/Logo unter bzw. über der Laufschrift (Compositor)
+        self.session = None                     # Langlebige SenderSession (Helligkeit + Setup-Pakete)
+        self.canvas = None                      # TiledCanvas, falls eine Videowand geladen ist
+        self._color = None                      # ColorCorrection, erst bei Bedarf (NumPy)
+        self.ingest = None                      # IngestServer für Live-Produzenten (Shared Memory)
+        self.transport = {}                     # weitere L2Ethernet-Optionen (sndbuf, qdisc_bypass, blocking, recorder)
+        self.recorder = None                    # PcapRecorder, solange mitgeschnitten wird (capture.py)
+        self.cards = []                         # Ergebnis der letzten Kartenerkennung (CardInfo)
+        self._geometry_cache = None             # Auflösung je Karten-MAC (discovery.GeometryCache)
+        self.clock = FrameClock(self.view.fps_var.get())    # Gemeinsame Wiedergabe-Uhr (absolute Deadlines)
+        # Ein einziger langlebiger Sende-Thread; Inhalte werden nur noch veröffentlicht, nicht neu gestartet
+        self.telemetry = Telemetry()            # Zähler + Histogramme; der Sende-Thread schreibt nur hinein
+        # Optional sendet ein eigener Prozess (sender_process.py): GUI und Dekodierung stören die Taktung nicht
+        self.sender_process = bool(self.view.sender_process_var.get())
+        if self.sender_process:
+            from sender_process import ProcessSender
+            self.sender = ProcessSender(self.clock, on_frame=self.telemetry.record_frame,
+                                        on_error=self._on_send_error, on_send_error=self.telemetry.record_error,
+                                        cpu=int(self.view.sender_cpu_var.get()))
+        else:
+            self.sender = FrameSender(self.clock, on_frame=self.telemetry.record_frame,
+                                      on_error=self._on_send_error, on_send_error=self.telemetry.record_error)
+        self._on_adaptive_change()              # adaptive Bildrate aus der View übernehmen
+        self._sender_thread = None
         
-        # Leistungsüberwachung
-        self.bandwidth = 0
-        self.frame_count = 0
-        self.total_frame_time = 0.0
-        self._perf_lock = threading.Lock()    # Lock für atomare Operationen auf den Performance-Daten
+        # Leistungsüberwachung: Auswertung einmal pro Sekunde außerhalb des Sendepfads
         self._perf_stop_event = threading.Event()
         self._perf_monitor = None
+        self.metrics_file = RollingFileExporter(METRICS_LOG_PATH, METRICS_LOG_BYTES)
+        self.metrics_server = PrometheusExporter(self.telemetry, METRICS_HOST, METRICS_PORT)
 
         # Komposition: Interner Cache und Bildpfad-Liste, die nur von LEDController verwaltet werden
-        self.image_cache = LRUCache()
+        self.image_cache = LRUCache(IMAGE_CACHE_BYTES)     # Budget in Bytes statt Anzahl Einträge
+        self.processing_options = ("lanczos",)   # Teil des Cache-Schlüssels (Bildverarbeitung)
         self.image_paths = []
         self.current_image = 0
+        self.preloader = ImagePreloader()       # Paralleles Vorladen im Prozesspool
+
+        self.telemetry.add_source("clock", lambda: self.clock.stats(reset=True))
+        self.telemetry.add_source("sender", lambda: self.sender.stats(reset=True))
+        self.telemetry.add_source("cache", self.image_cache.stats)
+        self.telemetry.add_source("transport", self._transport_stats)
+        self.telemetry.add_source("layers", self._layer_stats)
+        self.telemetry.add_source("playlist", self._playlist_stats)
+        self.telemetry.add_source("capture", lambda: self.recorder.stats() if self.recorder else {})
+        self.metrics_server.start()
+        self.view.schedule(1000, self._refresh_performance)
 
         self._setup_ui_callbacks()              
-        self._refresh_interfaces()              # Netzwerkschnittstellen aktualisieren
+        if self.view.interactive:
+            self._refresh_interfaces()          # Netzwerkschnittstellen aktualisieren
+
+    @property
+    def color(self):
+        # Gamma/Weißpunkt/Gain-LUTs, neu gebaut nur bei Änderungen
+        if self._color is None:
+            from color import ColorCorrection
+            color = ColorCorrection()
+            self._update_color(color)           # aktuelle Einstellungen der View übernehmen
+            self._color = color
+        return self._color
+
+    def _update_color(self, color):
+        # Liefert True, wenn sich die Einstellungen geändert haben (None bei unvollständiger Eingabe)
+        try:
+            gain = (self.view.gain_r_var.get(), self.view.gain_g_var.get(), self.view.gain_b_var.get())
+            return color.update(self.view.gamma_var.get(), self.view.color_temp_var.get(),
+                                gain, self.view.dither_var.get())
+        except Exception:
+            return None                         # unvollständige Eingabe im Spinbox-Feld
 
     def _setup_ui_callbacks(self):              # GUI-Callbacks mit Funktionen verbinden
+        if self.view.interactive:               # Headless: keine Widgets, nur Variablen
+            self._bind_widgets()
+        self.view.brightness_var.trace_add("write", self._on_brightness_change)
+        self.view.fps_var.trace_add("write", self._on_fps_change)
+        self.view.adaptive_var.trace_add("write", self._on_adaptive_change)
+        self.view.keepalive_fps_var.trace_add("write", self._on_adaptive_change)
+        for var in (self.view.gamma_var, self.view.color_temp_var, self.view.gain_r_var,
+                    self.view.gain_g_var, self.view.gain_b_var, self.view.dither_var):
+            var.trace_add("write", self._on_color_change)
+
+    def _bind_widgets(self):
         self.view.refresh_button.config(command=self._refresh_interfaces)
         self.view.browse_button.config(command=self.browse_images)
+        self.view.play_folder_button.config(command=self.play_folder)
+        self.view.playlist_button.config(command=self.play_playlist)
         self.view.send_button.config(command=lambda: self.send_current_image(auto_play=False))
         self.view.prev_button.config(command=self.show_previous_image)
         self.view.next_button.config(command=self.show_next_image)
         self.view.detect_button.config(command=lambda: self.thread_mgr.start_thread(self._detect_card))
+        self.view.load_canvas_button.config(command=self.load_canvas)
+        self.view.ingest_button.config(command=self.toggle_ingest)
+        self.view.record_button.config(command=self.toggle_recording)
         self.view.auto_play_button.config(command=self.start_auto_play)
         self.view.stop_auto_button.config(command=self.stop_sending)
         self.view.show_marquee_dialog_button.config(command=self.show_marquee_dialog)
         self.view.start_marquee_button.config(command=self.start_marquee)
         self.view.quit_button.config(command=self.quit_app)
+        self.view.tx_mode_combo.bind("<<ComboboxSelected>>", lambda event: self._apply_tx_mode())
+        self.view.backpressure_combo.bind("<<ComboboxSelected>>", lambda event: self._apply_backpressure())
         
     def _refresh_interfaces(self):
+        import netifaces
         interfaces = netifaces.interfaces()
         self.view.interface_combo['values'] = interfaces
+
+    def _apply_tx_mode(self):
+        # Sende-Modus zur Laufzeit umschalten; angezeigt wird der tatsächlich aktive Modus
+        target = self.canvas or self.l2
+        if not target:
+            return
+        active = target.set_tx_mode(self.view.tx_mode_var.get())
+        self.view.tx_mode_var.set(active)
+        self.view.show_status(f"TX mode: {active}")
+
+    def _links(self):
+        # Alle offenen Sende-Sockets (Videowand: einer pro Schnittstelle)
+        if self.canvas:
+            return self.canvas.links
+        return [self.l2] if self.l2 else []
+
+    @property
+    def row_pixels(self):
+        # Pixel pro 0x5500-Paket, die alle offenen Schnittstellen erlauben (MTU, Jumbo-Frames)
+        return min((l2.row_pixels for l2 in self._links()), default=ROW_MAX_PIXELS)
+
+    def _apply_backpressure(self):
+        policy = self.view.backpressure_var.get()
+        for l2 in self._links():
+            l2.set_backpressure(policy)
+        self.view.show_status(f"On full send buffer: {policy}")
+
+    def _transport_stats(self):
+        # Aktive Socket-Einstellungen und Zähler (kumulativ, bei einer Videowand summiert)
+        links = self._links()
+        if not links:
+            return {}
+        stats = links[0].stats()
+        for l2 in links[1:]:
+            for key, value in l2.counters.items():
+                stats[key] += value
+        if self.sender_process:
+            stats.update(self.sender.transport_counters())     # gesendet wird über die Sockets des Sendeprozesses
+        stats["wait_s"] = round(stats["wait_s"], 6)
+        return stats
    
     def _detect_card(self, stop_event):
         interface = self.view.interface_combo.get()
@@ -78,43 +196,171 @@ class LEDController:
             self.view.show_warning("Please select a network interface.")
             return
         try:
-            self.l2 = L2Ethernet(interface)    # Erzeugt ein Layer2 Ethernet-Objekt
-            self.l2.open()                      # Öffnet den Socket
-            if self.l2.socket is None:
-                raise Exception("Failed to initialize network socket for L2Ethernet.")
-            src_mac = bytes.fromhex(self.view.src_mac_var.get().replace(":", ""))
-            dst_mac = bytes.fromhex(self.view.dst_mac_var.get().replace(":", ""))
-            detection_packet = b'\x00' * 270
-            self.l2.send(dst_mac, src_mac, 0x0700, detection_packet)
-            data = self.l2.recv()
-            if len(data) > 38 and data[12] == 8 and data[13] == 5:
-                self.columns = data[34] * 256 + data[35]
-                self.rows = data[36] * 256 + data[37]
-                self.view.show_status("Card Detected!")
-            init_frames(self.columns, self.view.brightness_var.get())
+            self.connect(interface)
         except Exception as e:
             self.view.show_error("Error", str(e))
             logging.error(f"Error in card detection: {e}")
 
+    @property
+    def geometry_cache(self):
+        if self._geometry_cache is None:
+            from discovery import GeometryCache
+            self._geometry_cache = GeometryCache(GEOMETRY_CACHE_PATH)
+        return self._geometry_cache
+
+    def scan_cards(self, interface, timeout=None):
+        # Alle Karten am Segment abfragen (0x0700 an Broadcast) und ihre Auflösung merken
+        from discovery import discover
+        src_mac = bytes.fromhex(self.view.src_mac_var.get().replace(":", ""))
+        cards = discover(interface, src_mac, timeout=DISCOVERY_TIMEOUT_S if timeout is None else timeout)
+        self.geometry_cache.update(cards)
+        self.cards = cards
+        return cards
+
+    def _select_card(self, interface, timeout):
+        # Karte mit der Ziel-MAC bevorzugen, sonst die erste Antwort; ohne Antwort die zuletzt bekannte Auflösung
+        from discovery import format_mac
+        dst_mac = bytes.fromhex(self.view.dst_mac_var.get().replace(":", ""))
+        cards = self.scan_cards(interface, timeout)
+        card = next((c for c in cards if c.mac == dst_mac), cards[0] if cards else None)
+        if card:
+            others = f" ({len(cards)} cards on {interface})" if len(cards) > 1 else ""
+            self.view.show_status(f"Card Detected! {format_mac(card.mac)} {card.columns}x{card.rows}{others}")
+            return card
+        card = self.geometry_cache.get(dst_mac)
+        if card is None:
+            raise TimeoutError(f"No card replied on {interface} within {timeout or DISCOVERY_TIMEOUT_S:g} s.")
+        self.view.show_status(f"No reply, using cached geometry {card.columns}x{card.rows} for {format_mac(dst_mac)}")
+        return card
+
+    def connect(self, interface, columns=None, rows=None, timeout=None):
+        # Socket öffnen; ohne feste Auflösung werden die Karten per 0x0700 abgefragt (discovery.py).
+        # timeout: max. Wartezeit auf Antworten in Sekunden (None = DISCOVERY_TIMEOUT_S)
+        if not (columns and rows):
+            card = self._select_card(interface, timeout)
+            columns, rows = card.columns, card.rows
+        l2 = L2Ethernet(interface, self.view.tx_mode_var.get(),    # Erzeugt ein Layer2 Ethernet-Objekt
+                        backpressure=self.view.backpressure_var.get(), jumbo=self.view.jumbo_var.get(),
+                        **self.transport)
+        l2.open()                               # Öffnet den Socket
+        if l2.socket is None:
+            raise Exception("Failed to initialize network socket for L2Ethernet.")
+        if self.l2 and self.l2 is not l2:
+            self.sender.clear()
+            self.l2.close()
+        self.l2 = l2
+        self.columns, self.rows = columns, rows
+        self.session = None                     # neuer Socket => neue Sende-Sitzung
+        self._close_canvas()                    # zurück in den Einzelkarten-Modus
+
+    def load_canvas(self):
+        # Videowand laden: die Leinwandgröße ersetzt die Auflösung einer einzelnen Karte
+        from canvas import TiledCanvas, load_layout
+        path = self.view.prompt_canvas_layout()
+        if not path:
+            return
+        try:
+            src_mac, tiles = load_layout(path)
+            if src_mac is None:
+                src_mac = bytes.fromhex(self.view.src_mac_var.get().replace(":", ""))
+            self._close_canvas()
+            self.canvas = TiledCanvas(tiles, src_mac, int(self.view.brightness_var.get()),
+                                      self.view.tx_mode_var.get(),
+                                      dict(self.transport, backpressure=self.view.backpressure_var.get(),
+                                           jumbo=self.view.jumbo_var.get()))
+        except Exception as e:
+            self.view.show_error("Canvas Failed", str(e))
+            logging.error(f"Error loading canvas layout: {e}")
+            return
+        self.columns, self.rows = self.canvas.columns, self.canvas.rows
+        interfaces = len(self.canvas.groups)
+        self.view.show_status(f"Canvas {self.columns}x{self.rows}: {len(tiles)} cards on {interfaces} interface(s)")
+
+    def _close_canvas(self):
+        if self.canvas:
+            self.sender.clear()
+            self.canvas.close()
+            self.canvas = None
+
+    def _can_send(self):
+        if self.canvas:
+            return True
+        return bool(self.l2 and hasattr(self.l2, 'socket') and self.l2.socket is not None)
+
+    def _cache_key(self, path, width=None, height=None):
+        # Cache-Schlüssel: Datei (inkl. mtime/Größe, damit geänderte Dateien neu geladen werden),
+        # Zielauflösung und Verarbeitungsoptionen
+        try:
+            st = os.stat(path)
+            version = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            version = None
+        return (path, version,
+                self.columns if width is None else width,
+                self.rows if height is None else height,
+                self.processing_options)
+
     def _get_frame_data(self, path):  
         # Lädt und verarbeitet Bilddaten; nutzt den Cache, falls vorhanden
-        frame_data = self.image_cache.get(path)
+        key = self._cache_key(path)
+        frame_data = self.image_cache.get(key)
         if frame_data is None:
-            frame_data = process_image(path, self.columns, self.rows)
-            self.image_cache.put(path, frame_data)
+            # wird es gerade in der passenden Auflösung vorgeladen? dann nur darauf warten
+            frame_data = self.preloader.wait_for(path, self.columns, self.rows)
+            if frame_data is None:
+                from processing import process_image
+                frame_data = process_image(path, self.columns, self.rows)
             if frame_data is None:
                 raise ValueError(f"Frame data for {path} is None after processing.")
+            self.image_cache.put(key, frame_data)
         return frame_data
+
+    def _get_compiled_frame(self, path, src_mac, dst_mac):
+        import numpy as np
+        from sending import CompiledFrame
+        # Vorberechnete Pakete liegen neben den BGR-Daten im Cache; neu bauen nur bei geänderten Parametern
+        # Die Farbeinstellungen gehören zum Schlüssel; die dekodierten BGR-Daten bleiben unkorrigiert
+        key = ("compiled", self.color.key) + self._cache_key(path)
+        compiled = self.image_cache.get(key)
+        if compiled is None or not compiled.matches(src_mac, dst_mac, self.columns, self.rows,
+                                                    max_pixels=self.row_pixels):
+            frame_data = self._get_frame_data(path)
+            compiled = CompiledFrame(src_mac, dst_mac, frame_data, self.columns, self.rows, max_pixels=self.row_pixels)
+            if not self.color.identity:
+                pixels = np.frombuffer(frame_data, dtype=np.uint8)[:compiled.valid_rows * self.columns * 3]
+                compiled.update_pixels(pixels, self.color)
+            self.image_cache.put(key, compiled)
+        return compiled
     
     def browse_images(self):
         # Bilder aussuchen und vorbereiten für verarbeitung => Komposition da interne Verwaltung der Bildpfade)
         file_paths = self.view.prompt_file_paths()
         if file_paths:
-            self.image_paths = list(file_paths)
-            self.current_image = 0
+            self.load_images(file_paths)
             self.view.show_info("Images Loaded", f"{len(self.image_paths)} images selected.")
-            for path in self.image_paths:
-                self._get_frame_data(path)
+
+    def load_images(self, file_paths):
+        self.image_paths = list(file_paths)
+        self.current_image = 0
+        # Vorladen im Hintergrund; bricht eine noch laufende vorherige Auswahl ab
+        self.preloader.start(self.image_paths, self.columns, self.rows)
+        self.view.schedule(50, self._poll_preload)
+
+    def _poll_preload(self):
+        # Läuft im Tk-Thread: fertige Bilder in den Cache übernehmen und Fortschritt anzeigen
+        while True:
+            try:
+                path, width, height, frame_data = self.preloader.results.get_nowait()
+            except queue.Empty:
+                break
+            if frame_data is not None:
+                self.image_cache.put(self._cache_key(path, width, height), frame_data)
+        if self.preloader.total:
+            self.view.show_status(f"Preloading: {self.preloader.completed}/{self.preloader.total}")
+        if self.preloader.busy:
+            self.view.schedule(100, self._poll_preload)
+        elif self.preloader.total:
+            self.view.show_status(f"Preloaded {self.preloader.total} images.")
 
     def show_previous_image(self):
         if not self.image_paths:
@@ -133,62 +379,314 @@ class LEDController:
         self.send_current_image(auto_play=False)
 
     def send_current_image(self, auto_play=False):
-        if not self.l2 or not hasattr(self.l2, 'socket') or self.l2.socket is None:
+        if not self._can_send():
             self.view.show_warning("Please detect the card first.")
             return
         if not (0 <= self.current_image < len(self.image_paths)):
             return
         file_path = self.image_paths[self.current_image]
         self.view.show_status(f"Sending: {os.path.basename(file_path)}") #zeigen welches bild ist gesendet
-        frame_data = self._get_frame_data(file_path)
-        self.send_mgr.stop_all()
-        self.send_mgr.start_thread(self._send_image, frame_data, auto_play)
+        from streaming import is_animated
+        if is_animated(file_path):                  # GIF/APNG/WebP werden gestreamt statt gecacht
+            self.start_stream(file_path)
+            return
+        session = self.get_session()
+        compiled = self._get_compiled_frame(file_path, session.src_mac, session.dest_mac)
+        self.publish(StillSource(compiled), session, self.create_delta_encoder())
+
+    def play_folder(self):
+        # Nummerierte Bildsequenz aus einem Ordner streamen
+        if not self._can_send():
+            self.view.show_warning("Please detect the card first.")
+            return
+        directory = self.view.prompt_directory()
+        if directory:
+            self.view.show_status(f"Streaming: {os.path.basename(directory)}")
+            self.start_stream(directory)
 
-    def _send_image(self, stop_event, frame_data, auto_play=False):  
+    def start_stream(self, path):
+        # Animation oder Ordner lazy dekodieren; Speicher bleibt durch die Prefetch-Queue begrenzt
+        from sending import CompiledFrame
+        from streaming import FramePrefetcher, open_stream
         try:
-            self.start_perf_monitor()     #thread starten beim senden
-            target_interval = 1 / 60      # Gewünschte Framerate
-            brightness = self.view.brightness_var.get()
-            src_mac = bytes.fromhex(self.view.src_mac_var.get().replace(":", ""))
-            dst_mac = bytes.fromhex(self.view.dst_mac_var.get().replace(":", ""))
-            compensation = 0.0            # Initiale Kompensation
-
-            while not stop_event.is_set():
-                frame_start = time.monotonic()
-                sent = send_single_frame_sync(
-                    self.l2, src_mac, dst_mac,
-                    brightness, frame_data,
-                    self.columns, self.rows
-                )
-                self._update_stats(sent, time.monotonic() - frame_start)
-                elapsed = time.monotonic() - frame_start    
-                wait_time = max(0, target_interval - elapsed - compensation) # tatsächliche Wartezeit
-                sleep_start_time = time.monotonic()
-                if stop_event.wait(wait_time):
-                    break
-                sleep_end_time = time.monotonic()
-                actual_sleep_duration = sleep_end_time - sleep_start_time
-                compensation = actual_sleep_duration - wait_time
+            factory = open_stream(path, self.columns, self.rows)
         except Exception as e:
-            logging.error(f"Transmission error: {e}")
-            self.view.show_error("Send Failed", str(e))
-        finally:
-            self.stop_perf_monitor()
+            self.view.show_error("Stream Failed", str(e))
+            return
+        session = self.get_session()
+        src = bytes(self.columns * self.rows * 3)
+        buffers = [CompiledFrame(session.src_mac, session.dest_mac, src, self.columns, self.rows,
+                                 max_pixels=self.row_pixels) for _ in range(2)]
+        prefetcher = FramePrefetcher(factory, self.rows, self.columns * 3, STREAM_PREFETCH_FRAMES).start()
+        self.publish(StreamSource(prefetcher, buffers, self.color), session, self.create_delta_encoder())
+
+    def publish(self, source, session, delta=None):
+        # Neue Quelle an den Sende-Thread übergeben; wirksam ab der nächsten Frame-Grenze
+        self._ensure_sender()
+        self.start_perf_monitor()
+        self.sender.publish(source, session, delta)
+
+    def _ensure_sender(self):
+        if self._sender_thread and self._sender_thread.is_alive():
+            return
+        self._sender_thread = self.send_mgr.start_thread(self.sender.run)
+
+    def _on_send_error(self, error):
+        self.view.show_error("Send Failed", str(error))
+
+    def get_session(self):
+        # Bestehende SenderSession weiterverwenden, solange Socket und MAC-Adressen gleich bleiben
+        if self.canvas:
+            return self.canvas                  # gleiche Sende-Schnittstelle, verteilt auf alle Karten
+        src_mac = bytes.fromhex(self.view.src_mac_var.get().replace(":", ""))
+        dst_mac = bytes.fromhex(self.view.dst_mac_var.get().replace(":", ""))
+        if self.session is None or not self.session.matches(self.l2, src_mac, dst_mac):
+            from sending import SenderSession
+            self.session = SenderSession(self.l2, src_mac, dst_mac, int(self.view.brightness_var.get()))
+        return self.session
+
+    def _on_brightness_change(self, *args):
+        # Tk-Variablen-Trace (Tk-Thread): nur hier wird die Helligkeit gelesen und an die Sitzung übergeben
+        try:
+            brightness = int(self.view.brightness_var.get())
+        except Exception:
+            return
+        session = self.canvas or self.session
+        if session and session.set_brightness(brightness):
+            self.view.show_status(f"Brightness: {brightness}% (0x{session.setup.brightness_code:02X})")
+
+    def _on_fps_change(self, *args):
+        # Neue Bildrate gilt ab der nächsten Deadline aller laufenden Sendeschleifen
+        try:
+            fps = int(self.view.fps_var.get())
+        except Exception:
+            return
+        if fps > 0:
+            self.clock.set_fps(fps)
+
+    def _on_adaptive_change(self, *args):
+        # Keep-alive-Rate für unveränderten Inhalt; gilt ab der nächsten Deadline
+        try:
+            fps = int(self.view.keepalive_fps_var.get()) if self.view.adaptive_var.get() else None
+        except Exception:
+            return                              # unvollständige Eingabe im Spinbox-Feld
+        self.sender.set_keepalive(fps)
+
+    def _on_color_change(self, *args):
+        # Tk-Variablen-Trace: LUTs nur bei tatsächlich geänderten Einstellungen neu bauen
+        if self._color is None:
+            return                              # wird beim ersten Zugriff mit diesen Werten gebaut
+        if not self._update_color(self._color):
+            return
+        gamma, temperature, gain, dither = self._color.settings
+        self.view.show_status(f"Color: gamma {gamma}, {temperature} K, gain {gain}, dither {dither}")
+        if isinstance(self.sender.source, StillSource):
+            self.send_current_image()           # Standbild neu korrigieren; Laufschrift/Streams wirken ab dem nächsten Frame
+
+    def create_delta_encoder(self):
+        # Delta-Modus aus der GUI lesen (im Tk-Thread); None = immer komplette Frames senden
+        if not self.view.delta_var.get():
+            return None
+        try:
+            interval = self.view.keyframe_interval_var.get()
+        except Exception:
+            interval = 60
+        from sending import DeltaEncoder
+        return DeltaEncoder(interval)
+
+    def start_ingest(self, path=INGEST_SOCKET_PATH):
+        # Live-Eingang öffnen: Produzenten verbinden sich per Unix-Socket und liefern Frames per Shared Memory
+        if self.ingest:
+            return
+        from ingest import IngestServer
+        server = IngestServer(path, describe=self._describe_ingest, on_start=self._on_ingest_start,
+                              on_stop=self._on_ingest_stop, on_brightness=self._on_ingest_brightness)
+        try:
+            server.start()
+        except OSError as e:
+            self.view.show_error("Live Input Failed", str(e))
+            return
+        self.ingest = server
+        self.view.show_status(f"Live input: {path}")
+
+    def stop_ingest(self):
+        if not self.ingest:
+            return
+        channel = getattr(self.sender.published, "channel", None)
+        if channel is not None:
+            self._stop_ingest_source(channel)
+        self.ingest.stop()
+        self.ingest = None
+        self.view.show_status("Live input closed.")
+
+    def toggle_ingest(self):
+        if self.ingest:
+            self.stop_ingest()
+        else:
+            self.start_ingest()
+
+    def start_recording(self, path=None):
+        # Alle gesendeten Pakete als pcap mitschneiden; gilt auch für später geöffnete Sockets (transport)
+        if self.recorder:
+            return
+        path = path or self.view.prompt_capture_path()
+        if not path:
+            return
+        if self.sender_process:
+            self.recorder = self.sender.start_recording(path)      # Mitschnitt im Sendeprozess
+            self.view.show_status(f"Recording to {path}")
+            return
+        from capture import PcapRecorder
+        try:
+            recorder = PcapRecorder(path)
+        except OSError as e:
+            self.view.show_error("Recording Failed", str(e))
+            return
+        self.recorder = self.transport["recorder"] = recorder
+        for l2 in self._links():
+            l2.set_recorder(recorder)
+        self.view.show_status(f"Recording to {path}")
+
+    def stop_recording(self):
+        if not self.recorder:
+            return
+        recorder, self.recorder = self.recorder, None
+        if self.sender_process:
+            self.sender.stop_recording(recorder)
+            self.view.show_status(f"Recording saved: {recorder.path}")
+            return
+        self.transport.pop("recorder", None)
+        for l2 in self._links():
+            l2.set_recorder(None)
+        recorder.close()                        # schreibt den Rest der Queue
+        self.view.show_status(f"Recording saved: {recorder.path} ({recorder.packets} packets)")
+
+    def toggle_recording(self):
+        if self.recorder:
+            self.stop_recording()
+        else:
+            self.start_recording()
+
+    def _describe_ingest(self):
+        # Läuft im Server-Thread: nur lesen
+        return {"columns": self.columns, "rows": self.rows, "fps": self.clock.fps, "row_pixels": self.row_pixels}
+
+    def _on_ingest_start(self, channel):
+        # Aus dem Server-Thread; Sitzung und Veröffentlichung wie alle anderen Quellen im Tk-Thread
+        self.view.schedule(0, lambda: self._start_ingest_source(channel))
+
+    def _start_ingest_source(self, channel):
+        if channel.closed:
+            return
+        if not self._can_send():
+            self.view.show_warning("Please detect the card first.")
+            return
+        from ingest import IngestSource
+        session = self.get_session()
+        if self._overlay_live():                # Live-Bild als Hintergrund der Laufschrift
+            from compositor import SourceLayer
+            source = self._compose(session, SourceLayer(IngestSource(channel, session), name="live"))
+        else:
+            source = IngestSource(channel, session, self.color)
+        self.publish(source, session, self.create_delta_encoder())
+        self.view.show_status(f"Live input: {channel.columns}x{channel.rows} {channel.format.upper()}")
+
+    def _on_ingest_stop(self, channel):
+        self.view.schedule(0, lambda: self._stop_ingest_source(channel))
+
+    def _stop_ingest_source(self, channel):
+        source = self.sender.published
+        if getattr(source, "channel", None) is not channel:
+            return
+        if self._overlay_live():
+            session = self.get_session()        # Laufschrift läuft auf der Hintergrundfarbe weiter
+            self.publish(self._compose(session), session, self.create_delta_encoder())
+        else:
+            self.sender.clear()
+        self.view.show_status("Live input stopped.")
+
+    def _on_ingest_brightness(self, percent):
+        # Über die Variable: Regler in der GUI folgt, der Trace übergibt die Helligkeit an die Sitzung
+        self.view.schedule(0, lambda: self.view.brightness_var.set(percent))
 
     def start_auto_play(self):
         if not self.image_paths:
             self.view.show_warning("No images loaded.")
             return
+        if not self._can_send():
+            self.view.show_warning("Please detect the card first.")
+            return
+        # Bildliste ab dem nächsten Bild als Playlist: fester Takt, harte Schnitte, weitergeschaltet im Sende-Thread
+        from playlist import PlaylistItem
+        count = len(self.image_paths)
+        positions = [(self.current_image + 1 + i) % count for i in range(count)]
+        items = [PlaylistItem.from_path(self.image_paths[i], AUTOPLAY_INTERVAL_S, transition_s=0) for i in positions]
+        self.thread_mgr.stop_all()
         self.auto_play_active = True
-        self.thread_mgr.start_thread(self._auto_play_thread)
-
-    def _auto_play_thread(self, stop_event):
-        while self.auto_play_active and not stop_event.is_set():
-            self.send_mgr.stop_all()
-            self.current_image = (self.current_image + 1) % len(self.image_paths)
-            self.send_current_image(auto_play=True)
-            if stop_event.wait(0.08):       # autoplay abstand
-                break
+        self.start_playlist(items, positions=positions)
+
+    def play_playlist(self):
+        # Playlist-Datei (JSON) wählen und abspielen
+        path = self.view.prompt_playlist()
+        if not path:
+            return
+        if not self._can_send():
+            self.view.show_warning("Please detect the card first.")
+            return
+        from playlist import load_playlist
+        try:
+            items, loop = load_playlist(path)
+        except (OSError, ValueError) as e:
+            self.view.show_error("Playlist Failed", str(e))
+            return
+        self.thread_mgr.stop_all()
+        self.auto_play_active = False
+        if self.start_playlist(items, loop):
+            self.view.show_status(f"Playlist: {os.path.basename(path)} ({len(items)} items)")
+
+    def start_playlist(self, items, loop=True, positions=None):
+        # positions: Index in image_paths je Eintrag (Autoplay), damit Vor/Zurück an der richtigen Stelle weitermacht
+        from playlist import PlaylistSource
+        from sending import CompiledFrame
+        session = self.get_session()
+        src = bytes(self.columns * self.rows * 3)
+        buffers = [CompiledFrame(session.src_mac, session.dest_mac, src, self.columns, self.rows,
+                                 max_pixels=self.row_pixels) for _ in range(2)]
+        try:
+            source = PlaylistSource(items, buffers, self.clock, self.color, loop, load_image=self._get_frame_data,
+                                    make_marquee=self._make_marquee)
+            # Aus dem Worker-Thread der Playlist; angezeigt wird im Tk-Thread
+            source.on_item = lambda index, item: self.view.schedule(
+                0, lambda: self._show_playlist_item(source, positions, index, item))
+            source.start()
+        except Exception as e:
+            self.view.show_error("Playlist Failed", str(e))
+            return False
+        self.publish(source, session, self.create_delta_encoder())
+        return True
+
+    def _show_playlist_item(self, source, positions, index, item):
+        if self.sender.published is not source:
+            return                              # veraltete Meldung einer ersetzten Playlist
+        if positions is not None:
+            self.current_image = positions[index]
+        self.view.show_status(f"Playing {index + 1}/{len(source.items)}: {item.name}")
+
+    def _make_marquee(self, item):
+        # Laufschrift-Eintrag der Playlist; Farben aus JSON kommen als Listen
+        from marquee_manager import MarqueeEngine
+        options = dict(item.options)
+        for key in ("text_color", "bg_color"):
+            if key in options:
+                options[key] = tuple(options[key])
+        return MarqueeEngine(self, item.value, **options)
+
+    def _playlist_stats(self):
+        # Telemetriequelle: aktueller Eintrag, Übergänge und nicht rechtzeitig fertige Übergangsframes
+        source = self.sender.source
+        if not hasattr(source, "items"):
+            return {}
+        return source.stats()
 
     def stop_auto_play(self):
         self.auto_play_active = False
@@ -200,6 +698,7 @@ class LEDController:
         if not config:
             return
                                             # Aggregation: Erstellt ein MarqueeEngine-Objekt, das externe Abhängigkeiten nutzt
+        from marquee_manager import MarqueeEngine
         self.marquee = MarqueeEngine(
             self,
             config["text"],
@@ -211,19 +710,96 @@ class LEDController:
             config["margin_y"],
             config["speed"]
         )
+        self.overlay = {key: config.get(key) for key in ("background", "logo", "logo_position", "logo_opacity")}
         self.view.show_status("Marquee configured.")
 
     def start_marquee(self):
         if not self.marquee:
             self.view.show_warning("Please configure marquee first.")
             return
-        self.thread_mgr.stop_all()
-        self.marquee.start()
+        self.thread_mgr.stop_all()                  # Autoplay beenden; die Laufschrift ersetzt das Bild am nächsten Frame
+        if self.overlay.get("background") or self.overlay.get("logo"):
+            self.start_overlay()
+            return
+        self.marquee.start(self.get_session(), self.create_delta_encoder())
         self.view.show_status("Marquee started.")
 
+    def start_overlay(self):
+        # Laufschrift über Bild, Animation oder Live-Eingang (plus optional Logo) per Compositor
+        session = self.get_session()
+        background = self.overlay.get("background")
+        try:
+            if background == "live":
+                self.start_ingest()             # bis ein Produzent startet: Hintergrundfarbe
+                channel = getattr(self.sender.published, "channel", None)     # läuft schon ein Produzent?
+                if channel is not None and not channel.closed:
+                    from ingest import IngestSource
+                    from compositor import SourceLayer
+                    source = self._compose(session, SourceLayer(IngestSource(channel, session), name="live"))
+                else:
+                    source = self._compose(session)
+            else:
+                source = self._compose(session, self._background_layer(background))
+        except Exception as e:
+            self.view.show_error("Overlay Failed", str(e))
+            return
+        self.publish(source, session, self.create_delta_encoder())
+        self.view.show_status(f"Marquee started over {background or 'background colour'}.")
+
+    def _background_layer(self, background):
+        # Pfad (Bild, Animation, Ordner), "current" = aktuelles Bild der Liste, None = Hintergrundfarbe
+        if background == "current":
+            if not (0 <= self.current_image < len(self.image_paths)):
+                raise ValueError("No image loaded.")
+            background = self.image_paths[self.current_image]
+        if not background:
+            return None
+        from compositor import ImageLayer, SourceLayer
+        from streaming import is_animated
+        if not (os.path.isdir(background) or is_animated(background)):
+            return ImageLayer(background, self.columns, self.rows, name="background")
+        from sending import CompiledFrame
+        from streaming import FramePrefetcher, open_stream
+        factory = open_stream(background, self.columns, self.rows)
+        src = bytes(self.columns * self.rows * 3)
+        # nur als Pixelpuffer genutzt, gesendet wird der Frame des Compositors
+        buffers = [CompiledFrame(b"\0" * 6, b"\0" * 6, src, self.columns, self.rows) for _ in range(2)]
+        prefetcher = FramePrefetcher(factory, self.rows, self.columns * 3, STREAM_PREFETCH_FRAMES).start()
+        return SourceLayer(StreamSource(prefetcher, buffers), name="background")
+
+    def _compose(self, session, background=None):
+        # Ebenen von unten nach oben: Hintergrund (oder Hintergrundfarbe), Laufschrift, Logo
+        from compositor import Compositor, ColorLayer, ImageLayer, MarqueeLayer
+        from sending import CompiledFrame
+        layers = [background or ColorLayer(self.marquee.bg_color, self.columns, self.rows, name="background"),
+                  MarqueeLayer(self.marquee)]
+        logo = self.overlay.get("logo")
+        if logo:
+            x, y = self.overlay.get("logo_position") or (0, 0)
+            opacity = self.overlay.get("logo_opacity")
+            layers.append(ImageLayer(logo, x=x, y=y, opacity=1.0 if opacity is None else opacity, name="logo"))
+        src = bytes(self.columns * self.rows * 3)
+        buffers = [CompiledFrame(session.src_mac, session.dest_mac, src, self.columns, self.rows,
+                                 max_pixels=self.row_pixels) for _ in range(2)]
+        return Compositor(layers, buffers, self.color)
+
+    def _overlay_live(self):
+        # Läuft gerade (oder gleich) eine Laufschrift mit Live-Hintergrund?
+        if self.overlay.get("background") != "live":
+            return False
+        from compositor import Compositor
+        return isinstance(self.sender.published, Compositor)
+
+    def _layer_stats(self):
+        # Telemetriequelle: Zeit je Ebene, nur solange ein Compositor sendet
+        source = self.sender.source
+        if not hasattr(source, "layers"):
+            return {}
+        return source.stats(reset=True)
+
     def stop_sending(self):                         
         self.thread_mgr.stop_all()
-        self.send_mgr.stop_all()
+        self.sender.clear()                          # Sende-Thread läuft weiter, aber im Leerlauf
         self.stop_perf_monitor()
         self.view.show_status("Stopped.")
 
@@ -232,47 +808,83 @@ class LEDController:
         self.stop_auto_play()
         self.stop_sending()
         self.thread_mgr.stop_all()
+        self.send_mgr.stop_all()
+        self.stop_recording()
+        if self.sender_process:
+            self.sender.close()                 # Sendeprozess beenden, Shared Memory freigeben
+        self.stop_ingest()
+        self.preloader.shutdown()
+        self.metrics_server.stop()
+        self.metrics_file.close()
+        self._close_canvas()
         if self.l2:
             try:
                 self.l2.close()
             except Exception as e:
                 logging.error(f"Error closing L2Ethernet socket: {e}")
-        self.view.root.quit()
-        self.view.root.destroy()
-
-    def _update_stats(self, bytes_sent, frame_time):
-                                                     # Atomare Aktualisierung der Performance-Statistiken
-        with self._perf_lock:                        # Sperrt den Zugriff auf die Performance-Daten um eine atomare operation
-            self.bandwidth += bytes_sent             # daten schreiben
-            self.frame_count += 1
-            self.total_frame_time += frame_time
+        self.view.close()
 
     def _monitor_performance(self, stop_event):
+        # Einmal pro Sekunde: Telemetrie-Schnappschuss bilden und in die Metrikdatei schreiben.
+        # Die GUI liest den Schnappschuss im Tk-Thread (_refresh_performance), nie von hier aus.
         while not self._perf_stop_event.wait(1):
-            with self._perf_lock:                   # Sperrt den Zugriff auf die Performance-Daten
-                bytes_this_sec = self.bandwidth     # daten lesen
-                frames_this_sec = self.frame_count
-                self.bandwidth = 0                  # reset zähler 
-                self.frame_count = 0
-                self.total_frame_time = 0.0
-            bits_per_sec = bytes_this_sec * 8
-            timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-            log_line = (f"[Performance] {timestamp}: {bytes_this_sec} bytes/s, "
-                        f"{bits_per_sec} bps, {frames_this_sec} fps")
-            logging.debug(log_line)
-            self.view.update_performance(
-                f"FPS: {frames_this_sec} | Bytes/s: {bytes_this_sec} | BPS: {bits_per_sec}"
-            )
-            with open("performance_log.txt", "a") as f:
-                f.write(log_line + "\n")
-        self.view.update_performance("")
+            snapshot = self.telemetry.collect()
+            logging.debug(f"[Performance] {self._format_performance(snapshot)}")
+            try:
+                self.metrics_file.write(snapshot)
+            except OSError as e:
+                logging.error(f"Writing metrics failed: {e}")
         logging.debug("Performance monitoring stopped.")
 
+    def _format_performance(self, snapshot):
+        clock = snapshot.get("clock", {})
+        cache = snapshot.get("cache", {})
+        target = self.canvas or self.l2
+        tx_mode = target.tx_mode if target else "-"
+        transport = snapshot.get("transport", {})
+        layers = snapshot.get("layers", {})
+        playlist = snapshot.get("playlist", {})
+        sender = snapshot.get("sender", {})
+        rate = ""
+        if sender.get("adaptive"):
+            rate = f" ({'idle' if sender['idle'] else 'active'}, keep-alive {sender['keepalive_fps']:g})"
+        extra = ""
+        if "pid" in sender:
+            extra += (f" | Sender process {sender['pid']}: produce p99 {sender['produce']['p99_ms']} ms, "
+                      f"{sender['lost']} events lost")
+        if playlist:
+            extra += (f" | Playlist: {playlist['item']}/{playlist['items']}, {playlist['transitions']} transitions, "
+                      f"{playlist['underruns']} underruns, {playlist['late']} late")
+        if layers:
+            parts = ", ".join(f"{name} {stats['p99_ms']}" for name, stats in layers.items() if name != "compose")
+            extra += f" | Layers p99: {parts} ms (compose {layers['compose']['p99_ms']} ms)"
+        capture = snapshot.get("capture", {})
+        if capture:
+            extra += f" | Recording: {capture['packets']} packets, {capture['dropped']} dropped"
+        return (f"FPS: {snapshot['fps']:g}/{clock.get('fps_target', 0):g}{rate} | Bytes/s: {snapshot['bytes_per_s']} | "
+                f"BPS: {snapshot['bps']} | TX: {tx_mode} | "
+                f"Build/Send/Latency p99: {snapshot['build']['p99_ms']}/{snapshot['send']['p99_ms']}/"
+                f"{snapshot['latency']['p99_ms']} ms | Packet p50: {snapshot['packet']['p50_us']} us | "
+                f"Late p99: {clock.get('p99_ms', 0)} ms, dropped {clock.get('dropped', 0)} | "
+                f"Errors: {snapshot['send_errors']} (ENOBUFS {snapshot['enobufs']}) | "
+                f"TX full: {transport.get('retries', 0)} retries, {transport.get('frames_dropped', 0)} frames/"
+                f"{transport.get('packets_dropped', 0)} pkts dropped ({transport.get('backpressure', '-')}) | "
+                f"Cache: {cache.get('hit_rate', 0):.0%} hit, {cache.get('bytes', 0) / 1e6:.1f}/"
+                f"{cache.get('max_bytes', 0) / 1e6:.0f} MB, {cache.get('evictions', 0)} evicted{extra}")
+
+    def _refresh_performance(self):
+        # Läuft im Tk-Thread (view.schedule): zeigt den letzten Schnappschuss, solange gemessen wird
+        monitoring = self._perf_monitor is not None and self._perf_monitor.is_alive()
+        snapshot = self.telemetry.latest
+        self.view.update_performance(self._format_performance(snapshot) if monitoring and snapshot else "")
+        self.view.schedule(1000, self._refresh_performance)
+
     def start_perf_monitor(self):                 #thread_starten
         if self._perf_monitor and self._perf_monitor.is_alive():
             return
         self._perf_stop_event.clear()
-        self._perf_monitor = self.thread_mgr.start_thread(self._monitor_performance)
+        # im send_mgr: thread_mgr.stop_all() (Bildwechsel, Autoplay) soll den Monitor nicht jedes Mal joinen
+        self._perf_monitor = self.send_mgr.start_thread(self._monitor_performance)
 
     def stop_perf_monitor(self):
         self._perf_stop_event.set()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import time
+import socket
+import struct
+import select
+import ctypes
+import logging
+import threading
+from constants import ETH_P_ALL, ETH_FRAME_LEN, DISCOVERY_TIMEOUT_S
+
+DETECT_ETHER_TYPE = 0x0700
+REPLY_ETHER_TYPE = 0x0805
+DETECT_PAYLOAD_LENGTH = 270
+REPLY_MIN_LENGTH = 38                           # Spalten an Byte 34/35, Zeilen an 36/37
+BROADCAST_MAC = b"\xff" * 6
+SO_ATTACH_FILTER = 26
+
+class _SockFilter(ctypes.Structure):
+    _fields_ = [("code", ctypes.c_uint16), ("jt", ctypes.c_uint8), ("jf", ctypes.c_uint8), ("k", ctypes.c_uint32)]
+
+class _SockFprog(ctypes.Structure):
+    _fields_ = [("len", ctypes.c_ushort), ("filter", ctypes.POINTER(_SockFilter))]
+
+# Klassisches BPF: nur 0x0805-Antworten mit mindestens REPLY_MIN_LENGTH Bytes, alles andere
+# verwirft der Kernel, bevor es in den Empfangspuffer kopiert wird
+_REPLY_FILTER = (
+    (0x28, 0, 0, 12),                           # ldh [12]           EtherType
+    (0x15, 0, 3, REPLY_ETHER_TYPE),             # jeq #0x0805        sonst -> ret #0
+    (0x80, 0, 0, 0),                            # ld len
+    (0x35, 0, 1, REPLY_MIN_LENGTH),             # jge #38            sonst -> ret #0
+    (0x06, 0, 0, 0xFFFF),                       # ret #65535         annehmen
+    (0x06, 0, 0, 0),                            # ret #0             verwerfen
+)
+
+def format_mac(mac):
+    return ":".join(f"{b:02x}" for b in mac)
+
+def parse_mac(value):
+    return bytes.fromhex(value.replace(":", "").replace("-", ""))
+
+def attach_reply_filter(sock):
+    """Hängt den 0x0805-Filter an einen AF_PACKET-Socket und verwirft, was vorher schon ankam."""
+    program = (_SockFilter * len(_REPLY_FILTER))(*(_SockFilter(*op) for op in _REPLY_FILTER))
+    fprog = _SockFprog(len(_REPLY_FILTER), program)
+    sock.setsockopt(socket.SOL_SOCKET, SO_ATTACH_FILTER, bytes(fprog))
+    sock.setblocking(False)
+    while True:                                 # zwischen socket() und Filter eingetroffene Pakete
+        try:
+            sock.recv(ETH_FRAME_LEN)
+        except BlockingIOError:
+            break
+
+class CardInfo:
+    """Antwort einer Empfängerkarte auf die 0x0700-Erkennung."""
+
+    def __init__(self, mac, columns, rows, interface=None, reply_ms=None):
+        self.mac = mac
+        self.columns = columns
+        self.rows = rows
+        self.interface = interface
+        self.reply_ms = reply_ms
+
+    def __repr__(self):
+        return f"CardInfo({format_mac(self.mac)}, {self.columns}x{self.rows})"
+
+def parse_reply(frame):
+    # (Quell-MAC, Spalten, Zeilen) oder None
+    if len(frame) < REPLY_MIN_LENGTH or frame[12] != 0x08 or frame[13] != 0x05:
+        return None
+    return bytes(frame[6:12]), frame[34] * 256 + frame[35], frame[36] * 256 + frame[37]
+
+def discover(interface, src_mac, dst_mac=BROADCAST_MAC, timeout=DISCOVERY_TIMEOUT_S, wait_all=True):
+    """Sendet eine 0x0700-Anfrage und sammelt bis ``timeout`` die Antworten aller Karten.
+
+    Eigener Empfangs-Socket mit BPF-Filter, der Sende-Socket empfängt nichts.
+    wait_all=False: nach der ersten Antwort zurückkehren. Liefert [CardInfo] in Antwortreihenfolge.
+    """
+    sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+    try:
+        sock.bind((interface, 0))
+        attach_reply_filter(sock)
+        probe = struct.pack("!6s6sH", dst_mac, src_mac, DETECT_ETHER_TYPE) + bytes(DETECT_PAYLOAD_LENGTH)
+        start = time.monotonic()
+        sock.send(probe)
+        until = start + timeout
+        cards = {}
+        while True:
+            remaining = until - time.monotonic()
+            if remaining <= 0:
+                break
+            readable, _, _ = select.select([sock], [], [], remaining)
+            if not readable:
+                break
+            try:
+                frame = sock.recv(ETH_FRAME_LEN)
+            except BlockingIOError:
+                continue
+            reply = parse_reply(frame)
+            if reply is None or reply[0] == src_mac or reply[0] in cards:
+                continue
+            mac, columns, rows = reply
+            cards[mac] = CardInfo(mac, columns, rows, interface, round((time.monotonic() - start) * 1e3, 3))
+            if not wait_all:
+                break
+        return list(cards.values())
+    finally:
+        sock.close()
+
+class GeometryCache:
+    """Zuletzt erkannte Auflösung je Karten-MAC, als JSON gespeichert.
+
+    Antwortet eine Karte beim Start nicht rechtzeitig, kann mit der bekannten Auflösung
+    weitergearbeitet werden.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+        try:
+            with open(path) as f:
+                self._entries = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring geometry cache {path}: {e}")
+
+    def get(self, mac):
+        entry = self._entries.get(format_mac(mac))
+        if not entry:
+            return None
+        return CardInfo(mac, entry["columns"], entry["rows"], entry.get("interface"))
+
+    def update(self, cards):
+        if not cards:
+            return
+        with self._lock:
+            for card in cards:
+                self._entries[format_mac(card.mac)] = {"columns": card.columns, "rows": card.rows,
+                                                       "interface": card.interface,
+                                                       "seen": time.strftime("%Y-%m-%d %H:%M:%S")}
+            tmp = f"{self.path}.tmp"
+            try:
+                with open(tmp, "w") as f:
+                    json.dump(self._entries, f, indent=1, sort_keys=True)
+                os.replace(tmp, self.path)
+            except OSError as e:
+                logging.warning(f"Could not write geometry cache {self.path}: {e}")
@@ -1,27 +1,182 @@
 #!/usr/bin/env python3
 
+import os
+import time
+import errno
+import select
 import socket
 import struct
 import fcntl
-import time
-from constants import ETH_P_ALL, ETH_FRAME_LEN, IF_NAMESIZE
+import ctypes
+import ctypes.util
+import logging
+from constants import (ETH_FRAME_LEN, ETH_MTU, IF_NAMESIZE, TX_MODE_SINGLE, TX_MODE_SENDMMSG,
+                       TX_MODES, SENDMMSG_MAX_VLEN, SOL_PACKET, PACKET_QDISC_BYPASS, SO_SNDBUFFORCE,
+                       TX_QDISC_BYPASS, TX_SNDBUF_BYTES, TX_BLOCKING, TX_BACKPRESSURE, BACKPRESSURE_DROP,
+                       BACKPRESSURES, TX_RETRY_BUDGET_S, ENOBUFS_BACKOFF_S, ROW_MAX_PIXELS, JUMBO_FRAMES)
+from utils import max_row_pixels
+
+_BACKPRESSURE_ERRORS = (errno.EAGAIN, errno.ENOBUFS)
+
+# ctypes-Strukturen für sendmmsg(2) (Linux)
+class _IOVec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+class _MsgHdr(ctypes.Structure):
+    _fields_ = [
+        ("msg_name", ctypes.c_void_p),
+        ("msg_namelen", ctypes.c_uint32),
+        ("msg_iov", ctypes.POINTER(_IOVec)),
+        ("msg_iovlen", ctypes.c_size_t),
+        ("msg_control", ctypes.c_void_p),
+        ("msg_controllen", ctypes.c_size_t),
+        ("msg_flags", ctypes.c_int),
+    ]
+
+class _MMsgHdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", _MsgHdr), ("msg_len", ctypes.c_uint)]
+
+def _load_sendmmsg():
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        func = libc.sendmmsg
+    except (OSError, AttributeError, TypeError):
+        return None
+    func.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int]
+    func.restype = ctypes.c_int
+    return func
+
+_sendmmsg = _load_sendmmsg()
+
+class PacketBatch:
+    """Vorbereitete mmsghdr/iovec-Tabelle für eine feste Liste von Paketen.
+
+    Die Pakete werden nicht kopiert: iov_base zeigt direkt in die (beschreibbaren)
+    Puffer. Einmal bauen, beliebig oft mit L2Ethernet.send_batch() senden.
+    Ein Paket kann auch ein Tupel von Puffern sein (Header, Pixel); der Kernel setzt es
+    per Scatter/Gather zusammen (geteilte Zeilen, siehe sending.CompiledFrame).
+    """
+
+    def __init__(self, packets, reserved=0):
+        # reserved: freie Plätze am Anfang, die später per set_head() belegt werden (z.B. Setup-Pakete)
+        self.reserved = reserved
+        self.count = reserved + len(packets)
+        self.packet_bytes = 0
+        self.head = None
+        self._pinned = []                               # hält die exportierten Puffer am Leben
+        self._views = []                                # Pakete ohne Kopie, für die Aufzeichnung (views())
+        self._parent = None                             # subset(): (Batch, Indizes)
+        parts = [packet if type(packet) is tuple else (packet,) for packet in packets]
+        self._iov = (_IOVec * sum(map(len, parts)))()
+        self.msgs = (_MMsgHdr * self.count)()
+        iov_base = ctypes.addressof(self._iov)
+        index = 0
+        for i, packet in enumerate(parts):
+            views = []
+            for part in packet:
+                view = memoryview(part)
+                if view.readonly:                       # bytes o.ä. -> einmalig beschreibbare Kopie
+                    view = memoryview(bytearray(view))
+                buf = (ctypes.c_char * view.nbytes).from_buffer(view)
+                self._pinned.append(buf)
+                iov = self._iov[index + len(views)]
+                iov.iov_base = ctypes.addressof(buf)
+                iov.iov_len = view.nbytes
+                views.append(view)
+                self.packet_bytes += view.nbytes
+            self._views.append(views[0] if len(views) == 1 else tuple(views))
+            msg = self.msgs[reserved + i]
+            msg.msg_hdr.msg_iov = ctypes.cast(iov_base + index * ctypes.sizeof(_IOVec), ctypes.POINTER(_IOVec))
+            msg.msg_hdr.msg_iovlen = len(views)
+            index += len(views)
+        self.total_bytes = self.packet_bytes
+
+    def set_head(self, head):
+        # Reservierte Plätze mit den Paketen eines anderen Batches belegen (hält diesen am Leben)
+        for i in range(self.reserved):
+            self.msgs[i] = head.msgs[i]
+        self.head = head
+        self.total_bytes = self.packet_bytes + head.total_bytes
+
+    def subset(self, indices):
+        # Teil-Batch aus ausgewählten Paketen; teilt sich iovecs und Puffer mit diesem Batch
+        sub = PacketBatch([])
+        sub._pinned = self._pinned
+        sub._iov = self._iov
+        sub._parent = (self, indices)
+        sub.head = self.head
+        sub.count = len(indices)
+        sub.msgs = (_MMsgHdr * sub.count)()
+        for j, i in enumerate(indices):
+            hdr = self.msgs[i].msg_hdr
+            sub.msgs[j] = self.msgs[i]
+            sub.total_bytes += sum(hdr.msg_iov[k].iov_len for k in range(hdr.msg_iovlen))
+        return sub
+
+    def views(self):
+        # Alle Pakete in Sendereihenfolge (inkl. Kopf-Paketen), nur bei laufender Aufzeichnung gebraucht
+        if self._parent is not None:
+            batch, indices = self._parent
+            views = batch.views()
+            return [views[i] for i in indices]
+        head = self.head.views()[:self.reserved] if self.reserved and self.head else []
+        return head + self._views
+
+class FrameDropped(OSError):
+    """Frame nicht vollständig gesendet: Puffer/Queue voll (ENOBUFS/EAGAIN) und Budget erschöpft.
+
+    Die restlichen Pakete wurden verworfen und in L2Ethernet.counters gezählt.
+    """
+
+    def __init__(self, err, sent, dropped):
+        super().__init__(err, f"{os.strerror(err)}: {dropped} packets dropped")
+        self.sent = sent
+        self.dropped = dropped
 
 class L2Ethernet:                                       #ethernet layer 2 klasse
     
-    def __init__(self, interface_name):                 #Initialisierung
+    def __init__(self, interface_name, tx_mode=TX_MODE_SENDMMSG, qdisc_bypass=TX_QDISC_BYPASS,
+                 sndbuf=TX_SNDBUF_BYTES, blocking=TX_BLOCKING, backpressure=TX_BACKPRESSURE,
+                 recorder=None, jumbo=JUMBO_FRAMES):   #Initialisierung
         self.interface_name = interface_name            
         self.socket = None
         self.ifindex = None
         self.src_mac = None
         self.stop_sending_flag = False                  # Control flag for sending loop
+        self.tx_mode = TX_MODE_SINGLE
+        self.set_tx_mode(tx_mode)
+        self.qdisc_bypass = qdisc_bypass                # gewünschte Einstellungen; aktiv siehe self.active
+        self.sndbuf = sndbuf
+        self.blocking = blocking
+        self.backpressure = TX_BACKPRESSURE
+        self.set_backpressure(backpressure)
+        self.active = {}
+        self._poller = None
+        self.recorder = recorder                        # capture.PcapRecorder: schreibt jedes gesendete Paket mit
+        self.jumbo = jumbo                              # Zeilenpakete bis zur MTU der Schnittstelle statt 1500
+        self.mtu = ETH_MTU
+        self.row_pixels = ROW_MAX_PIXELS                # Pixel pro 0x5500-Paket, siehe _configure_mtu()
+        self.reset_counters()
+
+    def reset_counters(self):
+        # Nur der Sende-Thread zählt; Telemetrie liest einmal pro Sekunde
+        self.counters = {"eagain": 0, "enobufs": 0, "retries": 0, "wait_s": 0.0,
+                         "frames_dropped": 0, "packets_dropped": 0}
 
     def open(self):
         """Open a raw Ethernet socket and initialize interface details."""
         try:
-            self.socket = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))  #Sockets öffnen durch AF_PACKET (root Berechtigungen sind erforderlich)
+            # Sockets öffnen durch AF_PACKET (root Berechtigungen sind erforderlich). Protokoll 0: reiner
+            # Sende-Socket, der Kernel stellt ihm keine Pakete zu (Erkennung über discovery.py)
+            self.socket = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, 0)
             self.socket.bind((self.interface_name, 0))
             self.ifindex = self._get_interface_index(self.interface_name)
-            print(f"Interface {self.interface_name} initialized. ")                                     #log
+            self._configure()
+            self._configure_mtu(self._get_interface_mtu(self.interface_name))
+            print(f"Interface {self.interface_name} initialized (TX mode: {self.tx_mode}, "
+                  f"qdisc bypass: {self.active['qdisc_bypass']}, sndbuf: {self.active['sndbuf']}, "
+                  f"{'blocking' if self.blocking else 'non-blocking'}, backpressure: {self.backpressure}, "
+                  f"MTU {self.mtu}, {self.row_pixels} pixels/packet). ")         #log
         except PermissionError:
             print("Permission denied. Please run with root privileges.")               
             self.close()
@@ -29,12 +184,100 @@ class L2Ethernet:                                       #ethernet layer 2 klasse
             print(f"Error opening socket: {e}")
             self.close()
 
+    def attach(self, sock):
+        # Vorhandenen Datagramm-Socket verwenden, z.B. In-Memory-Link zum receiver_emulator
+        self.socket = sock
+        self._configure()
+        print(f"Interface {self.interface_name} attached to existing socket (TX mode: {self.tx_mode}). ")
+
+    def _configure(self):
+        # Qdisc-Bypass, Sendepuffer und Blockiermodus setzen; die tatsächlich aktiven Werte merken
+        sock = self.socket
+        bypass = False
+        if self.qdisc_bypass and sock.family == socket.AF_PACKET:
+            try:
+                sock.setsockopt(SOL_PACKET, PACKET_QDISC_BYPASS, 1)
+                bypass = True
+            except OSError as e:
+                logging.warning(f"PACKET_QDISC_BYPASS not available on {self.interface_name}: {e}")
+        if self.sndbuf:
+            for option in (SO_SNDBUFFORCE, socket.SO_SNDBUF):   # FORCE nur mit CAP_NET_ADMIN
+                try:
+                    sock.setsockopt(socket.SOL_SOCKET, option, self.sndbuf)
+                    break
+                except OSError:
+                    continue
+        sock.setblocking(self.blocking)
+        self._poller = select.poll()
+        self._poller.register(sock.fileno(), select.POLLOUT)
+        self.active = {"qdisc_bypass": bypass,
+                       "sndbuf": sock.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF),   # vom Kernel verdoppelt
+                       "blocking": self.blocking}
+
+    def _configure_mtu(self, mtu):
+        # Größe der Zeilenpakete aus der MTU: ohne Jumbo-Frames höchstens 1500, auch wenn die Schnittstelle mehr kann
+        self.mtu = mtu
+        if self.jumbo and mtu <= ETH_MTU:
+            logging.warning(f"Jumbo frames requested, but the MTU of {self.interface_name} is {mtu}; "
+                            f"using standard frames (e.g. ip link set {self.interface_name} mtu 9000).")
+        self.row_pixels = max_row_pixels(mtu if self.jumbo else min(mtu, ETH_MTU))
+        self.active["mtu"] = mtu
+        self.active["row_pixels"] = self.row_pixels
+
+    def set_backpressure(self, policy):
+        """ENOBUFS/EAGAIN-Politik: "retry" (bis zum Budget erneut senden) oder "drop"."""
+        if policy not in BACKPRESSURES:
+            raise ValueError(f"Unknown backpressure policy: {policy}")
+        self.backpressure = policy
+        return policy
+
+    def set_recorder(self, recorder):
+        # Mitschnitt ein-/ausschalten (None); wirkt ab dem nächsten Sendeaufruf
+        self.recorder = recorder
+
+    def stats(self):
+        # Aktive Einstellungen und Zähler (Telemetrie)
+        return dict(self.active, tx_mode=self.tx_mode, backpressure=self.backpressure, **self.counters)
+
+    def _backoff(self, err, until):
+        # Puffer oder NIC-Queue voll: True = erneut senden, False = Frame verwerfen
+        counters = self.counters
+        counters["enobufs" if err == errno.ENOBUFS else "eagain"] += 1
+        if self.backpressure == BACKPRESSURE_DROP:
+            return False
+        start = time.perf_counter()
+        remaining = until - start
+        if remaining <= 0:
+            return False
+        if err == errno.EAGAIN and not self.blocking:
+            self._poller.poll(remaining * 1000.0)   # bis der Sendepuffer wieder Platz hat
+        else:
+            time.sleep(min(remaining, ENOBUFS_BACKOFF_S))   # Treiber-Queue voll, poll() meldet das nicht
+        counters["retries"] += 1
+        counters["wait_s"] += time.perf_counter() - start
+        return True
+
+    def _drop(self, err, sent, total):
+        self.counters["frames_dropped"] += 1
+        self.counters["packets_dropped"] += total - sent
+        raise FrameDropped(err, sent, total - sent)
+
     def close(self):                                    
         if self.socket:
             self.socket.close()
             self.socket = None
             print("Socket closed.")
 
+    def set_tx_mode(self, mode):
+        """Select the transmit path at runtime; returns the mode that is actually active."""
+        if mode not in TX_MODES:
+            raise ValueError(f"Unknown TX mode: {mode}")
+        if mode == TX_MODE_SENDMMSG and _sendmmsg is None:
+            logging.warning("sendmmsg() not available, falling back to per-packet sending.")
+            mode = TX_MODE_SINGLE
+        self.tx_mode = mode
+        return self.tx_mode
+
     def send(self, dest_mac, src_mac, ether_type, payload):
         if not self.socket:
             print("Socket is not open. Call open() first.")
@@ -46,22 +289,116 @@ class L2Ethernet:                                       #ethernet layer 2 klasse
         #6s: Ein weiterer 6-Byte-String (für die Quell-MAC-Adresse)
         #H: Ein unsigned short (2 Byte) für den Ether-Type
         frame = eth_header + payload
-        start = time.monotonic()
-        bytes_sent = self.socket.send(frame)
-        elapsed = time.monotonic() - start
-        print(f"Sent {bytes_sent} bytes in {elapsed:.6f} seconds.")
+        sent = self.socket.send(frame)      # keine Ausgabe pro Paket; Zeiten erfasst die Telemetrie
+        if self.recorder:
+            self.recorder.record(time.time_ns(), (frame,))
+        return sent
+
+    def sendmsg(self, buffers, timeout=None):
+        # Ein Paket aus mehreren Teilen (Scatter/Gather) mit derselben ENOBUFS/EAGAIN-Politik
+        until = None
+        while True:
+            try:
+                sent = self.socket.sendmsg(buffers)
+                if self.recorder:
+                    self.recorder.record(time.time_ns(), (b"".join(buffers),))
+                return sent
+            except OSError as e:
+                if e.errno not in _BACKPRESSURE_ERRORS:
+                    raise
+                if until is None:
+                    until = time.perf_counter() + (TX_RETRY_BUDGET_S if timeout is None else timeout)
+                if not self._backoff(e.errno, until):
+                    self._drop(e.errno, 0, 1)
+
+    def send_packets(self, packets, timeout=None):
+        # Fallback-Pfad: ein Syscall pro fertigem Paket (Header bereits enthalten).
+        # timeout: Budget in Sekunden für Wartezeiten bei vollem Puffer (Standard TX_RETRY_BUDGET_S)
+        send = self.socket.send
+        sendmsg = self.socket.sendmsg                   # Tupel (Header, Pixel): geteilte Zeilen per Scatter/Gather
+        stamp = time.time_ns() if self.recorder else 0
+        bytes_sent = 0
+        until = None
+        index = 0
+        count = len(packets)
+        while index < count:
+            try:
+                packet = packets[index]
+                bytes_sent += sendmsg(packet) if type(packet) is tuple else send(packet)
+                index += 1
+            except OSError as e:
+                if e.errno not in _BACKPRESSURE_ERRORS:
+                    self._tee(stamp, packets[:index])
+                    raise
+                if until is None:
+                    until = time.perf_counter() + (TX_RETRY_BUDGET_S if timeout is None else timeout)
+                if not self._backoff(e.errno, until):
+                    self._tee(stamp, packets[:index])
+                    self._drop(e.errno, index, count)
+        self._tee(stamp, packets)
         return bytes_sent
 
-    def recv(self):
+    def send_batch(self, batch, timeout=None):
+        # Übergibt alle Pakete eines PacketBatch mit so wenigen sendmmsg()-Aufrufen wie möglich.
+        # Bei ENOBUFS/EAGAIN wird ab dem ersten nicht gesendeten Paket fortgesetzt, bis das Budget
+        # abläuft; danach wird der Rest verworfen (FrameDropped), statt Zeilen still zu verlieren.
+        fd = self.socket.fileno()
+        base = ctypes.addressof(batch.msgs)
+        size = ctypes.sizeof(_MMsgHdr)
+        stamp = time.time_ns() if self.recorder else 0
+        sent = 0
+        until = None
+        while sent < batch.count:
+            n = _sendmmsg(fd, base + sent * size, min(batch.count - sent, SENDMMSG_MAX_VLEN), 0)
+            if n < 0:
+                err = ctypes.get_errno()
+                if err not in _BACKPRESSURE_ERRORS:
+                    self._tee_batch(stamp, batch, sent)
+                    raise OSError(err, os.strerror(err))
+                if until is None:
+                    until = time.perf_counter() + (TX_RETRY_BUDGET_S if timeout is None else timeout)
+                if not self._backoff(err, until):
+                    self._tee_batch(stamp, batch, sent)
+                    self._drop(err, sent, batch.count)
+                continue
+            sent += n
+        self._tee_batch(stamp, batch, sent)
+        return batch.total_bytes
+
+    def _tee(self, stamp, packets):
+        # Angenommene Pakete an den Mitschnitt (Zeitstempel = Beginn des Sendeaufrufs, ein Burst)
+        recorder = self.recorder
+        if recorder and packets:
+            recorder.record(stamp or time.time_ns(), packets)
+
+    def _tee_batch(self, stamp, batch, sent):
+        if self.recorder and sent:
+            self._tee(stamp, batch.views()[:sent])
+
+    def recv(self, timeout=None):
+        # Nur für angehängte Sockets (attach); ein mit open() geöffneter Sende-Socket empfängt nichts.
+        # timeout in Sekunden (None = warten); der Socket bleibt dabei im eingestellten Blockiermodus
+        if timeout is not None or not self.blocking:
+            readable, _, _ = select.select([self.socket], [], [], timeout)
+            if not readable:
+                raise socket.timeout("timed out")
         return self.socket.recv(ETH_FRAME_LEN)
 
     def _get_interface_index(self, interface_name):
         SIOCGIFINDEX = 0x8933
-        ifreq = struct.pack(f"{IF_NAMESIZE}sH", interface_name.encode("utf-8"))
+        ifreq = struct.pack(f"{IF_NAMESIZE}sH", interface_name.encode("utf-8"), 0)
         with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
             res = fcntl.ioctl(s.fileno(), SIOCGIFINDEX, ifreq) 
             _, ifindex = struct.unpack(f"{IF_NAMESIZE}sH", res)
             return ifindex
 
+    def _get_interface_mtu(self, interface_name):
+        SIOCGIFMTU = 0x8921
+        ifreq = struct.pack(f"{IF_NAMESIZE}si", interface_name.encode("utf-8"), 0)
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            res = fcntl.ioctl(s.fileno(), SIOCGIFMTU, ifreq)
+            _, mtu = struct.unpack(f"{IF_NAMESIZE}si", res)
+            return mtu
+
     def stop_sending(self):
         self.stop_sending_flag = True
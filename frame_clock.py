@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+import time
+from telemetry import Histogram
+
+class LatenessHistogram(Histogram):
+    """Histogramm der Frame-Verspätung mit festen 10-µs-Buckets (bis 50 ms, darüber Überlauf-Bucket)."""
+
+    def __init__(self):
+        super().__init__(bucket_s=10e-6, buckets=5000)
+
+class FrameClock:
+    """Gemeinsame Wiedergabe-Uhr: plant Frames gegen absolute monotone Deadlines.
+
+    Jede Sendeschleife hält ihre eigene Deadline und ruft wait_next() auf; Bildrate
+    und Statistik sind geteilt und können zur Laufzeit (GUI) geändert werden.
+    Gewartet wird hybrid: grob per stop_event.wait(), die letzten ``spin_s`` Sekunden
+    aktiv auf perf_counter(), damit die Abweichung im Sub-Millisekundenbereich bleibt.
+    """
+
+    def __init__(self, fps=60, spin_s=0.001):
+        self.interval = 1.0 / 60
+        self.set_fps(fps)
+        self.spin_s = spin_s
+        self.lateness = LatenessHistogram()
+        self.dropped_frames = 0                 # übersprungene Deadlines nach großer Verspätung
+
+    @property
+    def fps(self):
+        return 1.0 / self.interval
+
+    def set_fps(self, fps):
+        if fps and fps > 0:
+            self.interval = 1.0 / float(fps)
+
+    @staticmethod
+    def now():
+        return time.perf_counter()
+
+    def wait_next(self, deadline, stop_event, spin=True):
+        """Wartet bis zur nächsten Deadline nach ``deadline``; liefert diese oder None bei Stop.
+
+        spin=False: nur schlafen (ohne aktives Warten), z.B. im Leerlauf der adaptiven Bildrate.
+        """
+        interval = self.interval
+        target = deadline + interval
+        now = time.perf_counter()
+        if now - target > interval:
+            # mehr als einen Frame zurück: nicht nachholen (kein Burst), sondern neu aufsetzen
+            self.dropped_frames += int((now - target) / interval)
+            target = now
+        remaining = target - now - (self.spin_s if spin else 0)
+        if remaining > 0 and stop_event.wait(remaining):
+            return None
+        while time.perf_counter() < target:
+            pass
+        self.lateness.record(time.perf_counter() - target)
+        return None if stop_event.is_set() else target
+
+    def stats(self, reset=False):
+        stats = self.lateness.snapshot(reset)
+        stats["fps_target"] = round(self.fps, 2)
+        stats["dropped"] = self.dropped_frames
+        if reset:
+            self.dropped_frames = 0
+        return stats
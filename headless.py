@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+import time
+import heapq
+import logging
+import threading
+import itertools
+from constants import ADAPTIVE_REFRESH, KEEPALIVE_FPS, JUMBO_FRAMES, SENDER_PROCESS, SENDER_PROCESS_CPU
+
+class Var:
+    """Ersatz für tk.Variable ohne Tk: get/set und trace_add("write", callback)."""
+
+    def __init__(self, value=None):
+        self._value = value
+        self._traces = []
+
+    def get(self):
+        return self._value
+
+    def set(self, value):
+        self._value = value
+        for callback in list(self._traces):
+            callback(str(id(self)), "", "write")
+
+    def trace_add(self, mode, callback):
+        self._traces.append(callback)
+
+class HeadlessView:
+    """View ohne Fenster für LEDController (Kiosk, Daemon, SSH).
+
+    Stellt dieselben Variablen und Meldungs-Methoden wie MainView bereit. Meldungen
+    gehen ins Logging, schedule() läuft über eine eigene Ereignisschleife (run()) im
+    Hauptthread, sodass der Controller wie unter Tk nur aus einem Thread bedient wird.
+    Dialoge liefern die Werte von der Kommandozeile (``prompts``).
+    """
+    interactive = False
+
+    def __init__(self, interface="", src_mac="22:22:33:44:55:66", dst_mac="11:22:33:44:55:66",
+                 brightness=50, tx_mode="sendmmsg", backpressure="retry", jumbo=JUMBO_FRAMES, fps=60, delta=False, keyframe_interval=60,
+                 adaptive=ADAPTIVE_REFRESH, keepalive_fps=KEEPALIVE_FPS, gamma=1.0, color_temp=6500, gain=(1.0, 1.0, 1.0), dither="none",
+                 sender_process=SENDER_PROCESS, sender_cpu=SENDER_PROCESS_CPU, prompts=None):
+        self.interface_combo = Var(interface)
+        self.src_mac_var = Var(src_mac)
+        self.dst_mac_var = Var(dst_mac)
+        self.brightness_var = Var(brightness)
+        self.tx_mode_var = Var(tx_mode)
+        self.backpressure_var = Var(backpressure)
+        self.jumbo_var = Var(jumbo)
+        self.fps_var = Var(fps)
+        self.delta_var = Var(delta)
+        self.keyframe_interval_var = Var(keyframe_interval)
+        self.adaptive_var = Var(adaptive)
+        self.keepalive_fps_var = Var(keepalive_fps)
+        self.gamma_var = Var(gamma)
+        self.color_temp_var = Var(color_temp)
+        self.gain_r_var, self.gain_g_var, self.gain_b_var = (Var(g) for g in gain)
+        self.dither_var = Var(dither)
+        self.sender_process_var = Var(sender_process)  # nur beim Start des Controllers ausgewertet
+        self.sender_cpu_var = Var(sender_cpu)
+        self.prompts = prompts or {}            # "file_paths", "directory", "canvas_layout", "marquee_config", "playlist", "capture"
+        self.performance = ""
+        self._queue = []                        # (fällig, Reihenfolge, Callback)
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+
+    # --- Ereignisschleife ---
+
+    def schedule(self, delay_ms, callback):
+        # Callback nach delay_ms in der Ereignisschleife (Hauptthread) ausführen; aus jedem Thread erlaubt
+        due = time.monotonic() + delay_ms / 1000.0
+        with self._lock:
+            heapq.heappush(self._queue, (due, next(self._order), callback))
+        self._wakeup.set()
+
+    def run(self):
+        # Blockiert bis close(); führt fällige Callbacks der Reihe nach aus
+        while not self._stopped.is_set():
+            with self._lock:
+                timeout = self._queue[0][0] - time.monotonic() if self._queue else 0.5
+                if timeout <= 0:
+                    _, _, callback = heapq.heappop(self._queue)
+            if timeout > 0:
+                self._wakeup.wait(min(timeout, 0.5))
+                self._wakeup.clear()
+                continue
+            try:
+                callback()
+            except Exception as e:
+                logging.error(f"Scheduled callback failed: {e}")
+
+    def close(self):
+        self._stopped.set()
+        self._wakeup.set()
+
+    @property
+    def closed(self):
+        return self._stopped.is_set()
+
+    # --- Meldungen ---
+
+    def update_performance(self, text):
+        self.performance = text                 # wird bereits einmal pro Sekunde geloggt
+
+    def show_status(self, text):
+        logging.info(text)
+
+    def show_error(self, title, msg):
+        logging.error(f"{title}: {msg}")
+
+    def show_warning(self, msg):
+        logging.warning(msg)
+
+    def show_info(self, title, msg):
+        logging.info(f"{title}: {msg}")
+
+    # --- Dialoge: Werte von der Kommandozeile ---
+
+    def prompt_file_paths(self):
+        return self.prompts.get("file_paths")
+
+    def prompt_directory(self):
+        return self.prompts.get("directory")
+
+    def prompt_canvas_layout(self):
+        return self.prompts.get("canvas_layout")
+
+    def prompt_playlist(self):
+        return self.prompts.get("playlist")
+
+    def prompt_capture_path(self):
+        return self.prompts.get("capture")
+
+    def prompt_marquee_config(self):
+        return self.prompts.get("marquee_config")
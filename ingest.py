@@ -0,0 +1,481 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import time
+import stat
+import socket
+import struct
+import logging
+import selectors
+import numpy as np
+from multiprocessing import shared_memory
+from sending import CompiledFrame, frame_layout
+from thread_manager import ThreadManager
+from constants import INGEST_SOCKET_PATH, INGEST_SLOTS, ROW_MAX_PIXELS
+
+FORMAT_BGR = "bgr"
+FORMAT_RGB = "rgb"
+FORMATS = (FORMAT_BGR, FORMAT_RGB)
+
+# Aufbau des Segments (alle Werte little endian):
+#   0..63   Kopf: Magic, Version, Format, Slots, Spalten, Zeilen, Layout (HEADER),
+#           @32 u64 Sequenznummer des zuletzt veröffentlichten Frames,
+#           @40 u32 Slot dieses Frames, @44 u32 Slot, den der Sender gerade zeigt
+#   danach  ``slots`` Slots zu je ``slot_bytes``: @0 u64 Sequenznummer des Inhalts (0 = wird beschrieben),
+#           ab @64 fertige 0x5500-Zeilenpakete; die Pixel einer Zeile liegen ab ``pixel_offset``,
+#           Zeilen im Abstand ``row_stride`` (breite Zeilen: Pixel zusammenhängend, Header dahinter)
+MAGIC = b"LEDI"
+VERSION = 1
+HEADER = struct.Struct("<4sBBBxHHIIII")
+HEADER_BYTES = 64
+SLOT_HEADER_BYTES = 64
+SEQ_OFFSET = 32
+LATEST_OFFSET = 40
+READING_OFFSET = 44
+NO_SLOT = 0xFFFFFFFF
+MIN_SLOTS = 3                                   # zuletzt veröffentlicht, vom Sender gezeigt, in Arbeit
+MAX_SLOTS = 8
+_U64 = struct.Struct("<Q")
+_U32 = struct.Struct("<I")
+
+def segment_layout(columns, rows, slots, row_pixels=ROW_MAX_PIXELS):
+    # Slot-Aufbau wie CompiledFrame (sending.frame_layout), damit die Pakete direkt im Slot liegen
+    _, row_stride, pixel_offset, frame_bytes = frame_layout(columns, rows, row_pixels)
+    slot_bytes = (SLOT_HEADER_BYTES + frame_bytes + 63) // 64 * 64
+    return {"columns": columns, "rows": rows, "slots": slots, "slot_offset": HEADER_BYTES,
+            "slot_bytes": slot_bytes, "row_stride": row_stride, "pixel_offset": pixel_offset,
+            "frame_bytes": frame_bytes, "row_pixels": row_pixels}
+
+def _slot_start(layout, slot):
+    return layout["slot_offset"] + slot * layout["slot_bytes"]
+
+def pixel_view(buf, layout, slot):
+    # Zeilen x Spalten x 3 View auf die Pixel eines Slots (zwischen den Paket-Headern, ohne Kopie)
+    rows, columns, stride = layout["rows"], layout["columns"], layout["row_stride"]
+    area = np.frombuffer(buf, dtype=np.uint8, count=rows * stride,
+                         offset=_slot_start(layout, slot) + SLOT_HEADER_BYTES).reshape(rows, stride)
+    offset = layout["pixel_offset"]
+    return area[:, offset:offset + columns * 3].reshape(rows, columns, 3)
+
+class _Segment(shared_memory.SharedMemory):
+    # Beim Aufräumen nicht scheitern, solange noch Views auf das Segment leben
+    def __del__(self):
+        try:
+            self.close()
+        except (OSError, BufferError):
+            pass
+
+class IngestChannel:
+    """Shared-Memory-Segment einer Produzenten-Verbindung (wird vom Server angelegt und entfernt)."""
+
+    def __init__(self, columns, rows, fmt=FORMAT_BGR, slots=INGEST_SLOTS, row_pixels=ROW_MAX_PIXELS):
+        if not MIN_SLOTS <= slots <= MAX_SLOTS:
+            raise ValueError(f"slots must be between {MIN_SLOTS} and {MAX_SLOTS}")
+        self.columns = columns
+        self.rows = rows
+        self.format = fmt
+        self.layout = segment_layout(columns, rows, slots, row_pixels)
+        size = _slot_start(self.layout, slots)
+        self.shm = _Segment(create=True, size=size)
+        HEADER.pack_into(self.shm.buf, 0, MAGIC, VERSION, FORMATS.index(fmt), slots, columns, rows,
+                         self.layout["slot_offset"], self.layout["slot_bytes"],
+                         self.layout["row_stride"], self.layout["pixel_offset"])
+        _U32.pack_into(self.shm.buf, READING_OFFSET, NO_SLOT)
+        self.closed = False
+        self._unlinked = False
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def describe(self):
+        return dict(self.layout, shm=self.name, format=self.format)
+
+    @classmethod
+    def attach(cls, description, shared_tracker=False):
+        # Segment eines anderen Prozesses öffnen (Beschreibung aus describe()); entfernt wird es dort
+        channel = cls.__new__(cls)
+        channel.columns = description["columns"]
+        channel.rows = description["rows"]
+        channel.format = description["format"]
+        channel.layout = {key: value for key, value in description.items() if key not in ("shm", "format")}
+        channel.shm = attach_segment(description["shm"], shared_tracker)
+        channel.closed = False
+        channel._unlinked = True
+        return channel
+
+    def close(self):
+        # Segment entfernen; False, solange noch Views darauf leben (der Server versucht es erneut)
+        self.closed = True
+        if not self._unlinked:
+            self._unlinked = True
+            self.shm.unlink()
+        try:
+            self.shm.close()
+        except BufferError:
+            return False
+        return True
+
+class IngestSource:
+    """Frame-Quelle für einen Live-Produzenten.
+
+    Die Slots enthalten bereits fertige Zeilenpakete: die Header schreibt diese Quelle einmal,
+    der Produzent nur die Pixel. Bei BGR ohne aktive Farbkorrektur sendet sendmmsg direkt aus
+    dem Shared Memory, ohne Kopie; RGB oder LUTs laufen in einem Durchgang in einen Doppelpuffer.
+    Liegt zur Deadline kein neuer Frame vor, bleibt der letzte stehen.
+    """
+
+    def __init__(self, channel, session, color=None):
+        self.channel = channel
+        self.color = color
+        self.rgb = channel.format == FORMAT_RGB
+        layout = channel.layout
+        self._buf = memoryview(channel.shm.buf)     # eigene View: shm.close() gibt sonst genau diese frei
+        length = layout["frame_bytes"]
+        self.row_pixels = layout["row_pixels"]
+        self.frames = []
+        for slot in range(layout["slots"]):
+            start = _slot_start(layout, slot) + SLOT_HEADER_BYTES
+            self.frames.append(CompiledFrame(session.src_mac, session.dest_mac, None, channel.columns, channel.rows,
+                                             buffer=self._buf[start:start + length], max_pixels=self.row_pixels))
+        self._slot_seq = [_slot_start(layout, slot) for slot in range(layout["slots"])]
+        self.buffers = None                     # Doppelpuffer für RGB/Farbkorrektur, erst bei Bedarf
+        self.compiled = None
+        self.seq = 0
+        self.received = 0
+        self.missed = 0                         # neuer Frame gesehen, Slot aber schon wieder überschrieben
+        self._reading = NO_SLOT                 # Slot des gerade gesendeten Frames
+        self._index = 0
+
+    def next_frame(self, deadline):
+        buf = self._buf
+        seq = _U64.unpack_from(buf, SEQ_OFFSET)[0]
+        if seq == self.seq:
+            return self.compiled
+        slot = _U32.unpack_from(buf, LATEST_OFFSET)[0]
+        if slot >= len(self.frames) or _U64.unpack_from(buf, self._slot_seq[slot])[0] != seq:
+            self.missed += 1
+            return self.compiled
+        _U32.pack_into(buf, READING_OFFSET, slot)    # Produzent schreibt diesen Slot ab jetzt nicht mehr
+        if _U64.unpack_from(buf, self._slot_seq[slot])[0] != seq:
+            self.missed += 1                    # Produzent hatte den Slot gerade noch begonnen
+            _U32.pack_into(buf, READING_OFFSET, self._reading)     # weiter gesendeter Slot bleibt geschützt
+            return self.compiled
+        self._reading = slot
+        self.seq = seq
+        self.received += 1
+        frame = self.frames[slot]
+        color = self.color
+        if not self.rgb and (color is None or color.identity):
+            self.compiled = frame               # Zero-Copy: Pakete liegen im Shared Memory
+            return frame
+        if self.buffers is None:
+            src_mac, dest_mac = frame.key[:2]
+            self.buffers = [CompiledFrame(src_mac, dest_mac, None, frame.column_count, frame.row_count,
+                                          max_pixels=self.row_pixels) for _ in range(2)]
+        out = self.buffers[self._index & 1]
+        self._index += 1
+        if color is not None:
+            color.apply(frame.pixel_array(), out.pixel_array(), rgb=self.rgb)
+        else:
+            np.copyto(out.pixel_array(), frame.pixel_array()[:, :, ::-1])
+        self.compiled = out
+        return out
+
+    def close(self):
+        # Views auf das Segment freigeben, damit der Server es schließen kann
+        self.frames = []
+        self.compiled = None
+        self._buf = None
+        logging.debug(f"Ingest source stopped: {self.received} frames received, {self.missed} missed.")
+
+class _Connection:
+    def __init__(self, sock):
+        self.sock = sock
+        self.buffer = b""
+        self.channel = None
+
+class IngestServer:
+    """Steuerkanal für Live-Produzenten: Unix-Stream-Socket, ein JSON-Objekt pro Zeile.
+
+    Befehle: hello, open (Auflösung/Format/Slots aushandeln, liefert den Segmentnamen),
+    start, stop, brightness, close. Jede Verbindung bekommt ein eigenes Segment, das beim
+    Trennen entfernt wird. Die Callbacks laufen im Server-Thread; die Frames selbst laufen
+    nur über das Shared Memory, nie über den Socket.
+    """
+
+    def __init__(self, path=INGEST_SOCKET_PATH, describe=None, on_start=None, on_stop=None, on_brightness=None):
+        self.path = path
+        self.describe = describe                # () -> {"columns", "rows", "fps", "row_pixels"}
+        self.on_start = on_start                # Callback(channel)
+        self.on_stop = on_stop                  # Callback(channel)
+        self.on_brightness = on_brightness      # Callback(percent)
+        self.workers = ThreadManager()
+        self._listener = None
+        self._closing = []                      # Kanäle, deren Segment noch nicht geschlossen werden konnte
+
+    def start(self):
+        if os.path.exists(self.path) and stat.S_ISSOCK(os.stat(self.path).st_mode):
+            os.remove(self.path)                # veralteter Socket eines früheren Laufs
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(self.path)
+        listener.listen(4)
+        listener.setblocking(False)
+        self._listener = listener
+        self.workers.start_thread(self.run)
+        logging.info(f"Live ingest listening on {self.path}")
+
+    def stop(self):
+        self.workers.stop_all()
+        if self._listener:
+            self._listener.close()
+            self._listener = None
+            if os.path.exists(self.path):
+                os.remove(self.path)
+        for channel in self._closing:
+            if not channel.close():
+                logging.debug(f"Ingest segment {channel.name} still in use at shutdown.")
+        self._closing = []
+
+    def run(self, stop_event):
+        # Signatur passend zu ThreadManager.start_thread(target(stop_event))
+        selector = selectors.DefaultSelector()
+        selector.register(self._listener, selectors.EVENT_READ)
+        try:
+            while not stop_event.is_set():
+                for key, _ in selector.select(0.2):
+                    if key.fileobj is self._listener:
+                        conn, _ = self._listener.accept()
+                        selector.register(conn, selectors.EVENT_READ, _Connection(conn))
+                    elif not self._read(key.data):
+                        selector.unregister(key.fileobj)
+                        self._disconnect(key.data)
+                self._closing = [channel for channel in self._closing if not channel.close()]
+        finally:
+            for key in list(selector.get_map().values()):
+                if key.data is not None:
+                    self._disconnect(key.data)
+            selector.close()
+
+    def _read(self, conn):
+        try:
+            data = conn.sock.recv(65536)
+        except OSError:
+            return False
+        if not data:
+            return False
+        conn.buffer += data
+        while b"\n" in conn.buffer:
+            line, conn.buffer = conn.buffer.split(b"\n", 1)
+            if not line.strip():
+                continue
+            try:
+                reply = self._handle(conn, json.loads(line))
+            except Exception as e:
+                reply = {"ok": False, "error": str(e)}
+            try:
+                conn.sock.sendall(json.dumps(reply).encode("utf-8") + b"\n")
+            except OSError:
+                return False
+            if reply.get("closed"):
+                return False
+        return True
+
+    def _handle(self, conn, message):
+        cmd = message.get("cmd")
+        info = self.describe() if self.describe else {}
+        if cmd == "hello":
+            return dict(info, ok=True, version=VERSION, formats=list(FORMATS))
+        if cmd == "open":
+            columns = int(message.get("columns") or info["columns"])
+            rows = int(message.get("rows") or info["rows"])
+            if (columns, rows) != (info["columns"], info["rows"]):
+                # Aushandlung: der Produzent rendert in der Panelgröße und fragt erneut an
+                return {"ok": False, "error": "resolution mismatch", "columns": info["columns"], "rows": info["rows"]}
+            fmt = message.get("format", FORMAT_BGR)
+            if fmt not in FORMATS:
+                return {"ok": False, "error": f"unsupported format {fmt}", "formats": list(FORMATS)}
+            slots = int(message.get("slots", INGEST_SLOTS))
+            if not MIN_SLOTS <= slots <= MAX_SLOTS:
+                return {"ok": False, "error": f"slots must be between {MIN_SLOTS} and {MAX_SLOTS}"}
+            self._release(conn)
+            conn.channel = IngestChannel(columns, rows, fmt, slots, info.get("row_pixels", ROW_MAX_PIXELS))
+            return dict(conn.channel.describe(), ok=True)
+        if cmd == "brightness":
+            percent = int(message["value"])
+            if not 0 <= percent <= 100:
+                return {"ok": False, "error": "brightness must be 0..100"}
+            if self.on_brightness:
+                self.on_brightness(percent)
+            return {"ok": True}
+        if cmd == "close":
+            return {"ok": True, "closed": True}
+        if cmd not in ("start", "stop"):
+            return {"ok": False, "error": f"unknown command {cmd}"}
+        channel = conn.channel
+        if channel is None:
+            return {"ok": False, "error": "open a channel first"}
+        if cmd == "start":
+            if (channel.columns, channel.rows) != (info.get("columns"), info.get("rows")):
+                return {"ok": False, "error": "resolution changed, open again",
+                        "columns": info.get("columns"), "rows": info.get("rows")}
+            if self.on_start:
+                self.on_start(channel)
+        elif self.on_stop:
+            self.on_stop(channel)
+        return {"ok": True}
+
+    def _release(self, conn):
+        channel = conn.channel
+        if channel is None:
+            return
+        conn.channel = None
+        if self.on_stop:
+            self.on_stop(channel)
+        if not channel.close():
+            self._closing.append(channel)       # Sender hält noch Views, nächster Versuch im Server-Loop
+
+    def _disconnect(self, conn):
+        self._release(conn)
+        try:
+            conn.sock.close()
+        except OSError:
+            pass
+
+def attach_segment(name, shared_tracker=False):
+    # Segment öffnen, ohne dass der resource_tracker dieses Prozesses es beim Beenden löscht.
+    # shared_tracker: Kindprozess, der den Tracker des Erzeugers mitbenutzt (multiprocessing) - dort
+    # ist das Segment bereits registriert und wird beim unlink() des Erzeugers wieder abgemeldet
+    try:
+        return _Segment(name=name, track=False)                        # ab Python 3.13
+    except TypeError:
+        shm = _Segment(name=name)
+        if not shared_tracker:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+class SlotWriter:
+    """Schreibseite der Slots: frame() liefert die Pixel des nächsten freien Slots, publish() gibt ihn frei.
+
+    Genutzt vom IngestClient und vom Sendeprozess (sender_process.py).
+    """
+
+    def __init__(self, buf, layout):
+        self.buf = buf
+        self.layout = layout
+        self.views = [pixel_view(buf, layout, slot) for slot in range(layout["slots"])]
+        self.seq = 0
+        self._slot = None
+
+    def frame(self):
+        # Nächster freier Slot: weder der zuletzt veröffentlichte noch der, den der Sender gerade zeigt
+        buf = self.buf
+        slots = len(self.views)
+        latest = _U32.unpack_from(buf, LATEST_OFFSET)[0] if self.seq else NO_SLOT
+        avoid = {latest, _U32.unpack_from(buf, READING_OFFSET)[0]}
+        while True:
+            slot = next((s for s in range(slots) if s not in avoid), None)
+            if slot is None:
+                # Sender wechselt gerade den Slot (übernimmt ihn oder verwirft ihn wieder): kurz warten
+                time.sleep(0.0001)
+                avoid = {latest, _U32.unpack_from(buf, READING_OFFSET)[0]}
+                continue
+            _U64.pack_into(buf, _slot_start(self.layout, slot), 0)     # Slot wird beschrieben
+            # Hat der Sender den Slot zwischen Lesen und Nullsetzen übernommen, einen anderen nehmen;
+            # übernimmt er ihn danach, sieht er die Sequenz 0 und verwirft ihn selbst
+            if _U32.unpack_from(buf, READING_OFFSET)[0] != slot:
+                break
+            avoid.add(slot)
+        self._slot = slot
+        return self.views[slot]
+
+    def publish(self):
+        # Frame freigeben: erst Slot-Sequenz, dann Slot-Index, zuletzt die globale Sequenz
+        if self._slot is None:
+            return
+        buf = self.buf
+        self.seq += 1
+        _U64.pack_into(buf, _slot_start(self.layout, self._slot), self.seq)
+        _U32.pack_into(buf, LATEST_OFFSET, self._slot)
+        _U64.pack_into(buf, SEQ_OFFSET, self.seq)
+        self._slot = None
+
+    def close(self):
+        # Views freigeben, damit das Segment geschlossen werden kann
+        self.views = []
+        self._slot = None
+        self.buf = None
+
+class IngestClient:
+    """Gegenstück für Produzenten in Python; andere Sprachen sprechen dasselbe Protokoll.
+
+        client = IngestClient().open(fmt="rgb")
+        client.start()
+        while running:
+            render(client.frame())              # Zeilen x Spalten x 3, direkt im Shared Memory
+            client.publish()
+    """
+
+    def __init__(self, path=INGEST_SOCKET_PATH):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self._reader = self.sock.makefile("rb")
+        self.shm = None
+        self.layout = None
+        self.writer = None
+
+    def request(self, **message):
+        self.sock.sendall(json.dumps(message).encode("utf-8") + b"\n")
+        reply = json.loads(self._reader.readline() or b'{"ok": false, "error": "connection closed"}')
+        if not reply.get("ok"):
+            raise RuntimeError(reply.get("error", "request failed"))
+        return reply
+
+    def hello(self):
+        return self.request(cmd="hello")
+
+    def open(self, columns=None, rows=None, fmt=FORMAT_BGR, slots=INGEST_SLOTS):
+        self._detach()
+        self.layout = self.request(cmd="open", columns=columns, rows=rows, format=fmt, slots=slots)
+        self.shm = attach_segment(self.layout["shm"])
+        self.writer = SlotWriter(self.shm.buf, self.layout)
+        return self
+
+    def frame(self):
+        return self.writer.frame()
+
+    def publish(self):
+        if self.writer:
+            self.writer.publish()
+
+    def start(self):
+        return self.request(cmd="start")
+
+    def stop(self):
+        return self.request(cmd="stop")
+
+    def brightness(self, percent):
+        return self.request(cmd="brightness", value=percent)
+
+    def _detach(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        if self.shm is not None:
+            try:
+                self.shm.close()
+            except BufferError:
+                # Produzent hält noch Views aus frame(); Mapping bleibt bis zu deren Freigabe bestehen
+                logging.debug("Ingest frame views still referenced; segment stays mapped.")
+            self.shm = None
+
+    def close(self):
+        try:
+            self.request(cmd="close")
+        except (OSError, RuntimeError, ValueError):
+            pass
+        self._detach()
+        self._reader.close()
+        self.sock.close()
@@ -1,20 +1,69 @@
+import sys
+import threading
 from collections import OrderedDict
 
+def _sizeof(value):
+    # Speicherbedarf eines Eintrags: nbytes (NumPy, CompiledFrame) oder len() (bytes)
+    nbytes = getattr(value, "nbytes", None)
+    if nbytes is not None:
+        return nbytes
+    try:
+        return len(value)
+    except TypeError:
+        return sys.getsizeof(value)
+
 class LRUCache:
-    def __init__(self, capacity=128):
-        self.cache = OrderedDict()
-        self.capacity = capacity
+    def __init__(self, max_bytes=128 * 1024 * 1024, sizeof=_sizeof):
+        self.cache = OrderedDict()              # key -> (value, size)
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()           # Sende-, Autoplay- und Preload-Threads greifen gleichzeitig zu
 
     #elemente abrufen ähnlich zu pop
     def get(self, key):
-        if key not in self.cache:
-            return None
-        self.cache.move_to_end(key)
-        return self.cache[key]
+        with self._lock:
+            entry = self.cache.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return entry[0]
 
-    #elemente hinzufügen ähnlich zu push 
+    #elemente hinzufügen ähnlich zu push
     def put(self, key, value):
-        self.cache[key] = value
-        self.cache.move_to_end(key)
-        if len(self.cache) > self.capacity:
-            self.cache.popitem(last=False)
+        size = self.sizeof(value)
+        with self._lock:
+            old = self.cache.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            if size > self.max_bytes:           # passt nie ins Budget => nicht cachen
+                return
+            self.cache[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:  # älteste Einträge verdrängen, bis das Budget passt
+                _, (_, evicted) = self.cache.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self.cache.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.cache),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
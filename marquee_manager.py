@@ -1,9 +1,9 @@
 import time
 import logging
 import os
+import numpy as np
 from PIL import Image, ImageFont, ImageDraw
-from processing import pil_to_bgr_bytes
-from sending import send_single_frame_sync
+from sending import CompiledFrame
 
 class MarqueeEngine:
     FONT_PATH = "/usr/share/fonts/truetype/ubuntu/UbuntuMono-RI.ttf"
@@ -14,21 +14,26 @@ class MarqueeEngine:
         self.ctrl = ctrl
         self.view = ctrl.view  # View through controller
         self.l2 = ctrl.l2
+        self.color = ctrl.color  # hier auflösen: render_frame läuft im Sende-Thread und liest keine Tk-Variablen
 
         # Hardware parameters
         self.width = ctrl.columns
         self.height = ctrl.rows
-        self.brightness = self.view.brightness_var.get()  # Helligkeitsparameter aufrufen.
 
         # MAC-addressen
         self.src_mac = bytes.fromhex(self.view.src_mac_var.get().replace(':', ''))
         self.dst_mac = bytes.fromhex(self.view.dst_mac_var.get().replace(':', ''))
 
-        # Animationsbilder
-        self.frames = []
+        self.bg_color = bg_color
+
+        # Animationsbilder: ein vorgerenderter Streifen, Frames entstehen erst beim Senden
         self.current_frame = 0
-        self._generate_frames(text, font_size, text_color, bg_color, 
-                              direction, speed, margin_x, margin_y)
+        self._render_strip(text, font_size, text_color, bg_color,
+                           direction, speed, margin_x, margin_y)
+        blank = bytes(self.width * self.height * 3)
+        self._buffers = [CompiledFrame(self.src_mac, self.dst_mac, blank, self.width, self.height,
+                                       max_pixels=ctrl.row_pixels) for _ in range(2)]
+        self._flip = 0                          # wechselt bei jedem render_frame, unabhängig vom Index
 
     def _load_font(self, font_path, font_size):
         try:
@@ -45,8 +50,9 @@ class MarqueeEngine:
             logging.error(f"Failed to load fallback font as well. Error: {e}")
             return ImageFont.load_default()
 
-    def _generate_frames(self, text, font_size, color, bg, direction, speed, mx, my):
+    def _render_strip(self, text, font_size, color, bg, direction, speed, mx, my):
         start_time = time.time()
+        speed = max(1, int(speed))              # 0 oder negativ würde nie enden
         # Load the main font for the marquee text
         font = self._load_font(self.FONT_PATH, font_size)
 
@@ -61,78 +67,74 @@ class MarqueeEngine:
             'down': {'axis': 'y', 'start': -text_h, 'end': self.height, 'step': speed}
         }[direction]
 
-        pos = params['start']
-        frame_index = 0
-
-        # Create output directory for debugging frames
-        #output_dir = "marquee_frames"
-        #os.makedirs(output_dir, exist_ok=True)
-
-        while (pos > params['end'] if params['step'] < 0 else pos < params['end']):
-            frame = Image.new('RGB', (self.width, self.height), bg)
-            draw = ImageDraw.Draw(frame)
-
-            # Draw marquee text
-            if params['axis'] == 'x':
-                draw.text((pos, my), text, font=font, fill=color)
-            else:
-                draw.text((mx, pos), text, font=font, fill=color)
-
-            #Funktionen für emperisches testen.
-            # Draw frame number in the top-left corner in white
-            # The frame number font is set to a fixed size of 30
-            #number_font = self._load_font(self.FONT_PATH, 30)
-            #number_text = str(frame_index + 1)  # Starting at 1
-            #draw.text((2, 2), number_text, font=number_font, fill=(255, 255, 255))
-            # Optionally, save frame as image for debugging
-            # frame_path = os.path.join(output_dir, f"frame_{frame_index:03d}.png")
-            # frame.save(frame_path)
-
-            # Convert to bytes for LED matrix
-            self.frames.append(pil_to_bgr_bytes(frame, self.ctrl.columns, self.ctrl.rows))
-
-            frame_index += 1
-            pos += params['step']
+        # Text einmalig in einen Streifen rendern: [Panel Hintergrund][Text][Panel Hintergrund].
+        # Der Text beginnt bei Offset = Panelbreite (bzw. -höhe); Frame an Position pos ist dann
+        # das Fenster ab (Panelbreite - pos) => identisch zu draw.text((pos, my)) auf einem Einzelbild.
+        self.axis = params['axis']
+        if self.axis == 'x':
+            extent = max(text_w, bbox[2]) + 1
+            size, position = (2 * self.width + extent, self.height), (self.width, my)
+            self.origin = self.width
+        else:
+            extent = max(text_h, bbox[3]) + 1
+            size, position = (self.width, 2 * self.height + extent), (mx, self.height)
+            self.origin = self.height
+        strip = Image.new('RGB', size, bg)
+        ImageDraw.Draw(strip).text(position, text, font=font, fill=color)
+        self.strip = np.ascontiguousarray(np.asarray(strip)[:, :, ::-1])   # BGR für die LED-Module
+        # Deckkraft des Textes (Kantenglättung) für die Überlagerung im Compositor
+        mask = Image.new('L', size, 0)
+        ImageDraw.Draw(mask).text(position, text, font=font, fill=255)
+        self.mask = np.asarray(mask)
+        self.text_color = tuple(color[::-1])                                # BGR
+        # Band quer zur Laufrichtung, in dem überhaupt Text liegt (nur dort muss überblendet werden)
+        used = np.flatnonzero(self.mask.any(axis=1 if self.axis == 'x' else 0))
+        self.band = (int(used[0]), int(used[-1]) + 1) if used.size else (0, 0)
+
+        self.start_pos = params['start']
+        self.step = params['step']
+        distance = abs(params['end'] - params['start'])
+        self.frame_count = max(1, -(-distance // abs(speed)))               # Anzahl Scroll-Positionen
 
         elapsed = time.time() - start_time
-        logging.debug(f"Marquee creation completed in {elapsed:.3f} sec, generated {len(self.frames)} frames.")
-        # logging.debug(f"Frames saved to {output_dir}")
-
-    def start(self):
-        self.ctrl.start_perf_monitor()
-        self.ctrl.thread_mgr.start_thread(self._send_loop)
-
-    def _send_loop(self, stop_event):
-        try:
-            target_interval = 1 / 60  #Änddern wenn mehr FPS möchten oder weniger
-            total_frames = len(self.frames)
-            compensation = 0.0  #Kompensation
-
-            while not stop_event.is_set():       #wenn false weiter senden
-                frame_start = time.monotonic()
-                current_brightness = self.view.brightness_var.get()
-                bytes_sent = send_single_frame_sync(
-                    self.l2, self.src_mac, self.dst_mac,
-                    self.brightness, self.frames[self.current_frame],
-                    self.width, self.height
-                )
-                self.ctrl._update_stats(bytes_sent, time.monotonic() - frame_start)
-                self.current_frame = (self.current_frame + 1) % total_frames
-
-                elapsed = time.monotonic() - frame_start
-                #Kompensation subtrahieren
-                wait_time = max(0, target_interval - elapsed - compensation)
-                
-                sleep_start_time = time.monotonic()
-                if stop_event.wait(wait_time):
-                    break
-                sleep_end_time = time.monotonic()
-
-                # Dynamisches Kompensation
-                actual_sleep_duration = sleep_end_time - sleep_start_time
-                compensation = actual_sleep_duration - wait_time
-        except Exception as e:
-            logging.error(f"Marquee error: {str(e)}")
-            self.view.show_error("Marquee Failure", str(e))
-        finally:
-            self.ctrl.stop_perf_monitor()
+        logging.debug(f"Marquee strip rendered in {elapsed:.3f} sec ({self.strip.nbytes} bytes), "
+                      f"{self.frame_count} frames.")
+
+    def frame_window(self, index):
+        # Zero-Copy-Fenster (Zeilen x Spalten x 3, BGR) des Streifens für Frame ``index``
+        offset = self.origin - (self.start_pos + index * self.step)
+        if self.axis == 'x':
+            return self.strip[:, offset:offset + self.width]
+        return self.strip[offset:offset + self.height]
+
+    def mask_window(self, index):
+        # Wie frame_window, aber auf die Textmaske (Zeilen x Spalten, 0..255)
+        offset = self.origin - (self.start_pos + index * self.step)
+        if self.axis == 'x':
+            return self.mask[:, offset:offset + self.width]
+        return self.mask[offset:offset + self.height]
+
+    def render_frame(self, index):
+        # Fenster direkt in einen der beiden Paketpuffer kopieren (Doppelpuffer, damit der
+        # DeltaEncoder noch mit dem zuletzt gesendeten Frame vergleichen kann); die
+        # Farbkorrektur läuft im selben Durchgang. Der Puffer wechselt bei jedem Aufruf: bei
+        # ungerader frame_count fiele der Sprung vom letzten Index auf 0 sonst auf denselben Puffer
+        self._flip ^= 1
+        compiled = self._buffers[self._flip]
+        compiled.update_pixels(self.frame_window(index), self.color)
+        return compiled
+
+    def start(self, session, delta=None):
+        # session: SenderSession des Controllers (Helligkeit wird live übernommen)
+        # delta: optionaler DeltaEncoder => nur geänderte Zeilen senden
+        # Die Laufschrift ist selbst die Frame-Quelle des langlebigen Sende-Threads
+        self.ctrl.publish(self, session, delta)
+
+    def next_frame(self, deadline):
+        # Wird vom Sende-Thread einmal pro Deadline aufgerufen
+        compiled = self.render_frame(self.current_frame)
+        self.current_frame = (self.current_frame + 1) % self.frame_count
+        return compiled
+
+    def close(self):
+        pass
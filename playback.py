@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+
+import logging
+import threading
+
+class StillSource:
+    """Quelle für ein Standbild: liefert bei jeder Deadline denselben CompiledFrame."""
+
+    def __init__(self, compiled):
+        self.compiled = compiled
+
+    def next_frame(self, deadline):
+        return self.compiled
+
+    def close(self):
+        pass
+
+class StreamSource:
+    """Quelle für Animationen/Bildsequenzen aus einem FramePrefetcher.
+
+    Wechselt den Inhalt gemäß der Frame-Dauer (driftfrei) und wartet nie auf den
+    Decoder: ist der nächste Frame noch nicht fertig, bleibt der letzte stehen.
+    """
+
+    def __init__(self, prefetcher, buffers, color=None):
+        self.prefetcher = prefetcher
+        self.buffers = buffers                  # zwei CompiledFrames als Doppelpuffer (DeltaEncoder)
+        self.color = color                      # optionale ColorCorrection
+        self.compiled = None
+        self.show_until = 0.0
+        self.index = 0
+
+    def next_frame(self, deadline):
+        show_until = self.show_until
+        if self.compiled is None or show_until is None or deadline >= show_until:
+            item = self.prefetcher.poll()
+            if item is not None:
+                pixels, duration = item
+                self.compiled = self.buffers[self.index & 1]
+                self.compiled.update_pixels(pixels, self.color)
+                self.index += 1
+                if duration is None:            # Sequenz: nächster Frame zur nächsten Deadline
+                    self.show_until = None
+                else:
+                    start = show_until if show_until and deadline - show_until < duration else deadline
+                    self.show_until = start + duration
+        return self.compiled
+
+    def close(self):
+        self.prefetcher.stop()
+        logging.debug(f"Stream stopped: {self.prefetcher.decoded} frames decoded, "
+                      f"{self.prefetcher.underruns} underruns.")
+
+class FrameSender:
+    """Ein langlebiger Sende-Thread, der Socket (über die SenderSession) und Taktung besitzt.
+
+    Produzenten veröffentlichen mit publish() eine neue Quelle; der Sende-Thread
+    übernimmt sie per Referenztausch an der nächsten Frame-Grenze. Ein Bildwechsel
+    kostet damit weder Thread-Stop/-Start noch eine Taktlücke.
+
+    Adaptive Bildrate (set_keepalive): liefert die Quelle denselben CompiledFrame wie zuletzt
+    (Quellen geben bei unverändertem Inhalt immer dasselbe Objekt zurück) und hat sich die
+    Helligkeit nicht geändert, wird nur im Keep-alive-Takt gesendet. Die Quelle wird weiter
+    zu jeder Deadline gefragt: die nächste Änderung geht sofort wieder mit voller Rate raus.
+    """
+
+    def __init__(self, clock, on_frame=None, on_error=None, on_send_error=None, keepalive_fps=None):
+        self.clock = clock
+        self.on_frame = on_frame                # Callback(bytes, packets, build_s, send_s, latency_s)
+        self.on_error = on_error                # Callback(exception): Quelle fehlerhaft => Leerlauf
+        self.on_send_error = on_send_error      # Callback(OSError): Frame verloren, Quelle läuft weiter
+        self._pending = None                    # (source, session, delta) oder None = Leerlauf
+        self._active = None
+        self._changed = threading.Event()
+        self._lock = threading.Lock()           # schützt nur den Referenztausch, nie das Senden
+        self.swaps = 0
+        self.keepalive_interval = None          # None = immer volle Rate
+        self.set_keepalive(keepalive_fps)
+        self.idle = False                       # Inhalt unverändert, es wird nur im Keep-alive-Takt gesendet
+        self.skipped = 0                        # ausgelassene Frames (Leerlauf)
+
+    def publish(self, source, session, delta=None):
+        # Gilt ab der nächsten Frame-Grenze; die letzte Veröffentlichung gewinnt
+        self._replace((source, session, delta))
+
+    def clear(self):
+        self._replace(None)
+
+    def _replace(self, entry):
+        with self._lock:
+            old = self._pending
+            self._pending = entry
+            unused = old is not None and old is not self._active and old is not entry
+        if unused:
+            old[0].close()                      # nie gesendete Zwischenstände gleich freigeben
+        self._changed.set()
+
+    def set_keepalive(self, fps):
+        # fps: Keep-alive-Rate für unveränderten Inhalt, None/0 = adaptive Bildrate aus
+        self.keepalive_interval = 1.0 / fps if fps and fps > 0 else None
+
+    def stats(self, reset=False):
+        interval = self.keepalive_interval
+        stats = {"adaptive": interval is not None, "keepalive_fps": round(1.0 / interval, 2) if interval else 0,
+                 "idle": self.idle, "skipped": self.skipped}
+        if reset:
+            self.skipped = 0
+        return stats
+
+    @property
+    def active(self):
+        return self._active is not None
+
+    @property
+    def source(self):
+        # Aktuell gesendete Quelle (oder None)
+        active = self._active
+        return active[0] if active else None
+
+    @property
+    def published(self):
+        # Zuletzt veröffentlichte Quelle (ab der nächsten Frame-Grenze aktiv) oder None
+        pending = self._pending
+        return pending[0] if pending else None
+
+    def _swap(self):
+        with self._lock:
+            pending = self._pending
+            old = self._active
+            if pending is old:
+                return
+            self._active = pending
+        if old is not None:
+            old[0].close()
+        self.swaps += 1
+
+    def run(self, stop_event):
+        # Signatur passend zu ThreadManager.start_thread(target(stop_event))
+        deadline = self.clock.now()
+        last = None                             # (compiled, session, setup) des zuletzt gesendeten Frames
+        last_sent = 0.0
+        while not stop_event.is_set():
+            self._swap()
+            idle = False
+            if self._active is None:
+                self.idle = False
+                self._changed.clear()
+                if self._pending is None:       # Leerlauf bis zur nächsten Veröffentlichung
+                    self._changed.wait(0.5)
+                deadline = self.clock.now()
+                continue
+            source, session, delta = self._active
+            now = self.clock.now
+            try:
+                frame_start = now()
+                compiled = source.next_frame(deadline)
+                if compiled is not None:
+                    keepalive = self.keepalive_interval
+                    setup = getattr(session, "setup", None)
+                    unchanged = (keepalive is not None and last is not None and compiled is last[0]
+                                 and session is last[1] and setup is last[2])
+                    self.idle = unchanged
+                    if unchanged and deadline - last_sent < keepalive - 1e-6:
+                        self.skipped += 1
+                        idle = True
+                        compiled = None         # nichts zu senden, Empfänger zeigt das letzte Bild
+                if compiled is not None:
+                    # Keep-alive immer als kompletter Frame, sonst ggf. nur geänderte Zeilen
+                    rows = delta.changed_rows(compiled) if delta and not unchanged else None
+                    last, last_sent = (compiled, session, setup), deadline
+                    send_start = now()
+                    # Budget bei vollem Puffer: bis zur nächsten Deadline, danach wird der Frame verworfen
+                    sent = session.send_frame(compiled, rows, deadline + self.clock.interval - send_start)
+                    done = now()
+                    if self.on_frame:
+                        self.on_frame(sent, session.last_packets, send_start - frame_start,
+                                      done - send_start, done - deadline)
+            except OSError as e:
+                last = None                     # Frame fehlt beim Empfänger: nächsten auf jeden Fall senden
+                if delta:
+                    delta.force_keyframe()      # Frame fehlt beim Empfänger: nächster wieder komplett
+                if self.on_send_error:          # z.B. ENOBUFS: nur zählen, kein Logging im Sendepfad
+                    self.on_send_error(e)
+            except Exception as e:
+                logging.error(f"Transmission error: {e}")
+                with self._lock:
+                    if self._pending is self._active:
+                        self._pending = None    # fehlerhafte Quelle nicht endlos wiederholen
+                if self.on_error:
+                    self.on_error(e)
+            next_deadline = self.clock.wait_next(deadline, stop_event, spin=not idle)
+            if next_deadline is None:
+                break
+            deadline = next_deadline
+        self.clear()
+        self._swap()
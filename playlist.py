@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import queue
+import logging
+import threading
+import itertools
+import numpy as np
+from playback import StreamSource
+from sending import CompiledFrame
+from streaming import FramePrefetcher, is_animated, open_stream
+from constants import PLAYLIST_DURATION_S, PLAYLIST_TRANSITION_S
+
+TRANSITION_CUT = "cut"
+TRANSITION_CROSSFADE = "crossfade"
+TRANSITION_WIPE = "wipe"                        # neues Bild deckt von links nach rechts auf
+TRANSITION_SLIDE = "slide"                      # neues Bild schiebt das alte nach links hinaus
+TRANSITIONS = (TRANSITION_CUT, TRANSITION_CROSSFADE, TRANSITION_WIPE, TRANSITION_SLIDE)
+KINDS = ("image", "animation", "marquee")
+
+class PlaylistItem:
+    """Ein Eintrag: Bild, Animation (GIF/APNG/WebP oder Ordner) oder Laufschrift.
+
+    ``duration`` in Sekunden; ohne Dauer läuft eine Animation ``loops`` Mal durch, eine
+    Laufschrift ``loops`` Durchgänge. ``transition`` gilt für den Übergang in diesen Eintrag.
+    """
+
+    def __init__(self, kind, value, duration=None, loops=1, transition=TRANSITION_CUT,
+                 transition_s=PLAYLIST_TRANSITION_S, options=None):
+        if kind not in KINDS:
+            raise ValueError(f"Unknown playlist item type {kind!r} (expected one of {', '.join(KINDS)})")
+        if transition not in TRANSITIONS:
+            raise ValueError(f"Unknown transition {transition!r} (expected one of {', '.join(TRANSITIONS)})")
+        if kind == "image" and duration is None:
+            duration = PLAYLIST_DURATION_S
+        self.kind = kind
+        self.value = value                      # Pfad bzw. Text der Laufschrift
+        self.duration = duration
+        self.loops = max(1, int(loops))
+        self.transition = transition if transition_s and transition_s > 0 else TRANSITION_CUT
+        self.transition_s = float(transition_s or 0)
+        self.options = options or {}            # Laufschrift: font_size, text_color, bg_color, ...
+
+    @classmethod
+    def from_path(cls, path, duration=None, **kwargs):
+        # Typ nach Inhalt: Ordner und animierte Dateien werden gestreamt
+        kind = "animation" if os.path.isdir(path) or is_animated(path) else "image"
+        return cls(kind, path, duration, **kwargs)
+
+    @property
+    def name(self):
+        return self.value if self.kind == "marquee" else os.path.basename(self.value.rstrip(os.sep))
+
+def load_playlist(path):
+    """Liest eine Playlist (JSON) und liefert (items, loop).
+
+    {"loop": true, "defaults": {"duration": 5, "transition": "crossfade", "transition_s": 0.5},
+     "items": [{"image": "a.png", "duration": 8}, {"animation": "clip.gif", "loops": 2},
+               {"marquee": "Hello", "speed": 2, "transition": "slide"}]}
+    Relative Pfade beziehen sich auf den Ordner der Playlist.
+    """
+    with open(path) as f:
+        data = json.load(f)
+    base = os.path.dirname(os.path.abspath(path))
+    defaults = data.get("defaults", {})
+    items = []
+    for number, entry in enumerate(data.get("items", []), 1):
+        entry = dict(defaults, **entry)
+        kinds = [kind for kind in KINDS if kind in entry]
+        if len(kinds) != 1:
+            raise ValueError(f"Playlist item {number}: exactly one of {', '.join(KINDS)} is required")
+        kind = kinds[0]
+        value = entry.pop(kind)
+        if kind != "marquee":
+            value = os.path.join(base, os.path.expanduser(value))
+        common = {key: entry.pop(key) for key in ("loops", "transition", "transition_s") if key in entry}
+        duration = entry.pop("duration", None)
+        if kind == "image" and os.path.exists(value) and (os.path.isdir(value) or is_animated(value)):
+            kind = "animation"
+        items.append(PlaylistItem(kind, value, duration, options=entry, **common))
+    if not items:
+        raise ValueError(f"Playlist {path} has no items")
+    return items, bool(data.get("loop", True))
+
+def render_transition(kind, outgoing, incoming, progress, out, scratch):
+    """Ein Übergangsframe (BGR, Zeilen x Spalten x 3) für progress 0..1, vektorisiert in ``out``."""
+    columns = out.shape[1]
+    if kind == TRANSITION_CROSSFADE:
+        acc, tmp = scratch
+        weight = int(round(progress * 255))
+        np.multiply(incoming, weight, out=acc, dtype=np.uint16)
+        np.multiply(outgoing, 255 - weight, out=tmp, dtype=np.uint16)
+        acc += tmp
+        acc += 255
+        acc >>= 8                               # wie im Compositor: exakt für 0 und 255
+        np.copyto(out, acc, casting="unsafe")
+    elif kind == TRANSITION_WIPE:
+        x = int(round(progress * columns))
+        out[:, :x] = incoming[:, :x]
+        out[:, x:] = outgoing[:, x:]
+    else:                                       # slide
+        x = int(round(progress * columns))
+        out[:, :columns - x] = outgoing[:, x:]
+        out[:, columns - x:] = incoming[:, :x]
+    return out
+
+class _Cue:
+    """Vorbereiteter Eintrag: liefert BGR-Pixel je Deadline (None = letztes Bild halten)."""
+
+    def __init__(self, index, item):
+        self.index = index
+        self.item = item
+        self.start = None
+        self.first = None                       # erstes Bild, für den Übergang in diesen Eintrag
+        self.transition = None                  # vorab berechneter Übergang (nach einem Standbild)
+
+    def begin(self, deadline):
+        self.start = deadline
+
+    def timed_out(self, deadline):
+        return self.item.duration is not None and deadline >= self.start + self.item.duration
+
+    def close(self):
+        pass
+
+class _ImageCue(_Cue):
+    def __init__(self, index, item, pixels):
+        super().__init__(index, item)
+        self.first = pixels
+
+    def frame(self, deadline):
+        return self.first
+
+    def finished(self, deadline):
+        return self.timed_out(deadline)
+
+class _AnimationCue(_Cue):
+    def __init__(self, index, item, columns, rows):
+        super().__init__(index, item)
+        factory = open_stream(item.value, columns, rows)
+        frames = factory()
+        data, _ = next(frames)
+        frames.close()
+        self.first = np.frombuffer(data, dtype=np.uint8)[:rows * columns * 3].reshape(rows, columns, 3)
+        if item.duration is None:               # genau ``loops`` Durchläufe, dann ist der Eintrag fertig
+            loops = item.loops
+            self.prefetcher = FramePrefetcher(lambda: itertools.chain.from_iterable(factory() for _ in range(loops)),
+                                              rows, columns * 3, loop=False)
+        else:
+            self.prefetcher = FramePrefetcher(factory, rows, columns * 3)
+        src = bytes(rows * columns * 3)
+        # nur als Pixelpuffer genutzt, gesendet wird der Frame der Playlist
+        buffers = [CompiledFrame(b"\0" * 6, b"\0" * 6, src, columns, rows) for _ in range(2)]
+        self.stream = StreamSource(self.prefetcher.start(), buffers)
+        self._compiled = None
+        self._pixels = None
+
+    def frame(self, deadline):
+        compiled = self.stream.next_frame(deadline)
+        if compiled is not self._compiled:
+            self._compiled = compiled
+            self._pixels = compiled.pixel_array() if compiled is not None else None
+        return self._pixels
+
+    def finished(self, deadline):
+        if self.item.duration is not None:
+            return self.timed_out(deadline)
+        show_until = self.stream.show_until
+        return (self.prefetcher.finished and self.prefetcher.frames.empty()
+                and (show_until is None or deadline >= show_until))
+
+    def close(self):
+        self.stream.close()
+
+class _MarqueeCue(_Cue):
+    def __init__(self, index, item, engine):
+        super().__init__(index, item)
+        self.engine = engine
+        self.first = engine.frame_window(0)
+        self.shown = 0
+
+    def frame(self, deadline):
+        engine = self.engine
+        window = engine.frame_window(self.shown % engine.frame_count)
+        self.shown += 1
+        return window
+
+    def finished(self, deadline):
+        if self.item.duration is not None:
+            return self.timed_out(deadline)
+        return self.shown >= self.item.loops * self.engine.frame_count
+
+class _Transition:
+    # Übergangsframes zwischen zwei festen Bildern; der Worker füllt ``frames`` und zählt ``ready`` hoch
+    def __init__(self, kind, duration, count, outgoing, incoming, rows, columns):
+        self.kind = kind
+        self.start = None                       # Deadline des ersten Übergangsframes
+        self.step = duration / count
+        self.count = count                      # Frame 0 = altes Bild, 1..count-1 berechnet, dann neues Element
+        self.outgoing = outgoing
+        self.incoming = incoming
+        self.frames = np.empty((count - 1, rows, columns, 3), dtype=np.uint8)
+        self.ready = 0                          # vom Worker fertig berechnete Frames
+        self.cancelled = False
+
+class PlaylistSource:
+    """Frame-Quelle für eine Playlist: Dauer, Wiederholungen und Übergang je Eintrag.
+
+    Wird einmal veröffentlicht und schaltet selbst an der ersten Deadline nach Ablauf eines
+    Eintrags weiter, ohne Tk und ohne neue Veröffentlichung. Ein Worker-Thread bereitet den
+    nächsten Eintrag vor (Bild aus dem Cache, Animation mit Prefetch) und berechnet die
+    Übergangsframes mit NumPy: nach einem Standbild sofort vorab, nach Animation oder Laufschrift
+    just in time, sobald deren letztes Bild feststeht. Der Sende-Thread wählt nur noch den Frame
+    zur Deadline; ist ein Übergangsframe noch nicht fertig, bleibt der vorige stehen
+    (``underruns``). Die Farbkorrektur läuft am Ende wie bei allen Quellen.
+    """
+
+    def __init__(self, items, buffers, clock, color=None, loop=True, load_image=None, make_marquee=None,
+                 on_item=None):
+        self.items = list(items)
+        self.buffers = buffers                  # zwei CompiledFrames als Doppelpuffer (DeltaEncoder)
+        self.clock = clock
+        self.color = color
+        self.loop = loop
+        first = buffers[0]
+        self.rows, self.columns = first.valid_rows, first.column_count
+        self.load_image = load_image            # path -> BGR-Bytes (Cache des Controllers)
+        self.on_item = on_item                  # Callback(index, item), aus dem Worker-Thread
+        # Laufschriften einmalig vorab rendern (MarqueeEngine liest die View, also im aufrufenden Thread)
+        self._engines = {index: make_marquee(item) for index, item in enumerate(self.items)
+                         if item.kind == "marquee"}
+        self.current = None
+        self.next = None                        # vom Worker vorbereiteter nächster Eintrag
+        self.ended = False
+        self.compiled = None
+        self.shown = None
+        self.index = 0
+        self.transitions = 0
+        self.late = 0                           # Eintrag abgelaufen, Nachfolger aber noch nicht bereit
+        self.underruns = 0                      # Übergangsframe zur Deadline noch nicht berechnet
+        self._transition = None
+        self._scratch = None
+        self._jobs = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        # Ersten Eintrag im aufrufenden Thread vorbereiten, den Rest übernimmt der Worker
+        self.next = self._prepare_from(0)
+        self._thread.start()
+        return self
+
+    # --- Sende-Thread ---
+
+    def next_frame(self, deadline):
+        transition = self._transition
+        if self.current is None:
+            if self.next is None:
+                return self.compiled
+            pixels = self._begin(self.next, deadline)
+        elif transition is not None:
+            k = int((deadline - transition.start) / transition.step + 0.5)
+            if k >= transition.count:
+                self._transition = None
+                pixels = self._begin(self.next, deadline)
+            elif k == 0:
+                pixels = transition.outgoing
+            else:
+                ready = transition.ready
+                if k > ready:
+                    self.underruns += 1
+                    k = ready
+                pixels = transition.frames[k - 1] if k else transition.outgoing
+        elif self.current.finished(deadline):
+            nxt = self.next
+            if nxt is None:
+                if not self.ended:
+                    self.late += 1
+                pixels = None                   # letztes Bild halten
+            elif nxt.item.transition != TRANSITION_CUT and self.shown is not None:
+                pixels = self._start_transition(nxt, deadline)
+            else:
+                pixels = self._begin(nxt, deadline)
+        else:
+            pixels = self.current.frame(deadline)
+        if pixels is None or pixels is self.shown:
+            return self.compiled
+        compiled = self.buffers[self.index & 1]
+        self.index += 1
+        compiled.update_pixels(pixels, self.color)
+        self.compiled = compiled
+        self.shown = pixels
+        return compiled
+
+    def _begin(self, cue, deadline):
+        old, self.current, self.next = self.current, cue, None
+        cue.begin(deadline)
+        self._jobs.put(("started", cue, old))   # Benachrichtigung, Aufräumen und Vorbereiten im Worker
+        return cue.frame(deadline)
+
+    def _start_transition(self, cue, deadline):
+        transition = cue.transition
+        if transition is None or transition.outgoing is not self.shown or transition.count != self._count(cue):
+            transition = self._new_transition(cue, self.shown)      # just in time im Worker
+            self._jobs.put(("transition", transition, None))
+        transition.start = deadline
+        self._transition = transition
+        self.transitions += 1
+        return transition.outgoing
+
+    def _count(self, cue):
+        return max(1, int(round(cue.item.transition_s / self.clock.interval)))
+
+    def _new_transition(self, cue, outgoing):
+        item = cue.item
+        return _Transition(item.transition, item.transition_s, self._count(cue), outgoing, cue.first,
+                           self.rows, self.columns)
+
+    # --- Worker-Thread ---
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                job, arg, old = self._jobs.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                if job == "transition":
+                    self._render(arg)
+                    continue
+                if old is not None:
+                    old.close()
+                if self.on_item:
+                    self.on_item(arg.index, arg.item)
+                nxt = self._prepare_from(arg.index + 1)
+                if nxt is not None and nxt.item.transition != TRANSITION_CUT and isinstance(arg, _ImageCue):
+                    # Das alte Bild steht schon fest: Übergang jetzt berechnen, nicht erst zur Deadline
+                    nxt.transition = self._new_transition(nxt, arg.first)
+                    self._render(nxt.transition)
+                self.next = nxt
+            except Exception as e:
+                logging.error(f"Playlist worker error: {e}")
+
+    def _prepare_from(self, index):
+        # Nächsten ladbaren Eintrag ab ``index`` vorbereiten; fehlerhafte Einträge werden übersprungen
+        for _ in range(len(self.items)):
+            if index >= len(self.items):
+                if not self.loop:
+                    self.ended = True
+                    return None
+                index = 0
+            if self._stop.is_set():
+                return None
+            try:
+                return self._prepare(index)
+            except Exception as e:
+                logging.error(f"Playlist item {index + 1} ({self.items[index].name}) skipped: {e}")
+                index += 1
+        self.ended = True
+        return None
+
+    def _prepare(self, index):
+        item = self.items[index]
+        if item.kind == "marquee":
+            return _MarqueeCue(index, item, self._engines[index])
+        if item.kind == "animation":
+            return _AnimationCue(index, item, self.columns, self.rows)
+        data = self.load_image(item.value)
+        pixels = np.frombuffer(data, dtype=np.uint8)[:self.rows * self.columns * 3]
+        return _ImageCue(index, item, pixels.reshape(self.rows, self.columns, 3))
+
+    def _render(self, transition):
+        frames = transition.frames
+        if self._scratch is None:
+            shape = (self.rows, self.columns, 3)
+            self._scratch = (np.empty(shape, dtype=np.uint16), np.empty(shape, dtype=np.uint16))
+        for k in range(1, transition.count):
+            if transition.cancelled or self._stop.is_set():
+                return
+            render_transition(transition.kind, transition.outgoing, transition.incoming, k / transition.count,
+                              frames[k - 1], self._scratch)
+            transition.ready = k
+
+    def stats(self):
+        # Telemetriequelle
+        current = self.current
+        return {"item": current.index + 1 if current else 0, "items": len(self.items),
+                "transitions": self.transitions, "late": self.late, "underruns": self.underruns}
+
+    def close(self):
+        self._stop.set()
+        if self._transition is not None:
+            self._transition.cancelled = True
+        self._thread.join(timeout=1)
+        for cue in (self.current, self.next):
+            if cue is not None:
+                cue.close()
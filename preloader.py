@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+
+import os
+import queue
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, CancelledError
+
+class ImagePreloader:
+    """Dekodiert und skaliert Bilder parallel in einem Prozesspool über alle Kerne.
+
+    Fertige Ergebnisse landen in ``results`` (Queue von (path, width, height, data)),
+    die der Tk-Thread per after() abholt; der Tk-Thread blockiert dabei nie.
+    Ein neuer Aufruf von start() bricht den vorherigen Auftrag ab.
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.results = queue.Queue()
+        self.total = 0
+        self.completed = 0
+        self.size = None                        # (width, height) des aktuellen Auftrags
+        self._executor = None
+        self._futures = {}                      # path -> Future des aktuellen Auftrags
+        self._generation = 0
+        self._lock = threading.RLock()          # add_done_callback kann sofort im eigenen Thread feuern
+
+    def _get_executor(self):
+        # Pool erst bei Bedarf starten; "spawn", damit keine Tk-/Sende-Threads mit in die Kinder geforkt werden
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def start(self, paths, width, height):
+        from processing import process_image    # PIL erst laden, wenn wirklich vorgeladen wird
+        self.cancel()
+        executor = self._get_executor()
+        if getattr(executor, "_broken", False):         # abgestürzter Worker => Pool neu aufbauen
+            self._executor = None
+            executor = self._get_executor()
+        with self._lock:
+            generation = self._generation
+            self.completed = 0
+            self.size = (width, height)
+            for path in paths:
+                if path in self._futures:
+                    continue
+                future = executor.submit(process_image, path, width, height)
+                future.add_done_callback(
+                    lambda f, p=path: self._on_done(f, p, width, height, generation))
+                self._futures[path] = future
+            self.total = len(self._futures)
+
+    def _on_done(self, future, path, width, height, generation):
+        # Läuft im Verwaltungs-Thread des Pools, nicht im Tk-Thread
+        if future.cancelled():
+            return
+        with self._lock:
+            if generation != self._generation:
+                return                          # Ergebnis eines abgebrochenen Auftrags
+            self.completed += 1
+        try:
+            data = future.result()
+        except Exception as e:
+            logging.error(f"Preloading {path} failed: {e}")
+            data = None
+        self.results.put((path, width, height, data))
+
+    def wait_for(self, path, width, height, timeout=None):
+        # Blockiert nur auf genau dieses Bild, falls es gerade in dieser Auflösung vorgeladen wird; sonst None
+        with self._lock:
+            future = self._futures.get(path) if self.size == (width, height) else None
+        if future is None:
+            return None
+        try:
+            return future.result(timeout)
+        except (CancelledError, Exception):
+            return None
+
+    def cancel(self):
+        with self._lock:
+            self._generation += 1
+            for future in self._futures.values():
+                future.cancel()
+            self._futures = {}
+            self.total = 0
+            self.completed = 0
+        while True:                             # Ergebnisse des alten Auftrags verwerfen
+            try:
+                self.results.get_nowait()
+            except queue.Empty:
+                break
+
+    @property
+    def busy(self):
+        return self.completed < self.total
+
+    def shutdown(self):
+        self.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
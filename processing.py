@@ -3,18 +3,18 @@
 from PIL import Image
 import numpy as np
 
-def pil_to_bgr_bytes(pil_image, width, height):
+def pil_to_bgr_bytes(pil_image, width, height, color=None):
 # Für die benutzte LED-Modulen ist eine RGB zu BGR Konvertierung erforderlich
  
         if pil_image.size != (width, height):
             pil_image = pil_image.resize((width, height), Image.LANCZOS)
-        arr = np.array(pil_image)
-        if arr.ndim == 2:                     # wenn das Bild ist eine "Grayscale image"[2D]
-            arr = np.stack((arr,)*3, axis=-1) # 3 mal den selben Kanal Duplizieren
-        elif arr.shape[2] == 4:               # wenn Das Bild ist RGBA
-            arr = arr[:, :, :3]               # Nur die 3 RGB Kanäle nehmen
-            # R- und B-Kanäle vertauschen
-        bgr_arr = arr[:, :, ::-1]
+        if pil_image.mode != "RGB":           # Graustufen, RGBA, Palette => PIL wandelt ohne NumPy-Zwischenkopie
+            pil_image = pil_image.convert("RGB")
+        arr = np.asarray(pil_image)           # asarray statt array: eine Kopie weniger
+        if color is None:
+            return arr[:, :, ::-1].tobytes()  # R- und B-Kanäle vertauschen (ein Durchgang)
+        bgr_arr = np.empty_like(arr)
+        color.apply(arr, bgr_arr, rgb=True)   # LUTs + R/B-Tausch in einem Durchgang
         return bgr_arr.tobytes()
 
 def process_image(image_path, width, height):
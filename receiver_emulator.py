@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Virtueller Colorlight-Empfänger (5A-75B Ersatz) für Tests ohne Hardware.
+
+Beantwortet die 0x0700-Erkennungsanfrage mit einer 0x0805-Antwort (Spalten/Zeilen),
+setzt 0x55xx-Zeilen zu kompletten Bildern zusammen und misst empfangene FPS,
+fehlende/vertauschte Zeilen, Paketabstände, Übertragungsdauer und Frame-Latenz. Ein Frame
+beginnt mit seinem 0x0107 und ist fertig, sobald alle Zeilen da sind (Delta-Frames: beim
+nächsten 0x0107). Das Bild bleibt zwischen den Frames stehen; fehlende Zeilen zählen nur,
+wo Zeilen erwartet waren: bei vollen Frames und bei Delta-Frames mit der Zeilenliste des
+Senders (FrameStamps). Ohne sie zählen Delta-Frames (``delta``) als ``partial_frames``.
+Die Übertragungsdauer reicht vom 0x0107 bis zum letzten Zeilenpaket; die Ende-zu-Ende-Latenz
+ab dem Aufbau des Frames beim Sender braucht dessen Zeitstempel (FrameStamps, nur über den
+In-Memory-Link).
+
+Transport: entweder ein AF_PACKET-Socket auf einem Interface (z.B. veth-Paar,
+tap-Device) oder ein In-Memory-Link (create_memory_link), an den L2Ethernet per
+attach() angehängt wird.
+
+Beispiel (veth, root erforderlich):
+    ip link add veth0 type veth peer name veth1 && ip link set veth0 up && ip link set veth1 up
+    python3 receiver_emulator.py --iface veth1 --columns 128 --rows 128
+"""
+import sys
+import json
+import time
+import collections
+import socket
+import struct
+import threading
+import argparse
+from constants import ETH_P_ALL, ETH_HEADER_LEN
+
+DETECT_REPLY_LENGTH = 98    # Nutzdatenlänge der 0x0805-Antwort
+SO_RCVBUFFORCE = 33         # wie SO_RCVBUF, aber über rmem_max hinaus (CAP_NET_ADMIN)
+
+def create_memory_link(buffer_size=1 << 22):
+    """Erzeugt ein verbundenes Datagramm-Socketpaar (Sender, Empfänger) ohne Netzwerkkarte."""
+    sender, receiver = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+    sender.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, buffer_size)
+    receiver.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, buffer_size)
+    return sender, receiver
+
+class FrameStamps:
+    """Zeitstempel der Frames vom Sender zum Empfänger, am Netzwerk vorbei.
+
+    Der Sender ruft mark() mit ``clock.now()`` (perf_counter) beim Aufbau jedes gesendeten Frames
+    auf, bei Delta-Frames mit den gesendeten Zeilen (DeltaEncoder.changed_rows, None = alle);
+    der Empfänger ordnet die Marken der Reihe nach den 0x0107 zu. Das setzt einen Link ohne
+    Verluste voraus (create_memory_link); die n-te Marke gehört dann zum n-ten Frame.
+    """
+
+    def __init__(self):
+        self._stamps = collections.deque()
+
+    def mark(self, timestamp=None, rows=None):
+        self._stamps.append((time.perf_counter() if timestamp is None else timestamp,
+                             None if rows is None else frozenset(int(row) for row in rows)))
+
+    def take(self):
+        # (Zeitstempel, erwartete Zeilen oder None)
+        try:
+            return self._stamps.popleft()
+        except IndexError:
+            return None, None                   # Frame ohne Marke: keine Latenz, alle Zeilen erwartet
+
+class VirtualReceiver:
+    def __init__(self, sock, columns=128, rows=128, mac=b"\x11\x22\x33\x44\x55\x66", on_frame=None,
+                 stamps=None, delta=False):
+        self.sock = sock
+        self.columns = columns
+        self.rows = rows
+        self.mac = mac
+        self.on_frame = on_frame                # Callback(frame_bytes) nach jedem Latch
+        self.stamps = stamps                    # FrameStamps des Senders oder None
+        self.delta = delta                      # Sender im Delta-Modus: Frames mit weniger Zeilen sind normal
+        self.brightness_percent = None
+        self.framebuffer = bytearray(columns * rows * 3)
+        self.last_frame = None
+        self._lock = threading.Lock()
+        self._last_packet = None                # letztes Zeilenpaket des laufenden Frames
+        self._frame_start = None                # 0x0107 (bzw. erste Zeile) des laufenden Frames
+        self._frame_built = None                # Aufbau des laufenden Frames beim Sender (FrameStamps)
+        self._expected = None                   # erwartete Zeilen des laufenden Frames (None = alle)
+        self._last_row = -1
+        self._rows_seen = set()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._lock:
+            self.started = time.monotonic()
+            self.packets = 0
+            self.bytes = 0
+            self.frames = 0
+            self.incomplete_frames = 0
+            self.missing_rows = 0
+            self.partial_frames = 0             # Delta-Frames ohne Zeilenliste: nicht als Verlust gezählt
+            self.out_of_order_rows = 0
+            self.probes = 0
+            self.max_gap = 0.0
+            self.gap_sum = 0.0
+            self.gap_count = 0
+            self.transfer_sum = 0.0
+            self.max_transfer = 0.0
+            self.latency_sum = 0.0
+            self.latency_count = 0
+            self.max_latency = 0.0
+
+    def handle_packet(self, packet, now=None):
+        if len(packet) < ETH_HEADER_LEN:
+            return
+        now = time.perf_counter() if now is None else now      # selbe Uhr wie FrameClock.now()
+        ether_type = (packet[12] << 8) | packet[13]
+        payload = memoryview(packet)[ETH_HEADER_LEN:]
+        with self._lock:
+            self.packets += 1
+            self.bytes += len(packet)
+            if ether_type >> 8 == 0x55:
+                self._handle_row(ether_type, payload, now)
+            elif ether_type == 0x0107:
+                if len(payload) > 21:
+                    self.brightness_percent = payload[21]
+                self._latch()                   # unvollständiger Frame davor (z.B. Delta) ist damit fertig
+                self._frame_start = now
+                if self.stamps:
+                    self._frame_built, self._expected = self.stamps.take()
+            elif ether_type == 0x0700:
+                self.probes += 1
+                self._reply_detect(packet[6:12])
+
+    def _handle_row(self, ether_type, payload, now):
+        if len(payload) < 7:
+            return
+        row = ((ether_type & 0xFF) << 8) | payload[0]
+        offset = (payload[1] << 8) | payload[2]
+        count = (payload[3] << 8) | payload[4]
+        if self._frame_start is None:
+            self._frame_start = now             # Zeilen ohne vorangehendes 0x0107
+        if self._last_packet is not None:       # Abstand zwischen Zeilenpaketen innerhalb eines Frames
+            gap = now - self._last_packet
+            self.gap_sum += gap
+            self.gap_count += 1
+            if gap > self.max_gap:
+                self.max_gap = gap
+        self._last_packet = now
+        if row <= self._last_row and offset == 0:
+            self.out_of_order_rows += 1
+        self._last_row = row
+        if row >= self.rows or offset + count > self.columns:
+            return
+        pixels = payload[7:7 + count * 3]
+        start = (row * self.columns + offset) * 3
+        self.framebuffer[start:start + len(pixels)] = pixels
+        self._rows_seen.add(row)
+        expected = self.rows if self._expected is None else len(self._expected)
+        if len(self._rows_seen) >= expected and offset + count >= self.columns:
+            self._latch()                       # letztes Segment der letzten erwarteten Zeile
+
+    def _latch(self):
+        if self._last_packet is None:
+            return                              # kein Zeilendatensatz seit dem letzten Latch
+        self.frames += 1
+        if self._expected is not None:
+            missing = len(self._expected - self._rows_seen)
+        else:
+            missing = self.rows - len(self._rows_seen)
+            if missing and self.delta:
+                self.partial_frames += 1        # unbekannt, welche Zeilen gesendet wurden
+                missing = 0
+        if missing:
+            self.incomplete_frames += 1
+            self.missing_rows += missing
+        transfer = self._last_packet - self._frame_start
+        self.transfer_sum += transfer
+        if transfer > self.max_transfer:
+            self.max_transfer = transfer
+        if self._frame_built is not None:
+            latency = self._last_packet - self._frame_built
+            self.latency_sum += latency
+            self.latency_count += 1
+            if latency > self.max_latency:
+                self.max_latency = latency
+        self.last_frame = bytes(self.framebuffer)
+        self._frame_start = None
+        self._frame_built = None
+        self._expected = None
+        self._last_packet = None
+        self._last_row = -1
+        self._rows_seen = set()
+        if self.on_frame:
+            self.on_frame(self.last_frame)
+
+    def _reply_detect(self, requester_mac):
+        # Antwort wie von discovery.discover erwartet: Spalten an Byte 34/35, Zeilen an 36/37
+        payload = bytearray(DETECT_REPLY_LENGTH)
+        struct.pack_into("!HH", payload, 34 - ETH_HEADER_LEN, self.columns, self.rows)
+        header = struct.pack("!6s6sH", bytes(requester_mac), self.mac, 0x0805)
+        self.sock.send(header + payload)
+
+    def stats(self):
+        with self._lock:
+            duration = max(time.monotonic() - self.started, 1e-9)
+            return {
+                "duration_s": round(duration, 3),
+                "packets": self.packets,
+                "bytes": self.bytes,
+                "frames": self.frames,
+                "fps": round(self.frames / duration, 2),
+                "incomplete_frames": self.incomplete_frames,
+                "missing_rows": self.missing_rows,
+                "partial_frames": self.partial_frames,
+                "out_of_order_rows": self.out_of_order_rows,
+                "avg_gap_us": round(self.gap_sum / self.gap_count * 1e6, 2) if self.gap_count else 0.0,
+                "max_gap_us": round(self.max_gap * 1e6, 2),
+                "avg_transfer_ms": round(self.transfer_sum / self.frames * 1e3, 3) if self.frames else 0.0,
+                "max_transfer_ms": round(self.max_transfer * 1e3, 3),
+                "avg_latency_ms": (round(self.latency_sum / self.latency_count * 1e3, 3)
+                                   if self.latency_count else None),
+                "max_latency_ms": round(self.max_latency * 1e3, 3) if self.latency_count else None,
+                "probes": self.probes,
+                "brightness_percent": self.brightness_percent,
+            }
+
+    def run(self, stop_event):
+        # Signatur passend zu ThreadManager.start_thread(target(stop_event))
+        self.sock.settimeout(0.2)
+        while not stop_event.is_set():
+            try:
+                packet, addr = self.sock.recvfrom(65535)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            if addr and len(addr) > 2 and addr[2] == socket.PACKET_OUTGOING:
+                continue                        # eigene Antworten auf dem Interface ignorieren
+            self.handle_packet(packet)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Virtual Colorlight receiver card")
+    parser.add_argument("--iface", required=True, help="interface to listen on (e.g. veth1, tap0)")
+    parser.add_argument("--columns", type=int, default=128)
+    parser.add_argument("--rows", type=int, default=128)
+    parser.add_argument("--mac", default="11:22:33:44:55:66", help="MAC address of the virtual card")
+    parser.add_argument("--interval", type=float, default=1.0, help="report interval in seconds")
+    parser.add_argument("--duration", type=float, default=0, help="stop after N seconds (0 = run forever)")
+    parser.add_argument("--json", action="store_true", help="print reports as JSON lines")
+    parser.add_argument("--delta", action="store_true",
+                        help="sender runs in delta mode: frames with fewer rows count as partial, not as missing rows")
+    parser.add_argument("--rcvbuf", type=int, default=16 * 1024 * 1024, help="socket receive buffer in bytes")
+    args = parser.parse_args(argv)
+
+    sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+    # Empfangspuffer für mehrere komplette Frames; breite Panels bringen sonst den Standardpuffer zum Überlaufen
+    for option in (SO_RCVBUFFORCE, socket.SO_RCVBUF):   # FORCE nur mit CAP_NET_ADMIN
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, option, args.rcvbuf)
+            break
+        except OSError:
+            continue
+    sock.bind((args.iface, 0))
+    receiver = VirtualReceiver(sock, args.columns, args.rows, bytes.fromhex(args.mac.replace(":", "")),
+                               delta=args.delta)
+    stop_event = threading.Event()
+    thread = threading.Thread(target=receiver.run, args=(stop_event,), daemon=True)
+    thread.start()
+    deadline = time.monotonic() + args.duration if args.duration else None
+    try:
+        while deadline is None or time.monotonic() < deadline:
+            time.sleep(args.interval)
+            stats = receiver.stats()
+            receiver.reset_stats()
+            if args.json:
+                print(json.dumps(stats), flush=True)
+            else:
+                print(f"[Receiver] {stats['fps']} fps, {stats['bytes']} bytes, "
+                      f"missing rows {stats['missing_rows']}, out-of-order {stats['out_of_order_rows']}, "
+                      f"gap avg/max {stats['avg_gap_us']}/{stats['max_gap_us']} us, "
+                      f"transfer avg/max {stats['avg_transfer_ms']}/{stats['max_transfer_ms']} ms", flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_event.set()
+        thread.join(1)
+        sock.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
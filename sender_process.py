@@ -0,0 +1,553 @@
+#!/usr/bin/env python3
+"""
+Sendeschleife in einem eigenen Prozess.
+
+Im Hauptprozess teilen sich Sende-Thread, Tk, PIL-Dekodierung, Laufschrift und Leistungsmonitor
+einen GIL; jede längere Dekodierung oder GUI-Arbeit wird zu Frame-Jitter. ProcessSender ersetzt
+FrameSender mit derselben Schnittstelle (publish/clear/stats): die Quellen laufen weiter im
+Hauptprozess, Socket, Taktung und Paketaufbau übernimmt ein Kindprozess ("spawn").
+
+- Frames: jeder neue Frame wird einmal in einen Slot eines Shared-Memory-Segments kopiert
+  (gleiches Slot-Protokoll wie der Live-Eingang, ingest.py); der Kindprozess sendet die
+  Zeilenpakete direkt aus dem Slot (IngestSource) und zeigt ohne neuen Frame den letzten weiter.
+- Steuerung: eine Pipe mit kurzen Tupeln (Ziel, Quelle, Helligkeit/TX-Modus/Bildrate, Mitschnitt).
+- Statistik: ein Zählerblock im Shared Memory mit genau einem Schreiber (Sende-Thread des
+  Kindes) und einem Leser, ohne Lock. Frames, Sendefehler und Verspätungen laufen als Ereignisse
+  durch einen Ring und landen im Hauptprozess in derselben Telemetrie wie im Thread-Betrieb.
+
+Der Hauptprozess erzeugt jeden Frame SENDER_LEAD Intervalle vor der nächsten Deadline des
+Kindprozesses (perf_counter ist unter Linux systemweit monoton), sodass jeder Frame genau
+einmal gezeigt wird. Die Deadlines hält allein der Kindprozess; auf einem Pi 4 kann er mit
+SENDER_PROCESS_CPU auf einen eigenen Kern gelegt werden.
+
+Beispiel:
+    python3 cli.py play bild.png --iface eth0 --sender-process --sender-cpu 3
+"""
+import os
+import math
+import errno
+import logging
+import threading
+import multiprocessing
+import numpy as np
+from multiprocessing import shared_memory
+from constants import SENDER_SLOTS, SENDER_LEAD, SENDER_EVENTS
+from ingest import IngestChannel, IngestSource, SlotWriter, FORMAT_BGR, attach_segment
+from playback import FrameSender
+from frame_clock import FrameClock
+from telemetry import Histogram
+from thread_manager import ThreadManager
+
+# Zählerblock: feste int64-Felder (kumulativ), danach der Ereignisring mit je 6 int64
+COUNTERS = ("written", "deadline_ns", "idle", "skipped", "dropped", "eagain", "enobufs", "retries", "wait_ns",
+            "frames_dropped", "packets_dropped", "capture_packets", "capture_bytes", "capture_dropped")
+EVENT_FRAME = 1                                 # Bytes, Pakete, Aufbau/Senden/Latenz in ns
+EVENT_ERROR = 2                                 # errno
+EVENT_LATE = 3                                  # Verspätung der Deadline in ns
+EVENT_FIELDS = 6
+TRANSPORT_COUNTERS = ("eagain", "enobufs", "retries", "frames_dropped", "packets_dropped")
+
+class StatsBlock:
+    """Zähler und Ereignisring im Shared Memory: ein Schreiber (Kindprozess), ein Leser (Hauptprozess).
+
+    push() schreibt erst den Eintrag, dann den Zähler ``written``; der Leser holt mit read() alles
+    seit seinem letzten Stand. Liegt er mehr als einen Ring zurück, zählen die Einträge als verloren.
+    """
+
+    def __init__(self, shm, events=SENDER_EVENTS):
+        self.shm = shm
+        self.size = events
+        values = np.ndarray((len(COUNTERS) + events * EVENT_FIELDS,), dtype=np.int64, buffer=shm.buf)
+        self.counters = values[:len(COUNTERS)]
+        self.events = values[len(COUNTERS):].reshape(events, EVENT_FIELDS)
+        self.index = {name: i for i, name in enumerate(COUNTERS)}
+
+    @staticmethod
+    def nbytes(events=SENDER_EVENTS):
+        return (len(COUNTERS) + events * EVENT_FIELDS) * 8
+
+    def get(self, name):
+        return int(self.counters[self.index[name]])
+
+    def set(self, name, value):
+        self.counters[self.index[name]] = value
+
+    def push(self, kind, a=0, b=0, c=0, d=0, e=0):
+        written = int(self.counters[0])
+        self.events[written % self.size] = (kind, a, b, c, d, e)
+        self.counters[0] = written + 1          # erst jetzt sieht der Leser den Eintrag
+
+    def read(self, start):
+        # -> (neuer Stand, verlorene Einträge, [(Art, a, b, c, d, e)])
+        written = int(self.counters[0])
+        lost = max(0, written - start - self.size)
+        start += lost
+        if start >= written:
+            return written, lost, []
+        return written, lost, np.take(self.events, np.arange(start, written), axis=0, mode="wrap").tolist()
+
+    def close(self):
+        self.counters = self.events = None
+        self.shm.close()
+
+def _links(session):
+    # Sende-Sockets einer SenderSession oder TiledCanvas
+    return session.links if hasattr(session, "links") else [session.l2]
+
+def describe_target(session):
+    # Alles, was der Kindprozess braucht, um denselben Transport selbst zu öffnen (picklebar)
+    l2 = _links(session)[0]
+    transport = {"qdisc_bypass": l2.qdisc_bypass, "sndbuf": l2.sndbuf, "blocking": l2.blocking,
+                 "backpressure": l2.backpressure, "jumbo": l2.jumbo}
+    target = {"src_mac": session.src_mac, "brightness": session.brightness_percent, "tx_mode": l2.tx_mode,
+              "transport": transport}
+    if hasattr(session, "tiles"):
+        target["tiles"] = session.tiles         # Videowand: Kindprozess baut eine eigene TiledCanvas
+    else:
+        target["interface"] = l2.interface_name
+        target["dest_mac"] = session.dest_mac
+    return target
+
+class RemoteRecorder:
+    """Mitschnitt im Sendeprozess (dort ein capture.PcapRecorder); Zähler kommen über den Zählerblock."""
+
+    def __init__(self, sender, path):
+        self.sender = sender
+        self.path = path
+        sender.send(("record", path))
+
+    @property
+    def packets(self):
+        return self.sender.counter("capture_packets")
+
+    def stats(self):
+        return {"path": self.path, "packets": self.packets, "bytes": self.sender.counter("capture_bytes"),
+                "dropped": self.sender.counter("capture_dropped"), "queued": 0}
+
+    def close(self):
+        self.sender.send(("record", None))
+
+class ProcessSender(FrameSender):
+    """FrameSender, dessen Sendeschleife in einem Kindprozess läuft.
+
+    run() ist hier der Erzeuger: er fragt die veröffentlichte Quelle vor jeder Deadline des
+    Kindprozesses, kopiert neue Frames in einen freien Slot und gleicht Ziel und Einstellungen
+    (Helligkeit der Sitzung, TX-Modus, Backpressure, Bildrate, Keep-alive) an Frame-Grenzen per
+    Pipe ab. Liefert die Quelle denselben CompiledFrame wie zuletzt, wird nichts kopiert; die
+    adaptive Bildrate entscheidet der Kindprozess. Ereignisse aus dem Zählerblock werden hier an
+    on_frame/on_send_error und an die Uhr (Verspätung, ausgelassene Deadlines) weitergereicht.
+    """
+
+    def __init__(self, clock, on_frame=None, on_error=None, on_send_error=None, keepalive_fps=None,
+                 cpu=-1, slots=SENDER_SLOTS, events=SENDER_EVENTS):
+        super().__init__(clock, on_frame, on_error, on_send_error, keepalive_fps)
+        self.cpu = cpu
+        self.slots = slots
+        self.events = events
+        self.produce = Histogram()              # Quelle fragen + Frame in den Slot kopieren
+        self.written = 0                        # übergebene Frames
+        self.lost = 0                           # Ereignisse, die der Ring schon überschrieben hatte
+        self.recording = None                   # Pfad des Mitschnitts (auch nach einem Neustart des Kindes)
+        self._block = None
+        self._process = None
+        self._conn = None
+        self._send_lock = threading.Lock()      # Pipe wird aus Tk- und Erzeuger-Thread beschrieben
+        self._read = 0
+        self._seen = {"skipped": 0, "dropped": 0}
+        self._channel = None                    # IngestChannel + SlotWriter im Hauptprozess
+        self._channel_key = None
+        self._writer = None
+        self._reset()
+        self.start()
+
+    def _reset(self):
+        # Stand des Kindprozesses unbekannt: Ziel, Einstellungen und Quelle werden neu übertragen
+        self._target = None
+        self._settings = None
+        self._shown = None
+
+    # --- Prozess ---
+
+    def start(self):
+        if self._process is not None:
+            return
+        if self._block is None:
+            shm = shared_memory.SharedMemory(create=True, size=StatsBlock.nbytes(self.events))
+            self._block = StatsBlock(shm, self.events)
+        self._block.counters[:] = 0             # neues Kind zählt von vorn
+        self._read = 0
+        self._seen = dict.fromkeys(self._seen, 0)
+        context = multiprocessing.get_context("spawn")      # keine Tk-/Sende-Threads im Kind
+        self._conn, child = context.Pipe()
+        options = {"fps": self.clock.fps, "cpu": self.cpu, "events": self.events,
+                   "log_level": logging.getLogger().getEffectiveLevel()}
+        self._process = context.Process(target=serve, args=(child, self._block.shm.name, options),
+                                        name="led-sender", daemon=True)
+        self._process.start()
+        child.close()
+        self._reset()
+        if self.recording:
+            self.send(("record", self.recording))
+        logging.info(f"Sender process started (pid {self._process.pid}"
+                     f"{f', CPU {self.cpu}' if self.cpu >= 0 else ''}).")
+
+    def send(self, message):
+        with self._send_lock:
+            if self._conn is not None:
+                self._conn.send(message)
+
+    def counter(self, name):
+        block = self._block
+        return block.get(name) if block else 0
+
+    def close(self):
+        # Kindprozess beenden und Shared Memory freigeben (quit_app)
+        process, self._process = self._process, None
+        if process is not None:
+            try:
+                self.send(("quit",))
+            except OSError:
+                pass
+            process.join(2)
+            if process.is_alive():
+                process.terminate()
+                process.join(1)
+        with self._send_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        self._close_channel()
+        if self._block is not None:
+            block, self._block = self._block, None
+            block.close()
+            block.shm.unlink()
+
+    # --- Mitschnitt ---
+
+    def start_recording(self, path):
+        self.recording = path
+        return RemoteRecorder(self, path)
+
+    def stop_recording(self, recorder):
+        self.recording = None
+        recorder.close()
+
+    # --- Statistik ---
+
+    def transport_counters(self):
+        # Zähler der Sende-Sockets im Kindprozess (ersetzen die unbenutzten Sockets des Hauptprozesses)
+        counters = {name: self.counter(name) for name in TRANSPORT_COUNTERS}
+        counters["wait_s"] = self.counter("wait_ns") / 1e9
+        return counters
+
+    def stats(self, reset=False):
+        stats = super().stats(reset)
+        process = self._process
+        stats.update(pid=process.pid if process else None, handed_over=self.written, lost=self.lost,
+                     produce=self.produce.snapshot(reset=reset))
+        return stats
+
+    def _poll(self):
+        # Meldungen des Kindes und neue Ereignisse aus dem Ring übernehmen (Erzeuger-Thread)
+        conn = self._conn
+        while conn is not None and conn.poll():
+            kind, text = conn.recv()
+            if kind == "error":
+                self._fail(RuntimeError(text))
+        block = self._block
+        self._read, lost, events = block.read(self._read)
+        self.lost += lost
+        on_frame, on_send_error, lateness = self.on_frame, self.on_send_error, self.clock.lateness
+        for kind, a, b, c, d, e in events:
+            if kind == EVENT_LATE:
+                lateness.record(a / 1e9)
+            elif kind == EVENT_FRAME:
+                if on_frame:
+                    on_frame(a, b, c / 1e9, d / 1e9, e / 1e9)
+            elif kind == EVENT_ERROR and on_send_error:
+                on_send_error(OSError(a, os.strerror(a)))
+        seen = self._seen
+        skipped, dropped = block.get("skipped"), block.get("dropped")
+        self.skipped += skipped - seen["skipped"]
+        self.clock.dropped_frames += dropped - seen["dropped"]
+        seen["skipped"], seen["dropped"] = skipped, dropped
+        self.idle = bool(block.get("idle"))
+
+    def _fail(self, error):
+        # Wie ein Quellenfehler im FrameSender: Quelle nicht endlos wiederholen, Controller benachrichtigen
+        logging.error(f"Sender process: {error}")
+        self._reset()                           # Ziel beim nächsten Versuch neu öffnen lassen
+        with self._lock:
+            if self._pending is self._active:
+                self._pending = None
+        if self.on_error:
+            self.on_error(error)
+
+    # --- Erzeuger ---
+
+    def _sync(self, session):
+        # Ziel und Einstellungen an der Frame-Grenze abgleichen; gesendet wird nur bei Änderungen
+        if session is not self._target:
+            self.send(("target", describe_target(session)))
+            self._target = session
+            self._settings = None
+            self._shown = None
+        l2 = _links(session)[0]
+        interval = self.keepalive_interval
+        settings = (session.brightness_percent, l2.tx_mode, l2.backpressure, self.clock.fps,
+                    1.0 / interval if interval else None)
+        if settings != self._settings:
+            self.send(("settings",) + settings)
+            self._settings = settings
+
+    def _write(self, compiled, session):
+        # Pixel in den nächsten freien Slot kopieren; neues Segment nur bei anderer Geometrie
+        row_pixels = min(l2.row_pixels for l2 in _links(session))
+        key = (compiled.column_count, compiled.valid_rows, row_pixels)
+        if key != self._channel_key:
+            self._close_channel()
+            self._channel = IngestChannel(compiled.column_count, compiled.valid_rows, FORMAT_BGR, self.slots, row_pixels)
+            self._writer = SlotWriter(self._channel.shm.buf, self._channel.layout)
+            self._channel_key = key
+            self._shown = None
+        np.copyto(self._writer.frame(), compiled.pixel_array())
+        self._writer.publish()
+        self.written += 1
+
+    def _close_channel(self):
+        if self._channel is None:
+            return
+        self._writer.close()
+        if not self._channel.close():
+            logging.debug(f"Sender segment {self._channel.name} still in use.")
+        self._channel = self._writer = self._channel_key = None
+
+    def _next_deadline(self, last, stop_event):
+        # Nächste Deadline des Kindprozesses nach ``last``; gewartet wird bis LEAD Intervalle davor
+        clock = self.clock
+        interval = clock.interval
+        now = clock.now()
+        anchor = self._block.get("deadline_ns") / 1e9
+        if not anchor:                          # Kind hat noch keine Deadline gemeldet: eigener Takt
+            anchor = last or now
+        steps = math.ceil((now - anchor) / interval + SENDER_LEAD)
+        if last:
+            steps = max(steps, round((last - anchor) / interval) + 1)
+        deadline = anchor + steps * interval
+        remaining = deadline - SENDER_LEAD * interval - now
+        if remaining > 0 and stop_event.wait(remaining):
+            return None
+        return None if stop_event.is_set() else deadline
+
+    def run(self, stop_event):
+        # Signatur passend zu ThreadManager.start_thread(target(stop_event)); gesendet wird im Kindprozess
+        deadline = None
+        last = None                             # zuletzt übergebener CompiledFrame
+        while not stop_event.is_set():
+            if self._process is None:
+                self.start()
+            elif not self._process.is_alive():
+                code = self._process.exitcode
+                self._process = None
+                self._fail(RuntimeError(f"exited with code {code}"))
+                self.start()
+            self._poll()
+            self._swap()
+            entry = self._active
+            if entry is None:
+                if self._shown is not None:
+                    self.send(("clear",))
+                    self._shown = None
+                self._changed.clear()
+                if self._pending is None:       # Leerlauf bis zur nächsten Veröffentlichung
+                    self._changed.wait(0.2)
+                deadline = last = None
+                continue
+            source, session, delta = entry
+            try:
+                self._sync(session)
+                deadline = self._next_deadline(deadline, stop_event)
+                if deadline is None:
+                    break
+                start = self.clock.now()
+                compiled = source.next_frame(deadline)
+                if compiled is not None and (compiled is not last or self._shown is not entry):
+                    self._write(compiled, session)
+                    last = compiled
+                    if self._shown is not entry:
+                        self.send(("show", self._channel.describe(), delta.keyframe_interval if delta else None))
+                        self._shown = entry
+                self.produce.record(self.clock.now() - start)
+            except Exception as e:
+                logging.error(f"Transmission error: {e}")
+                with self._lock:
+                    if self._pending is self._active:
+                        self._pending = None
+                if self.on_error:
+                    self.on_error(e)
+        self.clear()
+        self._swap()
+        if self._shown is not None:
+            try:
+                self.send(("clear",))
+            except OSError:
+                pass
+            self._shown = None
+
+def serve(conn, stats_name, options):
+    """Einstiegspunkt des Kindprozesses (multiprocessing, Start per "spawn")."""
+    logging.basicConfig(level=options["log_level"], format="%(asctime)s [%(levelname)s] [sender] %(message)s")
+    if options["cpu"] >= 0:
+        try:
+            os.sched_setaffinity(0, {options["cpu"]})
+        except (OSError, AttributeError) as e:
+            logging.warning(f"Could not pin the sender process to CPU {options['cpu']}: {e}")
+    _SenderProcess(conn, stats_name, options).run()
+
+class _SenderProcess:
+    """Kindseite: FrameSender mit eigenem Socket und eigener FrameClock, Frames aus den Slots."""
+
+    def __init__(self, conn, stats_name, options):
+        self.conn = conn
+        self.block = StatsBlock(attach_segment(stats_name, shared_tracker=True), options["events"])
+        self.clock = FrameClock(options["fps"])
+        self.clock.lateness = self              # jede Deadline meldet ihre Verspätung an record()
+        self.sender = FrameSender(self.clock, on_frame=self.frame, on_error=self.report,
+                                  on_send_error=self.error)
+        self.session = None
+        self.links = []
+        self.channel = None
+        self.recorder = None
+        self.workers = ThreadManager()
+        self._closing = []                      # Segmente, auf die der Sende-Thread noch Views hält
+        self._send_lock = threading.Lock()
+
+    # --- Zählerblock (Sende-Thread) ---
+
+    def frame(self, bytes_sent, packets, build_s, send_s, latency_s):
+        self.block.push(EVENT_FRAME, bytes_sent, packets, int(build_s * 1e9), int(send_s * 1e9), int(latency_s * 1e9))
+
+    def error(self, error):
+        self.block.push(EVENT_ERROR, getattr(error, "errno", None) or errno.EIO)
+
+    def record(self, lateness):
+        # Aus FrameClock.wait_next(): Deadline für den Erzeuger und kumulative Zähler veröffentlichen
+        block = self.block
+        block.set("deadline_ns", int((self.clock.now() - lateness) * 1e9))
+        block.push(EVENT_LATE, int(lateness * 1e9))
+        block.set("idle", int(self.sender.idle))
+        block.set("skipped", self.sender.skipped)
+        block.set("dropped", self.clock.dropped_frames)
+        for name in TRANSPORT_COUNTERS:
+            block.set(name, sum(l2.counters[name] for l2 in self.links))
+        block.set("wait_ns", int(sum(l2.counters["wait_s"] for l2 in self.links) * 1e9))
+        recorder = self.recorder
+        if recorder:
+            block.set("capture_packets", recorder.packets)
+            block.set("capture_bytes", recorder.bytes)
+            block.set("capture_dropped", recorder.dropped)
+
+    def report(self, error):
+        with self._send_lock:
+            self.conn.send(("error", str(error)))
+
+    # --- Steuerung (Hauptthread des Kindes) ---
+
+    def run(self):
+        self.workers.start_thread(self.sender.run)
+        try:
+            while True:
+                if self.conn.poll(0.5):
+                    message = self.conn.recv()
+                    if message[0] == "quit":
+                        break
+                    try:
+                        getattr(self, f"_on_{message[0]}")(*message[1:])
+                    except Exception as e:
+                        logging.error(f"Sender process: {message[0]} failed: {e}")
+                        if message[0] == "target":
+                            self.report(e)      # ohne Ziel kann nichts gesendet werden
+                self._closing = [channel for channel in self._closing if not channel.close()]
+        except (EOFError, OSError):
+            pass                                # Hauptprozess beendet
+        finally:
+            self.workers.stop_all()
+            self._close_target()
+            self._on_record(None)
+            if self.channel:
+                self.channel.close()
+            self.block.close()
+
+    def _on_target(self, target):
+        self._close_target()
+        transport = dict(target["transport"], recorder=self.recorder)
+        if "tiles" in target:
+            from canvas import TiledCanvas
+            session = TiledCanvas(target["tiles"], target["src_mac"], target["brightness"], target["tx_mode"], transport)
+        else:
+            from ethernet import L2Ethernet
+            from sending import SenderSession
+            l2 = L2Ethernet(target["interface"], target["tx_mode"], **transport)
+            l2.open()
+            if l2.socket is None:
+                raise OSError(f"Failed to open interface {target['interface']}.")
+            session = SenderSession(l2, target["src_mac"], target["dest_mac"], target["brightness"])
+        self.session = session
+        self.links = _links(session)
+
+    def _close_target(self):
+        # Erst den Sende-Thread in den Leerlauf schicken, dann die Sockets schließen
+        if self.session is None:
+            return
+        self.sender.clear()
+        for _ in range(100):
+            if not self.sender.active:
+                break
+            threading.Event().wait(0.01)
+        session, self.session = self.session, None
+        self.links = []
+        if hasattr(session, "tiles"):
+            session.close()
+        else:
+            session.l2.close()
+
+    def _on_settings(self, brightness, tx_mode, backpressure, fps, keepalive_fps):
+        if self.session is not None:
+            self.session.set_brightness(brightness)
+            for l2 in self.links:
+                l2.set_tx_mode(tx_mode)
+                l2.set_backpressure(backpressure)
+        self.clock.set_fps(fps)
+        self.sender.set_keepalive(keepalive_fps)
+
+    def _on_show(self, description, keyframe_interval):
+        if self.session is None:
+            return                              # Ziel konnte nicht geöffnet werden (bereits gemeldet)
+        if self.channel is None or self.channel.name != description["shm"]:
+            try:
+                channel = IngestChannel.attach(description, shared_tracker=True)
+            except FileNotFoundError:
+                return                          # schon wieder ersetzt, die nächste Meldung folgt
+            if self.channel:
+                self._closing.append(self.channel)
+            self.channel = channel
+        delta = None
+        if keyframe_interval:
+            from sending import DeltaEncoder
+            delta = DeltaEncoder(keyframe_interval)
+        self.sender.publish(IngestSource(self.channel, self.session), self.session, delta)
+
+    def _on_clear(self):
+        self.sender.clear()
+
+    def _on_record(self, path):
+        recorder, self.recorder = self.recorder, None
+        for l2 in self.links:
+            l2.set_recorder(None)
+        if recorder:
+            recorder.close()
+        if path:
+            from capture import PcapRecorder
+            self.recorder = PcapRecorder(path)
+            for l2 in self.links:
+                l2.set_recorder(self.recorder)
@@ -2,7 +2,27 @@
 
 import struct
 from enum import Enum, auto
-from utils import init_frames, update_row_data, get_brightness
+import numpy as np
+from constants import ETH_HEADER_LEN, TX_MODE_SENDMMSG, ROW_HEADER_LEN, ROW_MAX_PIXELS
+from ethernet import PacketBatch
+from utils import init_frames, update_row_data, get_brightness, row_segments
+
+_ROW_HEADER = struct.Struct("!6s6sHBHHBB")     # Ethernet-Header + 0x5500-Kopf (Zeile, Pixel-Offset, Anzahl, 0x08 0x88)
+
+def frame_layout(column_count, row_count, max_pixels=ROW_MAX_PIXELS):
+    """Pufferaufbau eines CompiledFrame: (Segmente, Zeilenabstand, Pixel-Offset, Bytes).
+
+    Passt eine Zeile in ein Paket, liegen die Pixel wie gehabt direkt hinter dem Header
+    (Zeilenabstand = Paketlänge). Sonst liegen alle Pixel zusammenhängend am Anfang des
+    Puffers und die Header aller Teilpakete dahinter; ein Paket ist dann (Header, Pixel).
+    """
+    segments = row_segments(column_count, max_pixels)
+    header_len = ETH_HEADER_LEN + ROW_HEADER_LEN
+    if len(segments) == 1:
+        row_stride = header_len + column_count * 3
+        return segments, row_stride, header_len, row_count * row_stride
+    row_stride = column_count * 3
+    return segments, row_stride, 0, row_count * (row_stride + len(segments) * header_len)
 
 class SenderState(Enum):
     INIT = auto()
@@ -24,6 +44,13 @@ class FrameSenderFSM:
         self.total_bytes_sent = 0
         self.current_row = 0
         self.frameData0107, self.frameData0aff, self.frameData5500 = init_frames(column_count, brightness_percent)
+        # Breite Zeilen: ein 0x5500-Paket pro Segment, so groß wie die Schnittstelle erlaubt
+        self.segments = row_segments(column_count, getattr(l2, "row_pixels", ROW_MAX_PIXELS))
+        self.row_headers = []
+        for start, count in self.segments:
+            header = bytearray(self.frameData5500[:ROW_HEADER_LEN])
+            header[1:5] = struct.pack("!HH", start, count)
+            self.row_headers.append(header)
 
     def send_frame_zero_copy(self, ether_type, payload):
         if self.l2 is None or not hasattr(self.l2, 'socket') or self.l2.socket is None:
@@ -31,8 +58,9 @@ class FrameSenderFSM:
         
         eth_header = struct.pack("!6s6sH", self.dest_mac, self.src_mac, ether_type)    #wurde in ethernet.py erklärt
 
-        # sendmsg nimmt eine Liste von Byteobjekten (partielle Zero-Copy-technik per Scatter/Gather)
-        bytes_sent = self.l2.socket.sendmsg([eth_header, payload])
+        # sendmsg nimmt eine Liste von Byteobjekten (partielle Zero-Copy-technik per Scatter/Gather);
+        # bei vollem Puffer wartet L2Ethernet im Rahmen des Budgets, statt den Frame abzubrechen
+        bytes_sent = self.l2.sendmsg([eth_header, payload])
         return bytes_sent
 
 
@@ -69,16 +97,253 @@ class FrameSenderFSM:
         bytes_per_row = self.column_count * 3
         if self.current_row < self.row_count:
             row_data = self.frame_data[self.current_row * bytes_per_row : (self.current_row + 1) * bytes_per_row]
-            if len(row_data) == bytes_per_row:
+            if len(row_data) == bytes_per_row and len(self.segments) == 1:
                 update_row_data(self.frameData5500, self.current_row, row_data)
                 bytes_sent = self.send_frame_zero_copy(0x5500, self.frameData5500)
                 self.total_bytes_sent += bytes_sent
+            elif len(row_data) == bytes_per_row:
+                row_view = memoryview(row_data)
+                eth_header = struct.pack("!6s6sH", self.dest_mac, self.src_mac, 0x5500)
+                for header, (start, count) in zip(self.row_headers, self.segments):
+                    header[0] = self.current_row & 0xFF
+                    self.total_bytes_sent += self.l2.sendmsg([eth_header, header, row_view[start * 3:(start + count) * 3]])
             else:
                 print(f"Skipping invalid row {self.current_row}")
             self.current_row += 1
         else:
             self.state = SenderState.FINISHED
 
+class SetupPackets:
+    """Vorberechnete 0x0107- und 0x0AFF-Pakete (inkl. Ethernet-Header) für eine Helligkeit."""
+
+    def __init__(self, src_mac, dest_mac, brightness_percent):
+        self.brightness_percent = brightness_percent
+        self.brightness_code = get_brightness(brightness_percent)     # Wert laut BRIGHTNESS_MAP
+        frameData0107, frameData0aff, _ = init_frames(0, brightness_percent)
+        self.buffer = bytearray(2 * ETH_HEADER_LEN + len(frameData0107) + len(frameData0aff))
+        view = memoryview(self.buffer)
+        offset = 0
+        self.packets = []
+        for ether_type, payload in ((0x0107, frameData0107), (0x0AFF, frameData0aff)):
+            end = offset + ETH_HEADER_LEN + len(payload)
+            struct.pack_into("!6s6sH", self.buffer, offset, dest_mac, src_mac, ether_type)
+            self.buffer[offset + ETH_HEADER_LEN:end] = payload
+            self.packets.append(view[offset:end])
+            offset = end
+        self.total_bytes = len(self.buffer)
+        self.batch = PacketBatch(self.packets)
+
+class CompiledFrame:
+    """Alle 0x5500-Zeilenpakete eines Bildes einmalig vorberechnet.
+
+    Header und Nutzdaten liegen hintereinander in einem zusammenhängenden Puffer,
+    ``packets`` enthält je Zeile eine memoryview darauf. Beim Senden werden nur noch
+    die Views durchlaufen, es entsteht kein struct.pack / Slicing pro Refresh.
+    Die helligkeitsabhängigen Setup-Pakete hält die SenderSession.
+    ``column_offset``/``row_offset`` landen in den Offset-Feldern des 0x5500-Headers
+    (Kachel einer Videowand, siehe canvas.py).
+    Zeilen mit mehr als ``max_pixels`` Pixeln werden auf mehrere Pakete verteilt (Pixel-Offset und
+    -Anzahl im Header); alle Teilpakete entstehen hier einmalig, ``packets`` enthält dann je Teil
+    ein Tupel (Header, Pixel), siehe frame_layout().
+    Mit ``buffer`` (z.B. ein Shared-Memory-Slot, siehe ingest.py) liegen die Pakete in diesem
+    Puffer; bei ``frame_data=None`` werden dort nur die Header geschrieben, die Pixel nicht.
+    """
+
+    def __init__(self, src_mac, dest_mac, frame_data, column_count, row_count, column_offset=0, row_offset=0,
+                 buffer=None, max_pixels=ROW_MAX_PIXELS):
+        self.key = (src_mac, dest_mac, column_count, row_count, column_offset, row_offset)
+        self.column_count = column_count
+        self.row_count = row_count
+
+        bytes_per_row = column_count * 3
+        if frame_data is None:
+            valid_rows = row_count
+        else:
+            valid_rows = min(row_count, len(frame_data) // bytes_per_row) if bytes_per_row else 0
+        if valid_rows < row_count:
+            print(f"Skipping invalid rows {valid_rows}..{row_count - 1}")
+
+        segments, row_stride, pixel_offset, total_bytes = frame_layout(column_count, valid_rows, max_pixels)
+        header_len = ETH_HEADER_LEN + ROW_HEADER_LEN
+        split = len(segments) > 1
+        self.segments = segments
+        self.row_stride = row_stride
+        self.pixel_offset = pixel_offset
+        self.row_packet_len = header_len + segments[0][1] * 3     # größtes Zeilenpaket
+        self.valid_rows = valid_rows
+        self.buffer = bytearray(total_bytes) if buffer is None else buffer
+        self.shared = buffer is not None        # fremder Puffer: Inhalt kann sich nach dem Senden ändern
+        self.packets = []
+        view = memoryview(self.buffer)
+        headers = valid_rows * row_stride       # geteilte Zeilen: Header hinter den Pixeln
+        for row in range(valid_rows):
+            panel_row = row_offset + row
+            # Zeilen > 255: High-Byte der Zeilennummer steckt im unteren Byte des EtherType
+            ether_type = 0x5500 | (panel_row >> 8)
+            for start, count in segments:
+                pixels = row * row_stride + pixel_offset + start * 3
+                offset = headers if split else row * row_stride
+                _ROW_HEADER.pack_into(self.buffer, offset, dest_mac, src_mac, ether_type, panel_row & 0xFF,
+                                      column_offset + start, count, 0x08, 0x88)
+                if split:
+                    self.packets.append((view[offset:offset + header_len], view[pixels:pixels + count * 3]))
+                    headers += header_len
+                else:
+                    self.packets.append(view[offset:pixels + count * 3])
+
+        self.total_bytes = total_bytes
+        self.batch = None                   # PacketBatch für sendmmsg, wird beim ersten Senden gebaut
+        self._pixel_rows = None
+        if frame_data is not None and valid_rows:
+            self.pixel_rows()[:] = np.frombuffer(frame_data, dtype=np.uint8,
+                                                 count=valid_rows * bytes_per_row).reshape(valid_rows, bytes_per_row)
+
+    def matches(self, src_mac, dest_mac, column_count, row_count, column_offset=0, row_offset=0,
+                max_pixels=ROW_MAX_PIXELS):
+        return (self.key == (src_mac, dest_mac, column_count, row_count, column_offset, row_offset)
+                and self.segments == row_segments(column_count, max_pixels))
+
+    def row_packet_indices(self, rows):
+        # Indizes in ``packets`` für diese Zeilen (alle Teilpakete einer geteilten Zeile)
+        count = len(self.segments)
+        if count == 1:
+            return [int(row) for row in rows]
+        return [int(row) * count + j for row in rows for j in range(count)]
+
+    @property
+    def nbytes(self):
+        # Speicherbedarf für das Cache-Budget
+        return self.total_bytes
+
+    def pixel_rows(self):
+        # 2D-View (Zeilen x Bytes) auf die Pixeldaten aller Zeilenpakete, ohne Kopie
+        if self._pixel_rows is None:
+            rows = np.frombuffer(self.buffer, dtype=np.uint8, count=self.valid_rows * self.row_stride)
+            rows = rows.reshape(self.valid_rows, self.row_stride)
+            self._pixel_rows = rows[:, self.pixel_offset:self.pixel_offset + self.column_count * 3]
+        return self._pixel_rows
+
+    def pixel_array(self):
+        # Dieselben Pixeldaten als Zeilen x Spalten x 3 (BGR)
+        return self.pixel_rows().reshape(self.valid_rows, self.column_count, 3)
+
+    def update_pixels(self, pixels, color=None):
+        # Neue Pixeldaten (Zeilen x Spalten x 3, BGR) direkt in die vorhandenen Zeilenpakete schreiben;
+        # mit ``color`` (ColorCorrection) laufen LUTs und Dithering im selben Durchgang
+        if color is not None:
+            pixels = np.asarray(pixels, dtype=np.uint8).reshape(self.valid_rows, self.column_count, 3)
+            color.apply(pixels, self.pixel_array())
+            return
+        self.pixel_rows()[:] = np.asarray(pixels).reshape(self.valid_rows, -1)
+
+class DeltaEncoder:
+    """Wählt pro Frame nur die Zeilen aus, die sich gegenüber dem zuletzt gesendeten Frame geändert haben.
+
+    Alle ``keyframe_interval`` Frames wird ein vollständiger Frame gesendet, damit
+    verlorene Pakete die Anzeige nicht dauerhaft verfälschen.
+    """
+
+    def __init__(self, keyframe_interval=60):
+        self.keyframe_interval = max(1, int(keyframe_interval))
+        self.reset()
+
+    def reset(self):
+        self._last_frame = None
+        self._last_rows = None
+        self._reference = None                  # eigene Kopie der Vergleichszeilen bei Shared-Memory-Frames
+        self._since_keyframe = 0
+        self.rows_sent = 0
+        self.rows_skipped = 0
+
+    def force_keyframe(self):
+        # Nächster Frame komplett, z.B. nachdem ein Frame verworfen wurde (Empfänger hat ihn nicht)
+        self._last_frame = None
+        self._last_rows = None
+
+    def changed_rows(self, compiled):
+        """None für einen Keyframe (alle Zeilen), sonst ein Array der geänderten Zeilenindizes."""
+        self._since_keyframe += 1
+        current = self._last_rows if compiled is self._last_frame else compiled.pixel_rows()
+        last = self._last_rows
+        if last is None or last.shape != current.shape or self._since_keyframe >= self.keyframe_interval:
+            self._last_frame, self._last_rows = compiled, self._keep(compiled, current)
+            self._since_keyframe = 0
+            self.rows_sent += compiled.valid_rows
+            return None
+        if compiled is self._last_frame:
+            rows = np.empty(0, dtype=np.intp)
+        else:
+            rows = np.flatnonzero((current != last).any(axis=1))   # ein NumPy-Vergleich über den ganzen Frame
+        self._last_frame, self._last_rows = compiled, self._keep(compiled, current)
+        self.rows_sent += rows.size
+        self.rows_skipped += compiled.valid_rows - rows.size
+        return rows
+
+    def _keep(self, compiled, current):
+        # Frames im Shared Memory (Live-Eingang, Sendeprozess): der Produzent darf den Slot
+        # überschreiben, sobald der Sender den nächsten zeigt - Vergleichszeilen daher kopieren
+        if not compiled.shared or current is self._last_rows:
+            return current
+        reference = self._reference
+        if reference is None or reference.shape != current.shape:
+            reference = self._reference = np.empty_like(current)
+        np.copyto(reference, current)
+        return reference
+
+
+class SenderSession:
+    """Langlebige Sende-Sitzung: besitzt Helligkeit und die vorberechneten Setup-Pakete.
+
+    Die Setup-Pakete werden nur bei einer Änderung (set_brightness, aus dem Tk-Thread
+    per Variablen-Trace) neu gebaut und per Referenztausch übernommen; Sende-Threads
+    lesen keine Tk-Variablen und sehen die neue Helligkeit ab dem nächsten Frame.
+    """
+
+    def __init__(self, l2, src_mac, dest_mac, brightness_percent):
+        self.l2 = l2
+        self.src_mac = src_mac
+        self.dest_mac = dest_mac
+        self.setup = SetupPackets(src_mac, dest_mac, brightness_percent)
+        self.last_packets = 0               # Pakete des zuletzt gesendeten Frames (Telemetrie)
+
+    @property
+    def brightness_percent(self):
+        return self.setup.brightness_percent
+
+    def matches(self, l2, src_mac, dest_mac):
+        return self.l2 is l2 and self.src_mac == src_mac and self.dest_mac == dest_mac
+
+    def set_brightness(self, brightness_percent):
+        # Liefert True, wenn sich die Helligkeit geändert hat und neue Setup-Pakete gebaut wurden
+        if brightness_percent == self.setup.brightness_percent:
+            return False
+        self.setup = SetupPackets(self.src_mac, self.dest_mac, brightness_percent)
+        return True
+
+    def send_frame(self, compiled, rows=None, timeout=None):
+        # rows: None = kompletter Frame, sonst nur Setup-Pakete + diese Zeilen (Delta-Modus).
+        # timeout: Wartebudget bei vollem Puffer (bis zur nächsten Deadline), siehe L2Ethernet.
+        # Sendefehler (OSError, z.B. FrameDropped) werden nicht hier ausgegeben, sondern vom
+        # Aufrufer gezählt (Telemetrie) - kein print/Logging im Sendepfad.
+        l2 = self.l2
+        if l2 is None or not hasattr(l2, 'socket') or l2.socket is None:
+            raise Exception("L2Ethernet instance is not properly initialized (socket is None).")
+        setup = self.setup                  # einmal lesen: ein Frame nutzt immer einen konsistenten Stand
+        row_count = compiled.valid_rows if rows is None else len(rows)
+        self.last_packets = len(setup.packets) + row_count * len(compiled.segments)
+        if l2.tx_mode == TX_MODE_SENDMMSG:
+            batch = compiled.batch
+            if batch is None:
+                batch = compiled.batch = PacketBatch(compiled.packets, reserved=len(setup.packets))
+            if batch.head is not setup.batch:
+                batch.set_head(setup.batch)
+            if rows is None:
+                return l2.send_batch(batch, timeout)
+            indices = list(range(batch.reserved)) + [batch.reserved + i for i in compiled.row_packet_indices(rows)]
+            return l2.send_batch(batch.subset(indices), timeout)
+        packets = compiled.packets if rows is None else [compiled.packets[i] for i in compiled.row_packet_indices(rows)]
+        return l2.send_packets(setup.packets, timeout) + l2.send_packets(packets, timeout)
+
 def send_single_frame_sync(l2, src_mac, dest_mac, brightness_percent, frame_data, column_count, row_count): #nutzt die Zustandmaschine um einen kompletten Frame zu senden.
     fsm = FrameSenderFSM(l2, src_mac, dest_mac, brightness_percent, frame_data, column_count, row_count)
     return fsm.run()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import queue
+import logging
+import threading
+import numpy as np
+from PIL import Image, ImageSequence
+from processing import pil_to_bgr_bytes, process_image
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".gif", ".webp", ".tif", ".tiff")
+
+def is_animated(path):
+    # Nur den Dateikopf lesen: GIF/APNG/WebP mit mehr als einem Frame
+    try:
+        with Image.open(path) as img:
+            return getattr(img, "is_animated", False) and getattr(img, "n_frames", 1) > 1
+    except Exception:
+        return False
+
+def _natural_key(name):
+    # "frame_2.png" vor "frame_10.png"
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r"(\d+)", name)]
+
+def list_sequence(directory):
+    names = [n for n in os.listdir(directory) if n.lower().endswith(IMAGE_EXTENSIONS)]
+    return [os.path.join(directory, n) for n in sorted(names, key=_natural_key)]
+
+def iter_animation_frames(path, width, height):
+    """Generator über die Frames einer Animation: (BGR-Bytes, Dauer in s)."""
+    with Image.open(path) as img:
+        for frame in ImageSequence.Iterator(img):
+            duration = frame.info.get("duration", img.info.get("duration", 100)) or 100
+            yield pil_to_bgr_bytes(frame.convert("RGB"), width, height), duration / 1000.0
+
+def iter_sequence_frames(paths, width, height):
+    """Generator über nummerierte Einzelbilder; Dauer None = ein Frame pro Sende-Deadline."""
+    for path in paths:
+        yield process_image(path, width, height), None
+
+def open_stream(path, width, height):
+    # Liefert eine Fabrik für neue Generatoren (für Endlosschleifen)
+    if os.path.isdir(path):
+        paths = list_sequence(path)
+        if not paths:
+            raise ValueError(f"No images found in {path}")
+        return lambda: iter_sequence_frames(paths, width, height)
+    return lambda: iter_animation_frames(path, width, height)
+
+class FramePrefetcher:
+    """Dekodiert Frames in einem Hintergrund-Thread in eine begrenzte Queue.
+
+    Der Speicherbedarf ist durch ``depth`` Frames begrenzt, egal wie lang der Clip ist.
+    Die Sendeschleife holt Frames nur nicht-blockierend ab (poll) und zeigt bei einem
+    Dekodier-Stau einfach den letzten Frame weiter an.
+    """
+
+    def __init__(self, frame_factory, rows, row_bytes, depth=8, loop=True):
+        self.frame_factory = frame_factory
+        self.rows = rows
+        self.row_bytes = row_bytes
+        self.loop = loop
+        self.frames = queue.Queue(maxsize=depth)
+        self.finished = False                   # Quelle erschöpft (nur ohne loop)
+        self.underruns = 0                      # Frame fällig, aber noch nicht dekodiert
+        self.decoded = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                produced = False
+                for data, duration in self.frame_factory():
+                    pixels = np.frombuffer(data, dtype=np.uint8)[:self.rows * self.row_bytes]
+                    pixels = pixels.reshape(self.rows, self.row_bytes)
+                    while not self._stop.is_set():
+                        try:
+                            self.frames.put((pixels, duration), timeout=0.1)
+                            break
+                        except queue.Full:
+                            continue
+                    if self._stop.is_set():
+                        return
+                    produced = True
+                    self.decoded += 1
+                if not self.loop or not produced:
+                    break
+        except Exception as e:
+            logging.error(f"Stream decode error: {e}")
+        self.finished = True
+
+    def poll(self):
+        # Nicht-blockierend: (pixels, duration) oder None
+        try:
+            return self.frames.get_nowait()
+        except queue.Empty:
+            if not self.finished:
+                self.underruns += 1
+            return None
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+
+import os
+import csv
+import json
+import time
+import errno
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class Histogram:
+    """Histogramm mit festen Buckets (``bucket_s`` breit, darüber Überlauf-Bucket).
+
+    record() kostet nur einen Index und ein paar Additionen unter einem Lock;
+    Perzentile werden erst in snapshot() (einmal pro Sekunde) berechnet.
+    ``total_count``/``total_sum`` laufen über die ganze Laufzeit (Prometheus).
+    """
+
+    def __init__(self, bucket_s=10e-6, buckets=5000):
+        self.bucket_s = bucket_s
+        self.buckets = buckets
+        self.total_count = 0
+        self.total_sum = 0.0
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counts = [0] * (self.buckets + 1)
+            self.count = 0
+            self.sum = 0.0
+            self.max = 0.0
+
+    def record(self, value):
+        index = int(value / self.bucket_s) if value > 0 else 0
+        if index > self.buckets:
+            index = self.buckets
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+            self.total_count += 1
+            self.total_sum += value
+            if value > self.max:
+                self.max = value
+
+    def _percentile(self, counts, total, fraction):
+        target = fraction * total
+        seen = 0
+        for index, n in enumerate(counts):
+            seen += n
+            if seen >= target:
+                return (index + 1) * self.bucket_s      # obere Bucketgrenze
+        return self.buckets * self.bucket_s
+
+    def snapshot(self, reset=False, scale=1e3, unit="ms"):
+        # Liefert p50/p99/max/mean (Standard: Millisekunden); optional Zähler zurücksetzen (z.B. pro Sekunde)
+        with self._lock:
+            counts, total, total_sum, maximum = self.counts, self.count, self.sum, self.max
+            if reset:
+                self.counts = [0] * (self.buckets + 1)
+                self.count = 0
+                self.sum = 0.0
+                self.max = 0.0
+        if not total:
+            return {"count": 0, f"p50_{unit}": 0.0, f"p99_{unit}": 0.0, f"max_{unit}": 0.0, f"mean_{unit}": 0.0}
+        return {
+            "count": total,
+            f"p50_{unit}": round(min(self._percentile(counts, total, 0.50), maximum) * scale, 3),
+            f"p99_{unit}": round(min(self._percentile(counts, total, 0.99), maximum) * scale, 3),
+            f"max_{unit}": round(maximum * scale, 3),
+            f"mean_{unit}": round(total_sum / total * scale, 3),
+        }
+
+class Telemetry:
+    """Zähler und Zeit-Histogramme des Sendepfads.
+
+    Der Sende-Thread ruft nur record_frame()/record_error() auf (kein Logging, keine I/O).
+    collect() bildet einmal pro Intervall einen Schnappschuss (dict), den die Exporter
+    (Datei, Prometheus, GUI) nur noch lesen.
+    """
+
+    def __init__(self):
+        self.build = Histogram()                                # Quelle -> fertiger Frame
+        self.send = Histogram()                                 # Syscalls eines Frames
+        self.latency = Histogram()                              # Deadline -> Frame komplett gesendet
+        self.packet = Histogram(bucket_s=0.1e-6, buckets=10000) # Sendezeit pro Paket (0.1 µs Buckets)
+        self.totals = {"frames": 0, "bytes": 0, "packets": 0, "send_errors": 0, "enobufs": 0}
+        self._window = dict(self.totals)
+        self._lock = threading.Lock()
+        self._sources = {}                                      # Name -> Funktion, die ein dict liefert
+        self._window_start = time.monotonic()
+        self.latest = None                                      # letzter Schnappschuss
+
+    def add_source(self, name, func):
+        # Weitere Statistiken (Uhr, Cache, ...) in jeden Schnappschuss übernehmen
+        self._sources[name] = func
+
+    def record_frame(self, bytes_sent, packets, build_s, send_s, latency_s):
+        self.build.record(build_s)
+        self.send.record(send_s)
+        self.latency.record(latency_s)
+        if packets:
+            self.packet.record(send_s / packets)
+        with self._lock:
+            window = self._window
+            window["frames"] += 1
+            window["bytes"] += bytes_sent
+            window["packets"] += packets
+
+    def record_error(self, error):
+        with self._lock:
+            self._window["send_errors"] += 1
+            if getattr(error, "errno", None) == errno.ENOBUFS:
+                self._window["enobufs"] += 1
+
+    def collect(self):
+        """Schließt das aktuelle Intervall ab und liefert den Schnappschuss."""
+        now = time.monotonic()
+        with self._lock:
+            window = self._window
+            self._window = dict.fromkeys(window, 0)
+            for key, value in window.items():
+                self.totals[key] += value
+            totals = dict(self.totals)
+        interval = max(now - self._window_start, 1e-9)
+        self._window_start = now
+        snapshot = {
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "interval_s": round(interval, 3),
+            "fps": round(window["frames"] / interval, 2),
+            "bytes_per_s": int(window["bytes"] / interval),
+            "bps": int(window["bytes"] * 8 / interval),
+            "packets_per_s": int(window["packets"] / interval),
+            "send_errors": window["send_errors"],
+            "enobufs": window["enobufs"],
+            "build": self.build.snapshot(reset=True),
+            "send": self.send.snapshot(reset=True),
+            "latency": self.latency.snapshot(reset=True),
+            "packet": self.packet.snapshot(reset=True, scale=1e6, unit="us"),
+            "totals": totals,
+        }
+        for name, func in self._sources.items():
+            try:
+                snapshot[name] = func()
+            except Exception as e:
+                logging.error(f"Telemetry source {name} failed: {e}")
+        self.latest = snapshot
+        return snapshot
+
+    def prometheus_text(self):
+        """Metriken im Prometheus-Textformat (Zähler kumulativ, Perzentile aus dem letzten Intervall)."""
+        snapshot = self.latest or {}
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{labels} {value}")
+
+        totals = snapshot.get("totals", self.totals)
+        metric("led_frames_total", "counter", "Frames sent.", [("", totals["frames"])])
+        metric("led_bytes_total", "counter", "Bytes sent.", [("", totals["bytes"])])
+        metric("led_packets_total", "counter", "Packets sent.", [("", totals["packets"])])
+        metric("led_send_errors_total", "counter", "Failed frame transmissions.", [("", totals["send_errors"])])
+        metric("led_enobufs_total", "counter", "Transmissions rejected with ENOBUFS.", [("", totals["enobufs"])])
+        metric("led_fps", "gauge", "Frames per second in the last interval.", [("", snapshot.get("fps", 0))])
+        for name, key, hist, unit, help_text in (
+                ("led_frame_build_seconds", "build", self.build, "ms", "Time to produce a frame."),
+                ("led_frame_send_seconds", "send", self.send, "ms", "Time spent in send syscalls per frame."),
+                ("led_frame_latency_seconds", "latency", self.latency, "ms", "Deadline to frame fully sent."),
+                ("led_packet_send_seconds", "packet", self.packet, "us", "Send time per packet.")):
+            window = snapshot.get(key, {})
+            scale = 1e-6 if unit == "us" else 1e-3
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} summary")
+            for quantile, percentile in (("0.5", 50), ("0.99", 99)):
+                lines.append(f'{name}{{quantile="{quantile}"}} {window.get(f"p{percentile}_{unit}", 0.0) * scale:.9f}')
+            lines.append(f"{name}_sum {hist.total_sum:.6f}")
+            lines.append(f"{name}_count {hist.total_count}")
+        clock = snapshot.get("clock", {})
+        if clock:
+            metric("led_frames_dropped", "gauge", "Deadlines skipped in the last interval.", [("", clock.get("dropped", 0))])
+            metric("led_frame_lateness_p99_seconds", "gauge", "p99 wake-up lateness in the last interval.",
+                   [("", clock.get("p99_ms", 0.0) / 1e3)])
+        sender = snapshot.get("sender", {})
+        if sender:
+            metric("led_keepalive_fps", "gauge", "Refresh rate for unchanged content (0 = adaptive refresh off).",
+                   [("", sender.get("keepalive_fps", 0))])
+            metric("led_idle", "gauge", "1 while unchanged content is sent at the keep-alive rate.",
+                   [("", int(bool(sender.get("idle"))))])
+            metric("led_frames_skipped", "gauge", "Unchanged frames not sent in the last interval.",
+                   [("", sender.get("skipped", 0))])
+        cache = snapshot.get("cache", {})
+        if cache:
+            metric("led_cache_hit_ratio", "gauge", "Image cache hit rate.", [("", round(cache.get("hit_rate", 0.0), 4))])
+            metric("led_cache_bytes", "gauge", "Bytes held by the image cache.", [("", cache.get("bytes", 0))])
+            metric("led_cache_evictions_total", "counter", "Image cache evictions.", [("", cache.get("evictions", 0))])
+        transport = snapshot.get("transport", {})
+        if transport:
+            metric("led_tx_backpressure_total", "counter", "Sends rejected with a full buffer or queue.",
+                   [('{reason="eagain"}', transport.get("eagain", 0)), ('{reason="enobufs"}', transport.get("enobufs", 0))])
+            metric("led_tx_retries_total", "counter", "Send retries within the frame budget.", [("", transport.get("retries", 0))])
+            metric("led_tx_frames_dropped_total", "counter", "Frames dropped after the retry budget.",
+                   [("", transport.get("frames_dropped", 0))])
+            metric("led_tx_packets_dropped_total", "counter", "Packets dropped with those frames.",
+                   [("", transport.get("packets_dropped", 0))])
+            metric("led_tx_sndbuf_bytes", "gauge", "Socket send buffer as reported by the kernel.",
+                   [("", transport.get("sndbuf", 0))])
+            metric("led_tx_qdisc_bypass", "gauge", "1 if PACKET_QDISC_BYPASS is active.",
+                   [("", int(bool(transport.get("qdisc_bypass"))))])
+        capture = snapshot.get("capture", {})
+        if capture:
+            metric("led_capture_packets_total", "counter", "Packets written to the pcap recording.",
+                   [("", capture.get("packets", 0))])
+            metric("led_capture_dropped_total", "counter", "Packets not recorded because the writer queue was full.",
+                   [("", capture.get("dropped", 0))])
+        layers = snapshot.get("layers", {})
+        if layers:
+            per_layer = [(name, stats) for name, stats in layers.items() if name != "compose"]
+            metric("led_layer_render_p99_seconds", "gauge", "p99 update + blend time per layer in the last interval.",
+                   [(f'{{layer="{name}"}}', stats["p99_ms"] / 1e3) for name, stats in per_layer])
+            metric("led_layer_redraws", "gauge", "Frames in which the layer was redrawn in the last interval.",
+                   [(f'{{layer="{name}"}}', stats["redraws"]) for name, stats in per_layer])
+            metric("led_compose_p99_seconds", "gauge", "p99 time to compose a frame in the last interval.",
+                   [("", layers["compose"]["p99_ms"] / 1e3)])
+        return "\n".join(lines) + "\n"
+
+def flatten(snapshot, prefix=""):
+    # Verschachtelten Schnappschuss für CSV in eine Ebene bringen: {"send": {"p50_ms": 1}} -> {"send.p50_ms": 1}
+    flat = {}
+    for key, value in snapshot.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        else:
+            flat[name] = value
+    return flat
+
+class RollingFileExporter:
+    """Schreibt Schnappschüsse als JSON-Lines (oder CSV bei Endung .csv) und rotiert ab ``max_bytes``."""
+
+    def __init__(self, path, max_bytes=5 * 1024 * 1024, backups=3):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.csv = path.lower().endswith(".csv")
+        self._file = None
+        self._fields = None
+
+    def _open(self):
+        self._file = open(self.path, "a", newline="")
+        self._fields = None
+
+    def _rollover(self):
+        self.close()
+        for index in range(self.backups - 1, 0, -1):
+            src = f"{self.path}.{index}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{index + 1}")
+        if os.path.exists(self.path):
+            os.replace(self.path, f"{self.path}.1")
+
+    def write(self, snapshot):
+        if self._file is None:
+            self._open()
+        if self._file.tell() >= self.max_bytes:
+            self._rollover()
+            self._open()
+        if self.csv:
+            row = flatten(snapshot)
+            writer = csv.DictWriter(self._file, fieldnames=self._fields or list(row), extrasaction="ignore")
+            if self._fields is None:
+                self._fields = writer.fieldnames
+                if self._file.tell() == 0:
+                    writer.writeheader()
+            writer.writerow(row)
+        else:
+            self._file.write(json.dumps(snapshot) + "\n")
+        self._file.flush()
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+class PrometheusExporter:
+    """Kleiner HTTP-Server nur auf localhost: GET /metrics liefert Telemetry.prometheus_text()."""
+
+    def __init__(self, telemetry, host="127.0.0.1", port=9108):
+        self.telemetry = telemetry
+        self.host = host
+        self.port = port
+        self._server = None
+
+    def start(self):
+        telemetry = self.telemetry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = telemetry.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass                            # keine Zugriffs-Logs
+
+        try:
+            self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        except OSError as e:
+            logging.warning(f"Metrics endpoint not started on {self.host}:{self.port}: {e}")
+            return False
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        logging.info(f"Metrics endpoint: http://{self.host}:{self._server.server_port}/metrics")
+        return True
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
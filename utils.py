@@ -1,5 +1,5 @@
 #!/usr/bin/env python3
-from constants import BRIGHTNESS_MAP, FRAME_0107_DATA_LENGTH, FRAME_0AFF_DATA_LENGTH
+from constants import BRIGHTNESS_MAP, FRAME_0107_DATA_LENGTH, FRAME_0AFF_DATA_LENGTH, ROW_HEADER_LEN, ROW_MAX_PIXELS
 
 def get_brightness(brightness_percent):
     #Helligkeits-prozent mithilfe eine Tabelle umwandeln
@@ -37,3 +37,13 @@ def init_frames(column_count, brightness_percent):
 def update_row_data(frameData5500, row_index, row_data):
     frameData5500[0] = row_index  # Update row index
     frameData5500[7:] = row_data  # Update row data
+
+def max_row_pixels(mtu):
+    # Pixel, die in ein 0x5500-Paket dieser MTU passen
+    return max(1, (mtu - ROW_HEADER_LEN) // 3)
+
+def row_segments(column_count, max_pixels=ROW_MAX_PIXELS):
+    # Aufteilung einer Zeile in möglichst wenige, gleich große Pakete: [(Pixel-Offset, Pixelanzahl)]
+    count = max(1, -(-column_count // max_pixels))
+    size = -(-column_count // count) if column_count else 0
+    return [(start, min(size, column_count - start)) for start in range(0, max(column_count, 1), max(size, 1))]
@@ -2,8 +2,11 @@
 
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, simpledialog, colorchooser
+from constants import ADAPTIVE_REFRESH, KEEPALIVE_FPS, JUMBO_FRAMES, SENDER_PROCESS, SENDER_PROCESS_CPU
 
 class MainView:
+    interactive = True                          # hat Widgets (HeadlessView: False)
+
     def __init__(self, root):
         # Initialisierung des Hauptfensters
         self.root = root
@@ -14,6 +17,24 @@ class MainView:
         self.src_mac_var = tk.StringVar(value="22:22:33:44:55:66")
         self.dst_mac_var = tk.StringVar(value="11:22:33:44:55:66")
         self.brightness_var = tk.IntVar(value=50)
+        self.tx_mode_var = tk.StringVar(value="sendmmsg")
+        self.backpressure_var = tk.StringVar(value="retry")
+        self.jumbo_var = tk.BooleanVar(value=JUMBO_FRAMES)
+        self.fps_var = tk.IntVar(value=60)
+        self.delta_var = tk.BooleanVar(value=False)
+        self.keyframe_interval_var = tk.IntVar(value=60)
+        self.adaptive_var = tk.BooleanVar(value=ADAPTIVE_REFRESH)
+        self.keepalive_fps_var = tk.IntVar(value=KEEPALIVE_FPS)
+        # Farbkorrektur der LED-Module
+        self.gamma_var = tk.DoubleVar(value=1.0)
+        self.color_temp_var = tk.IntVar(value=6500)
+        self.gain_r_var = tk.DoubleVar(value=1.0)
+        self.gain_g_var = tk.DoubleVar(value=1.0)
+        self.gain_b_var = tk.DoubleVar(value=1.0)
+        self.dither_var = tk.StringVar(value="none")
+        # Sendeschleife im eigenen Prozess: gilt ab dem Start (constants.SENDER_PROCESS)
+        self.sender_process_var = tk.BooleanVar(value=SENDER_PROCESS)
+        self.sender_cpu_var = tk.IntVar(value=SENDER_PROCESS_CPU)
         
         # Aufbau der Benutzeroberfläche
         self.create_widgets()
@@ -31,6 +52,22 @@ class MainView:
         # Button zum Aktualisieren der Schnittstellen
         self.refresh_button = ttk.Button(self.interface_frame, text="Refresh")
         self.refresh_button.pack(side=tk.LEFT, padx=10)
+        # Auswahl des Sende-Modus (sendmmsg-Batch oder ein Paket pro Syscall)
+        ttk.Label(self.interface_frame, text="TX Mode:").pack(side=tk.LEFT, padx=5)
+        self.tx_mode_combo = ttk.Combobox(self.interface_frame, state="readonly", width=10,
+                                          textvariable=self.tx_mode_var, values=("sendmmsg", "single"))
+        self.tx_mode_combo.pack(side=tk.LEFT, padx=5)
+        # Verhalten bei vollem Sendepuffer/NIC-Queue: bis zur Deadline erneut senden oder Frame verwerfen
+        ttk.Label(self.interface_frame, text="On Full:").pack(side=tk.LEFT, padx=5)
+        self.backpressure_combo = ttk.Combobox(self.interface_frame, state="readonly", width=6,
+                                               textvariable=self.backpressure_var, values=("retry", "drop"))
+        self.backpressure_combo.pack(side=tk.LEFT, padx=5)
+        # Jumbo-Frames: Zeilenpakete bis zur MTU der Schnittstelle (gilt ab der nächsten Kartenerkennung)
+        self.jumbo_check = ttk.Checkbutton(self.interface_frame, text="Jumbo", variable=self.jumbo_var)
+        self.jumbo_check.pack(side=tk.LEFT, padx=5)
+        # Videowand aus mehreren Empfängerkarten (JSON-Layout) laden
+        self.load_canvas_button = ttk.Button(self.interface_frame, text="Load Canvas")
+        self.load_canvas_button.pack(side=tk.LEFT, padx=5)
 
         # Bereich für MAC-Adressen
         mac_frame = ttk.LabelFrame(self.root, text="MAC Addresses")
@@ -52,6 +89,18 @@ class MainView:
         # Button zum Durchsuchen der Bilder
         self.browse_button = ttk.Button(image_frame, text="Browse Images")
         self.browse_button.pack(side=tk.LEFT, padx=10)
+        # Button zum Abspielen einer nummerierten Bildsequenz aus einem Ordner
+        self.play_folder_button = ttk.Button(image_frame, text="Play Folder")
+        self.play_folder_button.pack(side=tk.LEFT, padx=10)
+        # Button zum Abspielen einer Playlist (JSON: Dauer, Wiederholungen und Übergang je Eintrag)
+        self.playlist_button = ttk.Button(image_frame, text="Play Playlist")
+        self.playlist_button.pack(side=tk.LEFT, padx=10)
+        # Button zum Öffnen/Schließen des Live-Eingangs für externe Produzenten (Shared Memory)
+        self.ingest_button = ttk.Button(image_frame, text="Live Input")
+        self.ingest_button.pack(side=tk.LEFT, padx=10)
+        # Button zum Starten/Beenden des Mitschnitts aller gesendeten Pakete (pcap)
+        self.record_button = ttk.Button(image_frame, text="Record")
+        self.record_button.pack(side=tk.LEFT, padx=10)
 
         # Bereich für den Helligkeitsregler
         brightness_frame = ttk.Frame(self.root)
@@ -62,6 +111,49 @@ class MainView:
         self.brightness_slider = ttk.Scale(brightness_frame, from_=0, to=100, orient=tk.HORIZONTAL, variable=self.brightness_var)
         self.brightness_slider.pack(side=tk.LEFT, padx=5, expand=True, fill=tk.X)
 
+        # Bereich für den Delta-Modus (nur geänderte Zeilen senden)
+        delta_frame = ttk.Frame(self.root)
+        delta_frame.pack(pady=5, fill=tk.X)
+        # Schalter für den Delta-Modus
+        self.delta_check = ttk.Checkbutton(delta_frame, text="Delta mode (changed rows only)", variable=self.delta_var)
+        self.delta_check.pack(side=tk.LEFT, padx=10)
+        # Ziel-Bildrate der Sendeschleifen (wirkt sofort)
+        ttk.Label(delta_frame, text="FPS:").pack(side=tk.LEFT, padx=5)
+        self.fps_spin = ttk.Spinbox(delta_frame, from_=1, to=480, width=5, textvariable=self.fps_var)
+        self.fps_spin.pack(side=tk.LEFT, padx=5)
+        # Abstand der vollständigen Keyframes in Frames
+        ttk.Label(delta_frame, text="Keyframe every (frames):").pack(side=tk.LEFT, padx=5)
+        self.keyframe_spin = ttk.Spinbox(delta_frame, from_=1, to=10000, width=6, textvariable=self.keyframe_interval_var)
+        self.keyframe_spin.pack(side=tk.LEFT, padx=5)
+        # Adaptive Bildrate: unveränderter Inhalt nur im Keep-alive-Takt
+        self.adaptive_check = ttk.Checkbutton(delta_frame, text="Adaptive", variable=self.adaptive_var)
+        self.adaptive_check.pack(side=tk.LEFT, padx=5)
+        ttk.Label(delta_frame, text="Keep-alive FPS:").pack(side=tk.LEFT, padx=5)
+        self.keepalive_spin = ttk.Spinbox(delta_frame, from_=1, to=120, width=4, textvariable=self.keepalive_fps_var)
+        self.keepalive_spin.pack(side=tk.LEFT, padx=5)
+
+        # Bereich für die Farbkorrektur (Gamma, Weißpunkt, Kanal-Gain, Dithering)
+        color_frame = ttk.Frame(self.root)
+        color_frame.pack(pady=5, fill=tk.X)
+        ttk.Label(color_frame, text="Gamma:").pack(side=tk.LEFT, padx=10)
+        self.gamma_spin = ttk.Spinbox(color_frame, from_=0.5, to=3.0, increment=0.1, width=5, textvariable=self.gamma_var)
+        self.gamma_spin.pack(side=tk.LEFT, padx=5)
+        ttk.Label(color_frame, text="White point (K):").pack(side=tk.LEFT, padx=5)
+        self.color_temp_spin = ttk.Spinbox(color_frame, from_=2000, to=12000, increment=100, width=6,
+                                           textvariable=self.color_temp_var)
+        self.color_temp_spin.pack(side=tk.LEFT, padx=5)
+        # Gain je Kanal (0..1)
+        ttk.Label(color_frame, text="Gain R/G/B:").pack(side=tk.LEFT, padx=5)
+        self.gain_spins = []
+        for var in (self.gain_r_var, self.gain_g_var, self.gain_b_var):
+            spin = ttk.Spinbox(color_frame, from_=0.0, to=1.0, increment=0.05, width=5, textvariable=var)
+            spin.pack(side=tk.LEFT, padx=2)
+            self.gain_spins.append(spin)
+        ttk.Label(color_frame, text="Dither:").pack(side=tk.LEFT, padx=5)
+        self.dither_combo = ttk.Combobox(color_frame, state="readonly", width=9, textvariable=self.dither_var,
+                                         values=("none", "ordered", "temporal"))
+        self.dither_combo.pack(side=tk.LEFT, padx=5)
+
         # Navigationsbereich für Bildsteuerung und weitere Funktionen
         navigation_frame = ttk.Frame(self.root)
         navigation_frame.pack(pady=10, fill=tk.X)
@@ -112,6 +204,14 @@ class MainView:
         self.status_label = ttk.Label(self.root, text="Status: Ready", relief=tk.SUNKEN, anchor=tk.W)
         self.status_label.pack(side=tk.BOTTOM, fill=tk.X)
 
+    def close(self):
+        self.root.quit()
+        self.root.destroy()
+
+    def schedule(self, delay_ms, callback):
+        # Callback nach delay_ms im Tk-Thread ausführen
+        return self.root.after(delay_ms, callback)
+
     def update_performance(self, text):
         
         self.performance_label.config(text=text)
@@ -136,6 +236,25 @@ class MainView:
        
         return filedialog.askopenfilenames(filetypes=[("All Files", "*.*")])
 
+    def prompt_directory(self):
+
+        return filedialog.askdirectory(title="Ordner mit Bildsequenz auswählen")
+
+    def prompt_playlist(self):
+
+        return filedialog.askopenfilename(title="Playlist auswählen",
+                                          filetypes=[("JSON", "*.json"), ("All Files", "*.*")])
+
+    def prompt_capture_path(self):
+
+        return filedialog.asksaveasfilename(title="Mitschnitt speichern unter", defaultextension=".pcap",
+                                            filetypes=[("pcap", "*.pcap"), ("All Files", "*.*")])
+
+    def prompt_canvas_layout(self):
+
+        return filedialog.askopenfilename(title="Layout der Videowand auswählen",
+                                          filetypes=[("JSON", "*.json"), ("All Files", "*.*")])
+
     def prompt_marquee_config(self):
        
         config = {}
@@ -177,4 +296,18 @@ class MainView:
             config["speed"] = int(speed_str)
         except:
             config["speed"] = 1
+        # Hintergrund unter der Laufschrift (Compositor): leer = Hintergrundfarbe
+        background = simpledialog.askstring("Hintergrund",
+                                            "Hintergrund: leer = Farbe, 'bild' = aktuelles Bild, 'live' = Live-Eingang, "
+                                            "oder Pfad zu Bild/Animation/Ordner:")
+        background = (background or "").strip()
+        config["background"] = {"bild": "current", "image": "current"}.get(background.lower(), background) or None
+        if messagebox.askyesno("Logo", "Logo über der Laufschrift einblenden?"):
+            config["logo"] = filedialog.askopenfilename(title="Logo auswählen",
+                                                        filetypes=[("Images", "*.png *.jpg *.jpeg *.bmp *.gif *.webp")]) or None
+            position_str = simpledialog.askstring("Logo-Position", "Position X,Y (z.B. 0,0):")
+            try:
+                config["logo_position"] = tuple(int(v) for v in position_str.split(","))[:2]
+            except:
+                config["logo_position"] = (0, 0)
         return config